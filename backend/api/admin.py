@@ -1,5 +1,10 @@
 from django.contrib import admin
-from .models import User, Tag, Course, Module, Lesson, Step, CourseProgress, Certificate
+from .issuance import issue_course_certificates
+from .models import (
+    User, Tag, Course, Module, Lesson, Step, CourseProgress, Certificate, CertificateJob, ProgressIdempotencyKey,
+    SearchDocument,
+)
+from .search import matching_course_ids
 
 
 @admin.register(User)
@@ -28,6 +33,23 @@ class CourseAdmin(admin.ModelAdmin):
     filter_horizontal = ('tags', 'students', 'favorites')
     verbose_name = "Курс"
     verbose_name_plural = "Курсы"
+    actions = ('issue_certificates',)
+
+    @admin.action(description='Выдать сертификаты завершившим курс')
+    def issue_certificates(self, request, queryset):
+        for course in queryset:
+            stats = issue_course_certificates(course)
+            self.message_user(
+                request,
+                f'«{course.title}»: выдано сертификатов {stats["issued"]} '
+                f'({stats["per_second"]:.1f} серт./с)'
+            )
+
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по полнотекстовому индексу вместо icontains-просмотра всей таблицы
+        if not search_term.strip():
+            return queryset, False
+        return queryset.filter(pk__in=matching_course_ids(search_term)), False
 
     def get_student_count(self, obj):
         return obj.students.count()
@@ -51,6 +73,8 @@ class ModuleAdmin(admin.ModelAdmin):
 @admin.register(Lesson)
 class LessonAdmin(admin.ModelAdmin):
     list_display = ('title', 'module', 'order')
+    # Module.__str__ выводит название курса
+    list_select_related = ('module__course',)
     search_fields = ('title',)
     list_filter = ('module',)
     ordering = ('module', 'order')
@@ -71,25 +95,53 @@ class StepAdmin(admin.ModelAdmin):
 @admin.register(CourseProgress)
 class CourseProgressAdmin(admin.ModelAdmin):
     list_display = ('user', 'course', 'current_module', 'current_lesson', 'current_step', 'completed')
+    list_select_related = ('user', 'course', 'current_module__course', 'current_lesson', 'current_step')
     search_fields = ('user__username', 'course__title')
     list_filter = ('completed', 'course')
     verbose_name = "Прогресс курса"
     verbose_name_plural = "Прогрессы курсов"
 
     def get_completed_step_count(self, obj):
-        return obj.completed_steps.count()
+        return obj.completed_steps_count
     get_completed_step_count.short_description = 'Количество завершенных шагов'
 
 
 @admin.register(Certificate)
 class CertificateAdmin(admin.ModelAdmin):
-    list_display = ('user', 'course', 'created_at')
+    list_display = ('user', 'course', 'template_version', 'created_at')
     search_fields = ('user__username', 'course__title')
-    list_filter = ('created_at',)
+    list_filter = ('created_at', 'template_version')
     verbose_name = "Сертификат"
     verbose_name_plural = "Сертификаты"
 
 
+@admin.register(CertificateJob)
+class CertificateJobAdmin(admin.ModelAdmin):
+    list_display = ('user', 'course', 'status', 'created_at', 'updated_at')
+    search_fields = ('user__username', 'course__title')
+    list_filter = ('status', 'created_at')
+    verbose_name = "Задача генерации сертификата"
+    verbose_name_plural = "Задачи генерации сертификатов"
+
+
+@admin.register(ProgressIdempotencyKey)
+class ProgressIdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ('user', 'key', 'course', 'endpoint', 'created_at')
+    search_fields = ('user__username', 'key')
+    list_filter = ('endpoint', 'created_at')
+    verbose_name = "Ключ идемпотентности"
+    verbose_name_plural = "Ключи идемпотентности"
+
+
+@admin.register(SearchDocument)
+class SearchDocumentAdmin(admin.ModelAdmin):
+    list_display = ('course', 'step', 'title')
+    raw_id_fields = ('course', 'step')
+    list_select_related = ('course',)
+    verbose_name = "Поисковый документ"
+    verbose_name_plural = "Поисковые документы"
+
+
 admin.site.site_header = "Администрирование курса"
 admin.site.site_title = "Панель управления курсом"
 admin.site.index_title = "Добро пожаловать в панель управления курсом"
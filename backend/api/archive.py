@@ -0,0 +1,266 @@
+import io
+import json
+import os
+import shutil
+import time
+import zipfile
+
+from django.core.files import File
+from django.db import transaction
+
+from .models import Course, Module, Lesson, Step, Tag, validate_step_content
+from .search import index_courses
+
+# Архив курса — zip, внутри которого course.jsonl и файл аватарки. Каждая строка
+# course.jsonl — одна запись: сначала курс, затем модули, уроки и шаги в порядке
+# дерева (урок относится к последнему модулю перед ним, шаг — к последнему уроку).
+# Такой формат пишется и читается построчно, без загрузки всего курса в память.
+ARCHIVE_VERSION = 1
+RECORDS_NAME = 'course.jsonl'
+AVATAR_DIR = 'avatar/'
+
+STEP_TYPES = dict(Step.STEP_TYPES)
+
+
+class CourseArchiveError(ValueError):
+    """Архив курса повреждён или не соответствует формату."""
+
+
+def iter_course_records(course, chunk_size=2000):
+    """Записи архива для курса. Шаги читаются из базы пачками по chunk_size."""
+    avatar = None
+    if course.avatar and course.avatar.storage.exists(course.avatar.name):
+        avatar = AVATAR_DIR + os.path.basename(course.avatar.name)
+    yield {
+        'type': 'course',
+        'version': ARCHIVE_VERSION,
+        'title': course.title,
+        'description': course.description,
+        'price': course.price,
+        'tags': list(course.tags.order_by('name').values_list('name', flat=True)),
+        'avatar': avatar,
+    }
+
+    modules = {
+        module_id: {'type': 'module', 'title': title, 'order': order}
+        for module_id, title, order in Module.objects.filter(course=course).values_list('id', 'title', 'order')
+    }
+    lessons = (
+        Lesson.objects.filter(module__course=course)
+        .order_by('module__order', 'module_id', 'order', 'pk')
+        .values_list('id', 'module_id', 'title', 'order')
+    )
+    steps = (
+        Step.objects.filter(lesson__module__course=course)
+        .order_by('lesson__module__order', 'lesson__module_id', 'lesson__order', 'lesson_id', 'order', 'pk')
+        .values_list('lesson_id', 'order', 'step_type', 'content')
+        .iterator(chunk_size=chunk_size)
+    )
+
+    # Уроки и шаги отсортированы одинаково, поэтому шаги урока идут подряд сразу за ним
+    step = next(steps, None)
+    for lesson_id, module_id, title, order in lessons:
+        module = modules.pop(module_id, None)
+        if module is not None:
+            yield module
+        yield {'type': 'lesson', 'title': title, 'order': order}
+        while step is not None and step[0] == lesson_id:
+            yield {'type': 'step', 'order': step[1], 'step_type': step[2], 'content': step[3]}
+            step = next(steps, None)
+
+    # Модули без уроков
+    for module in sorted(modules.values(), key=lambda module: module['order']):
+        yield module
+
+
+class _ChunkBuffer:
+    """Приёмник для ZipFile без seek: накапливает записанные байты до следующей выдачи."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_course_archive(course, chunk_size=2000, flush_every=500):
+    """
+    Генератор байтов zip-архива курса для StreamingHttpResponse. Архив собирается
+    по мере чтения из базы и отдаётся частями, не накапливаясь целиком.
+    """
+    buffer = _ChunkBuffer()
+    avatar = None
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        with archive.open(RECORDS_NAME, 'w') as records:
+            for index, record in enumerate(iter_course_records(course, chunk_size), start=1):
+                if record['type'] == 'course':
+                    avatar = record['avatar']
+                records.write(json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n')
+                if index % flush_every == 0:
+                    data = buffer.drain()
+                    if data:
+                        yield data
+
+        if avatar:
+            with course.avatar.open('rb') as source, archive.open(avatar, 'w') as target:
+                shutil.copyfileobj(source, target)
+            course.avatar.close()
+    yield buffer.drain()
+
+
+def write_course_archive(course, fileobj, chunk_size=2000):
+    for data in stream_course_archive(course, chunk_size):
+        fileobj.write(data)
+
+
+def _parse_lines(lines):
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as error:
+            raise CourseArchiveError(f'Строка {number}: некорректный JSON ({error}).')
+
+
+def _numbered(records):
+    for number, record in enumerate(records, start=1):
+        if not isinstance(record, dict):
+            raise CourseArchiveError(f'Запись {number}: должна быть объектом.')
+        yield number, record
+
+
+def _field(number, record, name, types):
+    value = record.get(name)
+    if not isinstance(value, types) or isinstance(value, bool):
+        raise CourseArchiveError(f'Запись {number}: некорректное поле {name}.')
+    return value
+
+
+def import_course_records(records, author, title=None, batch_size=2000, open_file=None):
+    """
+    Создаёт курс из записей архива — словарей в формате iter_course_records.
+    Модули, уроки и шаги копятся и вставляются через bulk_create пачками по
+    batch_size шагов, поэтому число запросов зависит от числа пачек, а не от
+    размера курса. open_file(path) открывает файл аватарки из архива; без него
+    аватарка пропускается.
+
+    Сигналы при bulk_create не вызываются, поэтому steps_count записывается
+    и поисковый индекс строится в конце.
+    Возвращает (курс, статистика).
+    """
+    started = time.perf_counter()
+    stats = {'modules': 0, 'lessons': 0, 'steps': 0, 'tags': 0}
+    records = _numbered(records)
+
+    number, header = next(records, (0, None))
+    if header is None or header.get('type') != 'course':
+        raise CourseArchiveError('Архив должен начинаться с записи курса.')
+    if header.get('version') != ARCHIVE_VERSION:
+        raise CourseArchiveError(f'Неподдерживаемая версия архива: {header.get("version")}.')
+
+    pending = {'modules': [], 'lessons': [], 'steps': []}
+
+    def flush():
+        # Родители вставляются раньше детей, поэтому к моменту вставки у них уже есть id
+        for key, model in (('modules', Module), ('lessons', Lesson), ('steps', Step)):
+            if pending[key]:
+                stats[key] += len(model.objects.bulk_create(pending[key]))
+                pending[key] = []
+
+    with transaction.atomic():
+        course = Course.objects.create(
+            title=title or _field(number, header, 'title', str),
+            description=_field(number, header, 'description', str),
+            price=_field(number, header, 'price', int),
+            author=author,
+        )
+
+        names = _field(number, header, 'tags', list)
+        if not all(isinstance(name, str) for name in names):
+            raise CourseArchiveError(f'Запись {number}: некорректное поле tags.')
+        existing = set(Tag.objects.filter(name__in=names).values_list('name', flat=True))
+        Tag.objects.bulk_create([Tag(name=name) for name in set(names) - existing], ignore_conflicts=True)
+        CourseTag = Course.tags.through
+        stats['tags'] = len(CourseTag.objects.bulk_create([
+            CourseTag(course_id=course.id, tag_id=tag_id)
+            for tag_id in Tag.objects.filter(name__in=names).values_list('id', flat=True)
+        ]))
+
+        module = lesson = None
+        for number, record in records:
+            record_type = record.get('type')
+            if record_type == 'module':
+                module = Module(course=course, title=_field(number, record, 'title', str),
+                                order=_field(number, record, 'order', int))
+                pending['modules'].append(module)
+                lesson = None
+            elif record_type == 'lesson':
+                if module is None:
+                    raise CourseArchiveError(f'Запись {number}: урок вне модуля.')
+                lesson = Lesson(module=module, title=_field(number, record, 'title', str),
+                                order=_field(number, record, 'order', int))
+                pending['lessons'].append(lesson)
+            elif record_type == 'step':
+                if lesson is None:
+                    raise CourseArchiveError(f'Запись {number}: шаг вне урока.')
+                step_type = record.get('step_type')
+                if step_type not in STEP_TYPES:
+                    raise CourseArchiveError(f'Запись {number}: неизвестный тип шага {step_type!r}.')
+                content = _field(number, record, 'content', dict)
+                try:
+                    validate_step_content(step_type, content)
+                except ValueError as error:
+                    raise CourseArchiveError(f'Запись {number}: {error}')
+                pending['steps'].append(Step(lesson=lesson, order=_field(number, record, 'order', int),
+                                             step_type=step_type, content=content))
+                if len(pending['steps']) >= batch_size:
+                    flush()
+            else:
+                raise CourseArchiveError(f'Запись {number}: неизвестный тип записи {record_type!r}.')
+        flush()
+
+        course.steps_count = stats['steps']
+        Course.objects.filter(pk=course.pk).update(steps_count=course.steps_count)
+        index_courses([course.pk], batch_size)
+
+        # Файл аватарки сохраняется последним, чтобы ошибка в записях не оставляла его в хранилище
+        avatar = header.get('avatar')
+        if avatar and open_file is not None:
+            with open_file(avatar) as source:
+                course.avatar.save(os.path.basename(avatar), File(source), save=False)
+            Course.objects.filter(pk=course.pk).update(avatar=course.avatar.name)
+
+    stats['elapsed'] = time.perf_counter() - started
+    return course, stats
+
+
+def read_course_archive(fileobj, author, title=None, batch_size=2000):
+    """Импортирует курс из zip-архива (путь или файловый объект с seek)."""
+    try:
+        archive = zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile:
+        raise CourseArchiveError('Файл не является zip-архивом.')
+
+    with archive:
+        if RECORDS_NAME not in archive.namelist():
+            raise CourseArchiveError(f'В архиве нет {RECORDS_NAME}.')
+
+        def open_file(path):
+            try:
+                return archive.open(path)
+            except KeyError:
+                raise CourseArchiveError(f'В архиве нет файла {path}.')
+
+        with archive.open(RECORDS_NAME) as raw:
+            lines = io.TextIOWrapper(raw, encoding='utf-8')
+            return import_course_records(_parse_lines(lines), author, title, batch_size, open_file)
@@ -0,0 +1,82 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Prefetch
+
+from .models import Module, Lesson
+from .serializers import ModuleSerializer, LessonSerializer, StepSerializer
+
+TREE_KEY = 'course-tree:{course_id}'
+HITS_KEY = 'course-tree:stats:hits'
+MISSES_KEY = 'course-tree:stats:misses'
+
+
+def get_cache():
+    return caches[settings.COURSE_CONTENT_CACHE_ALIAS]
+
+
+def _increment(key):
+    cache = get_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Ключа ещё нет (или он вытеснен) — создаём; add не перезапишет значение другого процесса
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def build_course_tree(course_id, content_version):
+    """
+    Собирает не зависящее от пользователя дерево курса в том же формате,
+    что отдают ModuleViewSet, LessonViewSet и StepViewSet. Разделы индексируются
+    строковым id родителя, как он приходит из URL.
+    """
+    modules = list(
+        Module.objects.filter(course_id=course_id).prefetch_related(
+            Prefetch('lessons', queryset=Lesson.objects.prefetch_related('steps'))
+        )
+    )
+
+    tree = {
+        'content_version': content_version,
+        'modules': {str(course_id): ModuleSerializer(modules, many=True).data},
+        'lessons': {},
+        'steps': {},
+    }
+    for module in modules:
+        lessons = module.lessons.all()
+        tree['lessons'][str(module.id)] = LessonSerializer(lessons, many=True).data
+        for lesson in lessons:
+            tree['steps'][str(lesson.id)] = StepSerializer(lesson.steps.all(), many=True).data
+    return tree
+
+
+def get_course_tree(course_id, content_version):
+    cache = get_cache()
+    key = TREE_KEY.format(course_id=course_id)
+
+    tree = cache.get(key)
+    # Сверка версии защищает от записи устаревшего дерева параллельным запросом
+    if tree is not None and tree['content_version'] == content_version:
+        _increment(HITS_KEY)
+        return tree
+
+    _increment(MISSES_KEY)
+    tree = build_course_tree(course_id, content_version)
+    cache.set(key, tree, timeout=settings.COURSE_CONTENT_CACHE_TIMEOUT)
+    return tree
+
+
+def invalidate_course_trees(course_ids):
+    get_cache().delete_many([TREE_KEY.format(course_id=course_id) for course_id in course_ids])
+
+
+def get_course_tree_stats():
+    cache = get_cache()
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / total if total else 0,
+    }
@@ -0,0 +1,196 @@
+import hashlib
+import os
+import tempfile
+import threading
+from io import BytesIO
+
+from django.conf import settings
+from PIL import Image
+from reportlab import rl_config
+from reportlab.lib.pagesizes import letter, landscape
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+# Потоки PDF пишутся в двоичном виде, без текстовой обёртки ASCII85: её кодирование на чистом Python
+# занимало почти всё время генерации (фон перекодировался в каждом сертификате), а PDF становился больше
+rl_config.useA85 = 0
+
+# Увеличивается при изменении раскладки текста, чтобы версия шаблона менялась вместе с ней
+LAYOUT_VERSION = 1
+
+FONTS = {
+    'DejaVuSans': 'DejaVuSans.ttf',
+    'DejaVuSans-Bold': 'DejaVuSans-Bold.ttf',
+}
+
+offset = 100
+offsetY = 100
+
+_lock = threading.Lock()
+_fonts_registered = False
+_templates = {}
+# Шаблон процесса-исполнителя пакетной выдачи, готовится один раз при его запуске
+_worker_template = None
+
+
+def get_fonts_dir():
+    return os.path.join(settings.BASE_DIR, 'fonts')
+
+
+def register_fonts(fonts_dir=None):
+    """Регистрирует шрифты один раз на процесс (раньше это происходило при импорте api/utils.py)."""
+    global _fonts_registered
+    if _fonts_registered:
+        return
+    with _lock:
+        if not _fonts_registered:
+            fonts_dir = fonts_dir or get_fonts_dir()
+            for name, filename in FONTS.items():
+                pdfmetrics.registerFont(TTFont(name, os.path.join(fonts_dir, filename)))
+            _fonts_registered = True
+
+
+def get_background_image_path():
+    return os.path.join(settings.STATIC_ROOT, 'images', 'background.jpg')
+
+
+class CertificateTemplate:
+    """
+    Подготовленный шаблон сертификата: фон один раз приводится к нужному размеру,
+    кодируется в JPEG и сохраняется во временный файл. Canvas.drawImage встраивает
+    JPEG из файла как есть (DCTDecode), без декодирования, поэтому для каждого
+    сертификата фон только копируется на страницу, а поверх рисуется текст.
+    """
+
+    def __init__(self, background_path, page_size=landscape(letter), max_background_width=None):
+        self.background_path = background_path
+        self.page_size = page_size
+        self.max_background_width = max_background_width
+        self.version = None
+        self.prepared_background_path = None
+        self._background_data = None
+
+    def prepare(self):
+        with open(self.background_path, 'rb') as background_file:
+            data = background_file.read()
+
+        image = Image.open(BytesIO(data))
+        if image.format != 'JPEG' or (self.max_background_width and image.width > self.max_background_width):
+            # Фон уменьшается до нужной ширины один раз, а не при каждой генерации
+            image = image.convert('RGB')
+            if self.max_background_width and image.width > self.max_background_width:
+                height = round(image.height * self.max_background_width / image.width)
+                image = image.resize((self.max_background_width, height), Image.LANCZOS)
+            buffer = BytesIO()
+            image.save(buffer, format='JPEG', quality=85, optimize=True)
+            data = buffer.getvalue()
+
+        digest = hashlib.sha1(data).hexdigest()[:12]
+        self.version = f'{LAYOUT_VERSION}-{digest}'
+        self._background_data = data
+        # Имя файла зависит от содержимого: процессы с одинаковым фоном делят один файл.
+        # Расширение .jpg обязательно — по нему ReportLab встраивает JPEG без перекодирования
+        self.prepared_background_path = os.path.join(tempfile.gettempdir(), f'certificate-background-{digest}.jpg')
+        self._write_background()
+        return self
+
+    def _write_background(self):
+        """Записывает подготовленный фон, если файла нет (в том числе после очистки временного каталога)."""
+        if os.path.exists(self.prepared_background_path):
+            return
+        fd, temp_path = tempfile.mkstemp(suffix='.jpg', dir=os.path.dirname(self.prepared_background_path))
+        with os.fdopen(fd, 'wb') as temp_file:
+            temp_file.write(self._background_data)
+        os.replace(temp_path, self.prepared_background_path)
+
+    def render(self, output, full_name, course_title, date_str, prepared=True):
+        """
+        Рисует сертификат в output (путь или файловый объект). prepared=False рисует
+        фон из исходного файла, как раньше, — используется для сравнения в бенчмарке.
+        """
+        register_fonts()
+        c = canvas.Canvas(output, pagesize=self.page_size)
+        width, height = self.page_size
+
+        # Добавляем фоновое изображение
+        if prepared:
+            self._write_background()
+            c.drawImage(self.prepared_background_path, 0, 0, width=width, height=height)
+        else:
+            c.drawImage(self.background_path, 0, 0, width=width, height=height)
+
+        # Заголовок сертификата
+        c.setFont('DejaVuSans', 30)
+        c.setFillColorRGB(0, 0, 0)  # Черный цвет текста
+        c.drawCentredString(width / 2.0 + offset, height - 100 - offsetY, "СЕРТИФИКАТ")
+
+        # Основной текст сертификата
+        c.setFont('DejaVuSans', 20)
+        c.drawCentredString(width / 2.0 + offset, height - 180 - offsetY, "Настоящий сертификат подтверждает, что")
+
+        # Имя студента жирным шрифтом
+        c.setFont('DejaVuSans-Bold', 30)
+        c.drawCentredString(width / 2.0 + offset, height - 220 - offsetY, full_name)
+
+        # Текст о завершении курса
+        c.setFont('DejaVuSans', 20)
+        c.drawCentredString(width / 2.0 + offset, height - 280 - offsetY, "успешно завершил/а курс")
+
+        # Название курса жирным шрифтом
+        c.setFont('DejaVuSans-Bold', 30)
+        c.drawCentredString(width / 2.0 + offset, height - 320 - offsetY, course_title)
+
+        # Добавление ссылки внизу страницы
+        c.setFont('DejaVuSans', 12)
+        c.drawString(30, 30, "https://escience.ru")
+
+        # Добавление даты внизу справа
+        c.drawRightString(width - 30, 30, date_str)
+
+        c.save()
+
+
+def get_certificate_template(background_path=None):
+    """
+    Возвращает подготовленный шаблон из кэша процесса. Шаблон пересобирается,
+    если файл фона изменился (ключ — путь, время изменения и размер).
+    """
+    background_path = background_path or get_background_image_path()
+    stat = os.stat(background_path)
+    key = (background_path, stat.st_mtime_ns, stat.st_size)
+
+    template = _templates.get(key)
+    if template is None:
+        with _lock:
+            template = _templates.get(key)
+            if template is None:
+                template = CertificateTemplate(
+                    background_path, max_background_width=settings.CERTIFICATE_BACKGROUND_MAX_WIDTH
+                ).prepare()
+                _templates.clear()
+                _templates[key] = template
+    return template
+
+
+def warm_up():
+    """Готовит шрифты и шаблон заранее, чтобы первая генерация не платила за них."""
+    register_fonts()
+    return get_certificate_template()
+
+
+def init_render_worker(background_path, max_background_width, fonts_dir):
+    """
+    Инициализатор процесса в пуле пакетной выдачи (api/issuance.py). Не обращается
+    к настройкам Django, поэтому работает и при запуске исполнителей через spawn.
+    """
+    global _worker_template
+    register_fonts(fonts_dir)
+    _worker_template = CertificateTemplate(background_path, max_background_width=max_background_width).prepare()
+
+
+def render_batch(items):
+    """Рисует пачку сертификатов в процессе-исполнителе: items — кортежи (путь, имя, курс, дата)."""
+    for file_path, full_name, course_title, date_str in items:
+        _worker_template.render(file_path, full_name, course_title, date_str)
+    return len(items)
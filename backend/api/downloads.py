@@ -0,0 +1,139 @@
+import mimetypes
+import os
+import posixpath
+import re
+from stat import S_ISREG
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+# Каталоги MEDIA_ROOT, которые отдаются только через представления с проверкой прав
+PRIVATE_MEDIA_DIRS = ('certificates/',)
+
+CHUNK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _content_disposition(filename, as_attachment):
+    disposition = 'attachment' if as_attachment else 'inline'
+    return f"{disposition}; filename*=UTF-8''{quote(filename)}"
+
+
+def _parse_range(header, size):
+    """
+    Разбирает заголовок Range. Возвращает (start, end) включительно, None — если
+    диапазон не задан или составной (тогда отдаётся весь файл), 'unsatisfiable' — если
+    диапазон за пределами файла.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # bytes=-N — последние N байт
+        length = int(last)
+        if length == 0:
+            return 'unsatisfiable'
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return 'unsatisfiable'
+    return start, end
+
+
+def _iter_file(path, start, length):
+    with open(path, 'rb') as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _accel_response(name, filename, as_attachment):
+    response = HttpResponse()
+    response['X-Accel-Redirect'] = settings.FILE_ACCEL_REDIRECT_PREFIX + quote(name)
+    # Тип определит nginx по расширению, Django не должен подставлять text/html
+    del response['Content-Type']
+    response['Content-Disposition'] = _content_disposition(filename, as_attachment)
+    return response
+
+
+def _file_response(request, path, filename, as_attachment):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise Http404('Файл не найден.')
+    if not S_ISREG(stat.st_mode):
+        # Каталог или специальный файл: open() упал бы с IsADirectoryError
+        raise Http404('Файл не найден.')
+
+    size = stat.st_size
+    etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+    last_modified = int(stat.st_mtime)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        byte_range = _parse_range(request.headers.get('Range'), size)
+        if_range = request.headers.get('If-Range')
+        if byte_range is not None and if_range:
+            # If-Range: диапазон отдаётся, только если файл не изменился, иначе — весь файл
+            if_range_date = parse_http_date_safe(if_range)
+            if if_range != etag and (if_range_date is None or if_range_date < last_modified):
+                byte_range = None
+
+        if byte_range == 'unsatisfiable':
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+        elif byte_range is not None:
+            start, end = byte_range
+            response = StreamingHttpResponse(_iter_file(path, start, end - start + 1), status=206)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = str(end - start + 1)
+            response['Content-Type'] = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+            response['Content-Disposition'] = _content_disposition(filename, as_attachment)
+        else:
+            response = FileResponse(open(path, 'rb'), as_attachment=as_attachment, filename=filename)
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def serve_file(request, name, filename=None, as_attachment=False):
+    """
+    Отдаёт файл из MEDIA_ROOT по относительному имени. Проверку прав делает
+    вызывающее представление. В режиме x-accel отвечает только заголовками, а файл
+    (вместе с Range и условными запросами) отдаёт nginx; в режиме django файл
+    отдаётся потоком с поддержкой Range, If-Range, ETag и Last-Modified.
+    """
+    media_root = os.path.realpath(settings.MEDIA_ROOT)
+    path = os.path.realpath(os.path.join(media_root, name))
+    if os.path.commonpath([media_root, path]) != media_root:
+        raise Http404('Файл не найден.')
+
+    filename = filename or os.path.basename(path)
+    if settings.FILE_DELIVERY_MODE == 'x-accel':
+        return _accel_response(os.path.relpath(path, media_root).replace(os.sep, '/'), filename, as_attachment)
+    return _file_response(request, path, filename, as_attachment)
+
+
+@require_safe
+def serve_media(request, path):
+    """Публичные файлы MEDIA_URL (аватарки); приватные каталоги отдаются только через API."""
+    # normpath убирает завершающий слеш, поэтому сам каталог сравнивается по имени без него
+    normalized = posixpath.normpath(path)
+    if any(normalized == directory.rstrip('/') or normalized.startswith(directory)
+           for directory in PRIVATE_MEDIA_DIRS):
+        raise Http404('Файл не найден.')
+    return serve_file(request, path)
@@ -0,0 +1,169 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models import Count, F, Max, Q
+
+from .cache import invalidate_course_trees
+from .models import ORDER_GAP, Course, CourseProgress, Step, recalculate_completed_steps_counts
+from .search import index_steps, remove_step_documents
+
+STEP_FIELDS = ('order', 'step_type', 'content')
+
+_bulk_step_removal = ContextVar('bulk_step_removal', default=False)
+
+
+def content_changed(*course_ids):
+    """Увеличивает версию содержимого курсов и сбрасывает их деревья в кэше."""
+    course_ids = [course_id for course_id in set(course_ids) if course_id is not None]
+    if not course_ids:
+        return
+    Course.objects.filter(pk__in=course_ids).touch_content()
+    invalidate_course_trees(course_ids)
+
+
+def next_order(siblings):
+    """Ключ порядка для нового элемента в конце списка siblings."""
+    last = siblings.aggregate(last=Max('order'))['last']
+    return ORDER_GAP if last is None else last + ORDER_GAP
+
+
+def rebalance(items):
+    """
+    Перенумеровывает items (модули или уроки одного родителя, в нужном порядке)
+    с шагом ORDER_GAP. Записываются только строки, ключ которых изменился.
+    """
+    changed = []
+    for position, item in enumerate(items, start=1):
+        if item.order != position * ORDER_GAP:
+            item.order = position * ORDER_GAP
+            changed.append(item)
+    if changed:
+        type(changed[0]).objects.bulk_update(changed, ['order'])
+    return changed
+
+
+def move_item(item, siblings, after):
+    """
+    Ставит item сразу после after (или в начало, если after — None) среди siblings —
+    queryset элементов того же родителя. Новый ключ берётся посередине между
+    соседями, так что обычно меняется одна строка; если промежутка не осталось,
+    родитель перенумеровывается целиком. Вызывается под блокировкой родителя.
+    """
+    others = siblings.exclude(pk=item.pk).order_by('order', 'pk')
+    if after is None:
+        low, following = 0, others.first()
+    else:
+        low = after.order
+        following = others.filter(Q(order__gt=after.order) | Q(order=after.order, pk__gt=after.pk)).first()
+    high = following.order if following is not None else low + 2 * ORDER_GAP
+
+    if high - low >= 2:
+        item.order = (low + high) // 2
+        siblings.filter(pk=item.pk).update(order=item.order)
+        return [item]
+
+    items = list(others)
+    position = 0 if after is None else next(index for index, other in enumerate(items) if other.pk == after.pk) + 1
+    items.insert(position, item)
+    return rebalance(items)
+
+
+class StepRemoval:
+    """
+    Учёт удаления многих шагов сразу — то же, что сигналы делают для одного шага:
+    счётчики шагов курсов и завершённых шагов прогрессов, версия и кэш дерева
+    курсов, поисковый индекс. Создаётся до удаления шагов steps (queryset),
+    finish() вызывается после. Пока идёт удаление, сигналы отдельных шагов ничего
+    не делают (см. is_bulk_step_removal).
+    """
+
+    def __init__(self, steps):
+        CompletedStep = CourseProgress.completed_steps.through
+        self.course_counts = dict(
+            steps.order_by().values_list('lesson__module__course_id').annotate(total=Count('pk'))
+        )
+        self.progress_ids = list(
+            CompletedStep.objects.filter(step__in=steps).values_list('courseprogress_id', flat=True).distinct()
+        )
+        # Строки FTS удаляются, пока документы шагов ещё на месте
+        remove_step_documents(steps)
+
+    def finish(self):
+        for course_id, total in self.course_counts.items():
+            Course.objects.filter(pk=course_id).update(steps_count=F('steps_count') - total)
+        if self.progress_ids:
+            recalculate_completed_steps_counts(self.progress_ids)
+        content_changed(*self.course_counts)
+
+
+def is_bulk_step_removal():
+    """Идёт удаление через delete_steps: сигналы отдельных шагов пропускают учёт."""
+    return _bulk_step_removal.get()
+
+
+@contextmanager
+def bulk_step_removal(steps):
+    """Блок, в котором удаляются шаги steps; учёт выполняется один раз после блока."""
+    removal = StepRemoval(steps)
+    token = _bulk_step_removal.set(True)
+    try:
+        yield removal
+    finally:
+        _bulk_step_removal.reset(token)
+    removal.finish()
+
+
+def delete_steps(steps):
+    """
+    Удаляет шаги (queryset) обычным delete(): ссылки current_step, завершённые шаги
+    и поисковые документы убирает Collector, а счётчики, версию курсов и индекс
+    обновляет StepRemoval фиксированным числом запросов вместо сигналов на каждый шаг.
+    Возвращает число удалённых объектов.
+    """
+    with bulk_step_removal(steps):
+        return steps.delete()[0]
+
+
+def sync_lesson_steps(lesson, items, existing):
+    """
+    Приводит шаги урока к списку items из редактора: шаги без id создаются,
+    изменённые обновляются, отсутствующие в списке удаляются, порядок задаётся
+    позицией в списке. Всё делается пачками (bulk_create, bulk_update), поэтому
+    число запросов не зависит от числа шагов. existing — текущие шаги урока {id: Step}.
+    Вызывается внутри транзакции под блокировкой урока.
+
+    Возвращает шаги урока в новом порядке.
+    """
+    created, updated, steps = [], [], []
+    for order, item in enumerate(items):
+        step_id = item.get('id')
+        if step_id is None:
+            step = Step(lesson=lesson, order=order, step_type=item['step_type'], content=item['content'])
+            created.append(step)
+        else:
+            step = existing[step_id]
+            values = {'order': order, 'step_type': item['step_type'], 'content': item['content']}
+            if any(getattr(step, field) != value for field, value in values.items()):
+                for field, value in values.items():
+                    setattr(step, field, value)
+                updated.append(step)
+        steps.append(step)
+
+    kept = {item['id'] for item in items if item.get('id') is not None}
+    deleted = [step_id for step_id in existing if step_id not in kept]
+
+    if deleted:
+        delete_steps(Step.objects.filter(pk__in=deleted))
+    if updated:
+        Step.objects.bulk_update(updated, STEP_FIELDS)
+    if created:
+        Step.objects.bulk_create(created)
+
+    if created or updated:
+        course_id = lesson.module.course_id
+        # bulk_create и bulk_update не вызывают сигналы, поэтому счётчик шагов, версия курса и поиск обновляются здесь
+        if created:
+            Course.objects.filter(pk=course_id).update(steps_count=F('steps_count') + len(created))
+        content_changed(course_id)
+        index_steps(created + updated, course_id)
+    return steps
@@ -0,0 +1,34 @@
+import django_filters
+
+from .models import Course, Tag, User
+
+
+class CourseFilter(django_filters.FilterSet):
+    tag = django_filters.ModelMultipleChoiceFilter(
+        field_name='tags', queryset=Tag.objects.all(), distinct=True, label='Теги (id)'
+    )
+    tag_name = django_filters.CharFilter(field_name='tags__name', lookup_expr='iexact', distinct=True,
+                                         label='Тег (имя)')
+    price_min = django_filters.NumberFilter(field_name='price', lookup_expr='gte', label='Цена от')
+    price_max = django_filters.NumberFilter(field_name='price', lookup_expr='lte', label='Цена до')
+    author = django_filters.ModelChoiceFilter(queryset=User.objects.all(), label='Автор')
+    enrolled = django_filters.BooleanFilter(method='filter_enrolled', label='Записан')
+    favorite = django_filters.BooleanFilter(method='filter_favorite', label='В избранном')
+
+    class Meta:
+        model = Course
+        fields = ['tag', 'tag_name', 'price_min', 'price_max', 'author', 'enrolled', 'favorite']
+
+    def _filter_user_relation(self, queryset, relation, value):
+        user = getattr(self.request, 'user', None)
+        if not user or not user.is_authenticated:
+            return queryset.none() if value else queryset
+        if value:
+            return queryset.filter(**{relation: user})
+        return queryset.exclude(**{relation: user})
+
+    def filter_enrolled(self, queryset, name, value):
+        return self._filter_user_relation(queryset, 'students', value)
+
+    def filter_favorite(self, queryset, name, value):
+        return self._filter_user_relation(queryset, 'favorites', value)
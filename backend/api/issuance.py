@@ -0,0 +1,96 @@
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from django.conf import settings
+
+from .certificates import get_certificate_template, get_fonts_dir, init_render_worker, render_batch
+from .models import Certificate, User
+from .utils import get_certificate_filename
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def get_users_without_certificate(course):
+    """Пользователи, завершившие курс, но ещё не получившие сертификат."""
+    return (
+        User.objects.filter(course_progress__course=course, course_progress__completed=True)
+        .exclude(certificates__course=course)
+        .order_by('pk')
+    )
+
+
+def issue_course_certificates(course, workers=None, batch_size=50, log=None):
+    """
+    Выдаёт сертификаты всем, кто завершил курс и ещё не получил сертификат.
+    PDF рисуются пачками в пуле процессов, строки Certificate создаются через
+    bulk_create после каждой готовой пачки, поэтому прерванный запуск можно
+    просто повторить — он продолжит с оставшихся пользователей.
+    Возвращает словарь с количеством выданных сертификатов и скоростью выдачи.
+    """
+    started = time.perf_counter()
+    log = log or (lambda message: None)
+
+    users = list(get_users_without_certificate(course))
+    if not users:
+        return {'issued': 0, 'elapsed': 0.0, 'per_second': 0.0}
+
+    template = get_certificate_template()
+    os.makedirs(os.path.join(settings.MEDIA_ROOT, 'certificates'), exist_ok=True)
+    date_str = datetime.now().strftime("%d.%m.%Y")
+
+    # PDF рисуются во временные файлы и переименовываются в итоговые только для созданных строк:
+    # сертификат, выданный тем временем задачей или другим запуском, сохраняет свой файл
+    run_suffix = f'.{uuid.uuid4().hex}.tmp'
+    issued = 0
+    # spawn: исполнители не наследуют потоки и соединения с базой родительского процесса
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=init_render_worker,
+        initargs=(template.background_path, template.max_background_width, get_fonts_dir()),
+    ) as executor:
+        futures = {}
+        for batch in _chunks(users, batch_size):
+            # Пользователи, получившие сертификат после выборки списка, в пачку уже не попадают
+            batch = list(get_users_without_certificate(course).filter(pk__in=[user.pk for user in batch]))
+            if not batch:
+                continue
+            items = [
+                (os.path.join(settings.MEDIA_ROOT, get_certificate_filename(user, course)) + run_suffix,
+                 user.get_full_name(), course.title, date_str)
+                for user in batch
+            ]
+            futures[executor.submit(render_batch, items)] = batch
+
+        for future in as_completed(futures):
+            future.result()
+            batch = futures[future]
+            # ignore_conflicts молча пропускает уже выданные сертификаты, поэтому созданные
+            # строки определяются по сертификатам пачки до и после вставки
+            existing = Certificate.objects.filter(course=course, user__in=batch).values_list('user_id', flat=True)
+            before = set(existing)
+            Certificate.objects.bulk_create([
+                Certificate(user=user, course=course, file=get_certificate_filename(user, course),
+                            template_version=template.version)
+                for user in batch
+            ], ignore_conflicts=True)
+            created = set(existing.all()) - before
+
+            for user in batch:
+                path = os.path.join(settings.MEDIA_ROOT, get_certificate_filename(user, course))
+                if user.pk in created:
+                    os.replace(path + run_suffix, path)
+                else:
+                    os.remove(path + run_suffix)
+            issued += len(created)
+            log(f'Выдано {issued} из {len(users)}')
+
+    elapsed = time.perf_counter() - started
+    return {'issued': issued, 'elapsed': elapsed, 'per_second': issued / elapsed if elapsed else 0.0}
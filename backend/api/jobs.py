@@ -0,0 +1,135 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .certificates import get_certificate_template, warm_up
+from .models import Certificate, CertificateJob
+from .utils import generate_certificate
+
+logger = logging.getLogger(__name__)
+
+# Задача «в работе» дольше этого времени считается брошенной упавшим исполнителем
+STALE_JOB_TIMEOUT = timedelta(minutes=10)
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.CERTIFICATE_JOB_WORKERS,
+                                       thread_name_prefix='certificate-job', initializer=warm_up_quietly)
+    return _executor
+
+
+def warm_up_quietly():
+    try:
+        warm_up()
+    except Exception:
+        # Ошибка шаблона проявится в самой задаче и попадёт в её статус
+        logger.exception('Не удалось подготовить шаблон сертификата')
+
+
+def claim_job(job_id):
+    """Атомарно переводит задачу из очереди в работу; None, если её уже забрал другой исполнитель."""
+    claimed = CertificateJob.objects.filter(
+        pk=job_id, status=CertificateJob.STATUS_PENDING
+    ).update(status=CertificateJob.STATUS_RUNNING, updated_at=timezone.now())
+    if not claimed:
+        return None
+    return CertificateJob.objects.select_related('user', 'course').get(pk=job_id)
+
+
+def run_certificate_job(job_id):
+    job = claim_job(job_id)
+    if job is None:
+        return None
+
+    try:
+        certificate = Certificate.objects.filter(user=job.user, course=job.course).first()
+        if certificate is None:
+            template = get_certificate_template()
+            certificate_path = generate_certificate(job.user, job.course, template)
+            # Сертификат мог успеть выдать пакетный запуск (api/issuance.py) — пара (user, course) уникальна
+            certificate, _ = Certificate.objects.get_or_create(
+                user=job.user, course=job.course,
+                defaults={'file': certificate_path, 'template_version': template.version},
+            )
+        job.certificate = certificate
+        job.status = CertificateJob.STATUS_DONE
+        job.error = ''
+    except Exception as error:
+        logger.exception('Не удалось сгенерировать сертификат (задача %s)', job_id)
+        job.status = CertificateJob.STATUS_FAILED
+        job.error = str(error)
+
+    job.save(update_fields=['certificate', 'status', 'error', 'updated_at'])
+    return job
+
+
+def _run_in_thread(job_id):
+    try:
+        run_certificate_job(job_id)
+    finally:
+        # Соединения с базой привязаны к потоку, закрываем их после задачи
+        connections.close_all()
+
+
+def enqueue_certificate_job(job):
+    """
+    Ставит задачу на выполнение после коммита транзакции. Режим задаёт
+    CERTIFICATE_JOBS_MODE: thread — пул потоков веб-процесса, worker — отдельный
+    процесс (manage.py process_certificate_jobs), sync — сразу (тесты, отладка).
+    """
+    mode = settings.CERTIFICATE_JOBS_MODE
+    if mode == 'worker':
+        return
+    if mode == 'sync':
+        transaction.on_commit(lambda: run_certificate_job(job.pk))
+    else:
+        transaction.on_commit(lambda: get_executor().submit(_run_in_thread, job.pk))
+
+
+def requeue_stale_jobs(older_than):
+    """Возвращает в очередь задачи, зависшие в работе (например, после падения процесса)."""
+    return CertificateJob.objects.filter(
+        status=CertificateJob.STATUS_RUNNING, updated_at__lt=timezone.now() - older_than
+    ).update(status=CertificateJob.STATUS_PENDING)
+
+
+def resume_lost_job(job):
+    """
+    В режиме thread очередь живёт только в пуле потоков веб-процесса и теряется при его
+    перезапуске (в том числе по max_requests gunicorn). Зависшая дольше STALE_JOB_TIMEOUT
+    задача возвращается в очередь и отправляется в пул заново; вызывается при запросе
+    статуса задачи. Повторная отправка безопасна: claim_job выполнит задачу один раз.
+    """
+    if settings.CERTIFICATE_JOBS_MODE != 'thread':
+        return False
+    waiting = (CertificateJob.STATUS_PENDING, CertificateJob.STATUS_RUNNING)
+    stale_before = timezone.now() - STALE_JOB_TIMEOUT
+    if job.status not in waiting or job.updated_at >= stale_before:
+        return False
+
+    now = timezone.now()
+    resumed = CertificateJob.objects.filter(pk=job.pk, status__in=waiting, updated_at__lt=stale_before).update(
+        status=CertificateJob.STATUS_PENDING, updated_at=now
+    )
+    if not resumed:
+        return False
+    job.status, job.updated_at = CertificateJob.STATUS_PENDING, now
+    transaction.on_commit(lambda: get_executor().submit(_run_in_thread, job.pk))
+    return True
+
+
+def run_pending_jobs(limit=None):
+    job_ids = CertificateJob.objects.filter(status=CertificateJob.STATUS_PENDING).order_by('created_at')
+    job_ids = job_ids.values_list('id', flat=True)
+    if limit:
+        job_ids = job_ids[:limit]
+    return sum(1 for job_id in list(job_ids) if run_certificate_job(job_id) is not None)
+
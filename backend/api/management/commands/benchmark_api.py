@@ -0,0 +1,113 @@
+import json
+import statistics
+import time
+
+from django.db import connection, transaction
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.models import CourseProgress, Lesson
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, round(percent / 100 * (len(values) - 1)))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет задержку (p50/p95) и число SQL-запросов ключевых эндпоинтов API на текущей базе '
+        '(например, после seed_data). Все изменения откатываются. С --baseline сравнивает с сохранённым '
+        'результатом и завершается ошибкой при регрессии.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=3, help='Прогревочные запросы, не входящие в замер')
+        parser.add_argument('--output', help='Сохранить результат в JSON-файл')
+        parser.add_argument('--baseline', help='JSON-файл с прошлым результатом для сравнения')
+        parser.add_argument('--tolerance', type=float, default=1.5,
+                            help='Во сколько раз p95 может превысить базовый без ошибки')
+        parser.add_argument('--min-delta', type=float, default=5.0,
+                            help='Рост p95 меньше этого числа миллисекунд не считается регрессией (шум)')
+
+    def get_endpoints(self):
+        """Берёт пользователя с незавершённым прогрессом — на нём есть что читать и куда писать."""
+        progress = (
+            CourseProgress.objects.filter(completed=False, course__steps_count__gt=0)
+            .select_related('user').order_by('pk').first()
+        )
+        if progress is None:
+            raise CommandError('Нет данных для замера, сначала запустите seed_data')
+
+        course_id = progress.course_id
+        lesson = Lesson.objects.filter(module__course_id=course_id).select_related('module').order_by(
+            'module__order', 'order').first()
+        step_id = lesson.steps.order_by('order').values_list('pk', flat=True).first()
+        lesson_url = f'/api/courses/{course_id}/modules/{lesson.module_id}/lessons/{lesson.id}'
+
+        return progress.user, [
+            ('courses', 'get', '/api/courses/', None),
+            ('course steps', 'get', f'{lesson_url}/steps/', None),
+            ('progress GET', 'get', f'/api/courses/{course_id}/progress/', None),
+            ('progress POST', 'post', f'/api/courses/{course_id}/progress/', {'step_id': step_id}),
+            ('user courses', 'get', '/api/user/courses/', None),
+        ]
+
+    def measure(self, client, method, url, data, iterations, warmup):
+        timings, queries = [], []
+        for iteration in range(warmup + iterations):
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                response = getattr(client, method)(url, data, format='json')
+                elapsed = (time.perf_counter() - started) * 1000
+            if response.status_code >= 400:
+                raise CommandError(f'{method.upper()} {url}: {response.status_code} {response.content[:200]!r}')
+            if iteration >= warmup:
+                timings.append(elapsed)
+                queries.append(len(context.captured_queries))
+        return {
+            'p50': percentile(timings, 50),
+            'p95': percentile(timings, 95),
+            'mean': statistics.mean(timings),
+            'queries': max(queries),
+        }
+
+    def handle(self, *args, **options):
+        results = {}
+        with transaction.atomic():
+            user, endpoints = self.get_endpoints()
+            client = APIClient(HTTP_HOST='localhost')
+            client.force_authenticate(user)
+
+            for name, method, url, data in endpoints:
+                results[name] = self.measure(client, method, url, data, options['iterations'], options['warmup'])
+            # Замер не должен менять данные (POST прогресса)
+            transaction.set_rollback(True)
+
+        baseline = {}
+        if options['baseline']:
+            with open(options['baseline']) as baseline_file:
+                baseline = json.load(baseline_file)
+
+        regressions = []
+        self.stdout.write(f'{"эндпоинт":<16} {"p50, мс":>9} {"p95, мс":>9} {"запросов":>9}')
+        for name, result in results.items():
+            line = f'{name:<16} {result["p50"]:>9.1f} {result["p95"]:>9.1f} {result["queries"]:>9}'
+            previous = baseline.get(name)
+            if previous:
+                line += f'   (было: p95 {previous["p95"]:.1f}, запросов {previous["queries"]})'
+                if result['queries'] > previous['queries']:
+                    regressions.append(f'{name}: запросов {previous["queries"]} -> {result["queries"]}')
+                slower = result['p95'] - previous['p95']
+                if result['p95'] > previous['p95'] * options['tolerance'] and slower > options['min_delta']:
+                    regressions.append(f'{name}: p95 {previous["p95"]:.1f} -> {result["p95"]:.1f} мс')
+            self.stdout.write(line)
+
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                json.dump(results, output_file, indent=2, ensure_ascii=False)
+
+        if regressions:
+            raise CommandError('Регрессия производительности:\n' + '\n'.join(regressions))
@@ -0,0 +1,52 @@
+import statistics
+import time
+import tracemalloc
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+
+from api.certificates import CertificateTemplate, get_background_image_path, get_certificate_template, register_fonts
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает время и память генерации сертификата: исходный фон против подготовленного шаблона'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=20, help='Сколько сертификатов рендерить в каждом режиме')
+        parser.add_argument('--memory-count', type=int, default=3,
+                            help='Сколько сертификатов рендерить под tracemalloc (он сильно замедляет работу)')
+
+    def handle(self, *args, **options):
+        register_fonts()
+
+        started = time.perf_counter()
+        template = get_certificate_template()
+        prepare_ms = (time.perf_counter() - started) * 1000
+        legacy = CertificateTemplate(get_background_image_path())
+
+        self.stdout.write(f'Версия шаблона: {template.version}, подготовка: {prepare_ms:.1f} мс')
+        self.stdout.write(f'{"режим":<10} {"среднее, мс":>12} {"p95, мс":>10} {"пик памяти, КиБ":>16} {"размер, КиБ":>12}')
+
+        for name, render in (
+            ('legacy', lambda output: legacy.render(output, 'Иван Иванов', 'Основы HTML', '01.01.2024',
+                                                     prepared=False)),
+            ('template', lambda output: template.render(output, 'Иван Иванов', 'Основы HTML', '01.01.2024')),
+        ):
+            timings = []
+            for _ in range(options['count']):
+                output = BytesIO()
+                started = time.perf_counter()
+                render(output)
+                timings.append((time.perf_counter() - started) * 1000)
+
+            tracemalloc.start()
+            for _ in range(options['memory_count']):
+                render(BytesIO())
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            p95 = sorted(timings)[max(0, round(len(timings) * 0.95) - 1)]
+            self.stdout.write(
+                f'{name:<10} {statistics.mean(timings):>12.1f} {p95:>10.1f} '
+                f'{peak / 1024:>16.0f} {len(output.getvalue()) / 1024:>12.0f}'
+            )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.models import ProgressIdempotencyKey
+
+
+class Command(BaseCommand):
+    help = 'Удаляет просроченные ключи Idempotency-Key запросов прогресса (старше PROGRESS_IDEMPOTENCY_KEY_TTL)'
+
+    def handle(self, *args, **options):
+        deleted, _ = ProgressIdempotencyKey.objects.expired().delete()
+        self.stdout.write(self.style.SUCCESS(f'Удалено ключей: {deleted}'))
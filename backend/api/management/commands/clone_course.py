@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.cloning import clone_course
+from api.models import Course, User
+
+
+class Command(BaseCommand):
+    help = 'Копирует курс с модулями, уроками, шагами и тегами'
+
+    def add_arguments(self, parser):
+        parser.add_argument('course_id', type=int, help='ID исходного курса')
+        parser.add_argument('--title', help='Название копии (по умолчанию «<название> (копия)»)')
+        parser.add_argument('--author', help='Имя пользователя автора копии (по умолчанию автор исходного курса)')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Сколько шагов вставлять за один запрос')
+
+    def handle(self, *args, **options):
+        course = Course.objects.filter(pk=options['course_id']).first()
+        if course is None:
+            raise CommandError(f'Курс не найден: {options["course_id"]}')
+
+        author = None
+        if options['author']:
+            author = User.objects.filter(username=options['author']).first()
+            if author is None:
+                raise CommandError(f'Пользователь не найден: {options["author"]}')
+
+        clone, stats = clone_course(course, author=author, title=options['title'], batch_size=options['batch_size'])
+        rows = stats['tags'] + stats['modules'] + stats['lessons'] + stats['steps'] + 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Создан курс «{clone.title}» (id={clone.id}): модулей {stats["modules"]}, уроков {stats["lessons"]}, '
+            f'шагов {stats["steps"]}, тегов {stats["tags"]}; всего строк {rows} за {stats["elapsed"]:.2f} с'
+        ))
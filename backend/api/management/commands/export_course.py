@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.archive import write_course_archive
+from api.models import Course
+
+
+class Command(BaseCommand):
+    help = 'Выгружает курс с модулями, уроками, шагами, тегами и аватаркой в zip-архив'
+
+    def add_arguments(self, parser):
+        parser.add_argument('course_id', type=int, help='ID курса')
+        parser.add_argument('--output', help='Путь к архиву (по умолчанию course-<id>.zip)')
+
+    def handle(self, *args, **options):
+        course = Course.objects.filter(pk=options['course_id']).first()
+        if course is None:
+            raise CommandError(f'Курс не найден: {options["course_id"]}')
+
+        output = options['output'] or f'course-{course.id}.zip'
+        with open(output, 'wb') as fileobj:
+            write_course_archive(course, fileobj)
+        self.stdout.write(self.style.SUCCESS(f'Курс «{course.title}» выгружен в {output}'))
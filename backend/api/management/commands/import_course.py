@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.archive import CourseArchiveError, read_course_archive
+from api.models import User
+
+
+class Command(BaseCommand):
+    help = 'Создаёт курс из zip-архива, выгруженного командой export_course'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к архиву')
+        parser.add_argument('--author', required=True, help='Имя пользователя автора курса')
+        parser.add_argument('--title', help='Название курса (по умолчанию — из архива)')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Сколько шагов вставлять за один запрос')
+
+    def handle(self, *args, **options):
+        author = User.objects.filter(username=options['author']).first()
+        if author is None:
+            raise CommandError(f'Пользователь не найден: {options["author"]}')
+
+        try:
+            with open(options['path'], 'rb') as fileobj:
+                course, stats = read_course_archive(
+                    fileobj, author, title=options['title'], batch_size=options['batch_size']
+                )
+        except (OSError, CourseArchiveError) as error:
+            raise CommandError(str(error))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Создан курс «{course.title}» (id={course.id}): модулей {stats["modules"]}, уроков {stats["lessons"]}, '
+            f'шагов {stats["steps"]}, тегов {stats["tags"]} за {stats["elapsed"]:.2f} с'
+        ))
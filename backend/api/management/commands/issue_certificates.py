@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.issuance import issue_course_certificates
+from api.models import Course
+
+
+class Command(BaseCommand):
+    help = 'Выдаёт сертификаты всем, кто завершил курс и ещё не получил сертификат'
+
+    def add_arguments(self, parser):
+        parser.add_argument('course_ids', nargs='+', type=int, help='ID курсов')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Количество процессов (по умолчанию — число ядер)')
+        parser.add_argument('--batch-size', type=int, default=50, help='Сколько сертификатов рисовать за одну пачку')
+
+    def handle(self, *args, **options):
+        courses = Course.objects.in_bulk(options['course_ids'])
+        missing = set(options['course_ids']) - set(courses)
+        if missing:
+            raise CommandError(f'Курсы не найдены: {", ".join(map(str, sorted(missing)))}')
+
+        for course_id in options['course_ids']:
+            course = courses[course_id]
+            self.stdout.write(f'Курс «{course.title}» (id={course.id})')
+            stats = issue_course_certificates(
+                course, workers=options['workers'], batch_size=options['batch_size'], log=self.stdout.write
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f'Выдано сертификатов: {stats["issued"]} за {stats["elapsed"]:.2f} с '
+                f'({stats["per_second"]:.1f} серт./с)'
+            ))
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.utils import OperationalError
+
+
+class Command(BaseCommand):
+    help = 'Подготовка к запуску: ждёт базу и применяет миграции. Запускается один раз перед веб-контейнерами'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wait', type=float, default=30.0, help='Сколько секунд ждать доступности базы')
+        parser.add_argument('--collectstatic', action='store_true', help='Дополнительно собрать статику')
+
+    def handle(self, *args, **options):
+        self.wait_for_database(options['wait'])
+        call_command('migrate', interactive=False, verbosity=options['verbosity'])
+        if options['collectstatic']:
+            call_command('collectstatic', interactive=False, verbosity=options['verbosity'])
+        self.stdout.write(self.style.SUCCESS('Подготовка завершена'))
+
+    def wait_for_database(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                connection.ensure_connection()
+                return
+            except OperationalError as error:
+                if time.monotonic() >= deadline:
+                    raise CommandError(f'База данных недоступна: {error}')
+                self.stdout.write('База данных недоступна, повтор через 1 с...')
+                connection.close()
+                time.sleep(1)
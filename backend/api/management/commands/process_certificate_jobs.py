@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.jobs import STALE_JOB_TIMEOUT, requeue_stale_jobs, run_pending_jobs, warm_up_quietly
+
+
+class Command(BaseCommand):
+    help = 'Обрабатывает очередь задач генерации сертификатов (режим CERTIFICATE_JOBS_MODE=worker)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Обработать очередь один раз и выйти')
+        parser.add_argument('--interval', type=float, default=2.0, help='Пауза между опросами очереди, сек.')
+        parser.add_argument('--batch', type=int, default=20, help='Сколько задач брать за один опрос')
+
+    def handle(self, *args, **options):
+        warm_up_quietly()
+        while True:
+            requeued = requeue_stale_jobs(STALE_JOB_TIMEOUT)
+            if requeued:
+                self.stdout.write(f'Возвращено в очередь зависших задач: {requeued}')
+
+            processed = run_pending_jobs(limit=options['batch'])
+            if processed:
+                self.stdout.write(f'Обработано задач: {processed}')
+
+            if options['once']:
+                break
+            if not processed:
+                time.sleep(options['interval'])
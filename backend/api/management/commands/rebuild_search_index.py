@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.models import Course
+from api.search import index_courses
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает поисковый индекс курсов и шагов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('course_ids', nargs='*', type=int, help='ID курсов (по умолчанию все)')
+        parser.add_argument('--courses-per-batch', type=int, default=100,
+                            help='Сколько курсов переиндексировать в одной транзакции')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Сколько документов вставлять за один запрос')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        course_ids = options['course_ids'] or list(Course.objects.order_by('pk').values_list('pk', flat=True))
+        size = options['courses_per_batch']
+
+        documents = 0
+        for start in range(0, len(course_ids), size):
+            with transaction.atomic():
+                documents += index_courses(course_ids[start:start + size], options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано курсов {len(course_ids)}, документов {documents} '
+            f'за {time.perf_counter() - started:.2f} с'
+        ))
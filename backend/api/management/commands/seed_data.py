@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import User
+from api.seed import SEED_PREFIX, SeedGenerator, flush_seed_data
+
+
+class Command(BaseCommand):
+    help = 'Генерирует большой детерминированный набор данных (курсы, пользователи, прогресс) через bulk_create'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, help='Зерно генератора: одинаковое зерно — одинаковые данные')
+        parser.add_argument('--courses', type=int, default=1000)
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--courses-per-user', type=int, default=5, help='На сколько курсов записан пользователь')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Размер пачки bulk_create')
+        parser.add_argument('--flush', action='store_true', help='Удалить ранее сгенерированные данные перед запуском')
+
+    def handle(self, *args, **options):
+        if options['flush']:
+            self.stdout.write(f'Удалено объектов: {flush_seed_data()}')
+        elif User.objects.filter(username__startswith=SEED_PREFIX).exists():
+            raise CommandError('Сгенерированные данные уже есть, используйте --flush')
+
+        started = time.perf_counter()
+        stats = SeedGenerator(
+            seed=options['seed'], courses=options['courses'], users=options['users'],
+            courses_per_user=options['courses_per_user'], batch_size=options['batch_size'], log=self.stdout.write,
+        ).run()
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {elapsed:.1f} с: пользователей {stats["users"]}, курсов {stats["courses"]}, '
+            f'шагов {stats["steps"]}, записей прогресса {stats["progress"]}, '
+            f'завершённых шагов {stats["completed_steps"]}'
+        ))
@@ -0,0 +1,205 @@
+import json
+import logging
+import threading
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework import serializers
+
+logger = logging.getLogger('api.metrics')
+
+# Границы корзин гистограмм, секунды
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Счётчики одного запроса: число и время SQL-запросов, время сериализации."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self._serialize_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # execute_wrapper соединения: вызывается на каждый SQL-запрос
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+    def server_timing(self, total):
+        return (
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries", '
+            f'serialize;dur={self.serialize_time * 1000:.1f}, '
+            f'total;dur={total * 1000:.1f}'
+        )
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+
+class MetricsRegistry:
+    """
+    Гистограммы по маршрутам в памяти процесса. Каждый воркер gunicorn ведёт свою
+    копию, поэтому Prometheus должен опрашивать воркеры по отдельности или
+    агрегировать по instance.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def observe(self, route, method, status, total, metrics):
+        key = (route, method)
+        with self._lock:
+            route_metrics = self._routes.get(key)
+            if route_metrics is None:
+                route_metrics = self._routes[key] = {
+                    'duration': Histogram(DURATION_BUCKETS),
+                    'db': Histogram(DURATION_BUCKETS),
+                    'serialize': Histogram(DURATION_BUCKETS),
+                    'queries': 0,
+                    'statuses': {},
+                }
+            route_metrics['duration'].observe(total)
+            route_metrics['db'].observe(metrics.db_time)
+            route_metrics['serialize'].observe(metrics.serialize_time)
+            route_metrics['queries'] += metrics.queries
+            route_metrics['statuses'][status] = route_metrics['statuses'].get(status, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+    def render(self):
+        """Текстовый формат экспозиции Prometheus 0.0.4."""
+        histograms = (
+            ('api_request_duration_seconds', 'duration', 'Полное время обработки запроса'),
+            ('api_request_db_seconds', 'db', 'Время SQL-запросов за запрос'),
+            ('api_request_serialize_seconds', 'serialize', 'Время сериализации DRF за запрос'),
+        )
+        with self._lock:
+            routes = sorted(self._routes.items())
+            lines = []
+            for name, field, description in histograms:
+                lines += [f'# HELP {name} {description}', f'# TYPE {name} histogram']
+                for (route, method), route_metrics in routes:
+                    labels = f'route="{_escape(route)}",method="{method}"'
+                    histogram = route_metrics[field]
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+                    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                    lines.append(f'{name}_sum{{{labels}}} {histogram.sum:.6f}')
+                    lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+
+            lines += ['# HELP api_db_queries_total Количество SQL-запросов', '# TYPE api_db_queries_total counter']
+            for (route, method), route_metrics in routes:
+                lines.append(f'api_db_queries_total{{route="{_escape(route)}",method="{method}"}} '
+                             f'{route_metrics["queries"]}')
+
+            lines += ['# HELP api_requests_total Количество запросов', '# TYPE api_requests_total counter']
+            for (route, method), route_metrics in routes:
+                for status, count in sorted(route_metrics['statuses'].items()):
+                    lines.append(f'api_requests_total{{route="{_escape(route)}",method="{method}",'
+                                 f'status="{status}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+registry = MetricsRegistry()
+
+
+def _timed_property(prop):
+    def timed(self):
+        metrics = _current.get()
+        if metrics is None:
+            return prop.fget(self)
+        metrics._serialize_depth += 1
+        started = time.perf_counter()
+        try:
+            return prop.fget(self)
+        finally:
+            metrics._serialize_depth -= 1
+            # Вложенные сериализаторы уже учтены во внешнем
+            if not metrics._serialize_depth:
+                metrics.serialize_time += time.perf_counter() - started
+
+    timed.metrics_wrapped = True
+    return property(timed)
+
+
+def _install_serializer_timing():
+    """Оборачивает .data сериализаторов DRF. Ставится только при включённых метриках."""
+    for serializer_class in (serializers.Serializer, serializers.ListSerializer):
+        prop = serializer_class.__dict__['data']
+        if not getattr(prop.fget, 'metrics_wrapped', False):
+            serializer_class.data = _timed_property(prop)
+
+
+class RequestMetricsMiddleware:
+    """
+    Замеряет число и время SQL-запросов, время сериализации и полное время запроса.
+    Отдаёт их в заголовке Server-Timing, пишет строку JSON в лог api.metrics и копит
+    гистограммы по маршрутам для /api/metrics/. Включается REQUEST_METRICS_ENABLED;
+    выключенный middleware Django убирает из цепочки (MiddlewareNotUsed).
+    """
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        _install_serializer_timing()
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        total = time.perf_counter() - metrics.started
+        match = request.resolver_match
+        route = match.view_name if match else 'unmatched'
+
+        response['Server-Timing'] = metrics.server_timing(total)
+        registry.observe(route, request.method, response.status_code, total, metrics)
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'route': route,
+            'status': response.status_code,
+            'queries': metrics.queries,
+            'db_ms': round(metrics.db_time * 1000, 2),
+            'serialize_ms': round(metrics.serialize_time * 1000, 2),
+            'total_ms': round(total * 1000, 2),
+        }, ensure_ascii=False))
+        return response
@@ -0,0 +1,49 @@
+# Generated by Django 5.0.7 on 2026-10-18 15:37
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_steps_counts(apps, schema_editor):
+    Course = apps.get_model('api', 'Course')
+    Step = apps.get_model('api', 'Step')
+    CourseProgress = apps.get_model('api', 'CourseProgress')
+    CompletedSteps = CourseProgress.completed_steps.through
+
+    steps = (
+        Step.objects.filter(lesson__module__course=OuterRef('pk'))
+        .values('lesson__module__course')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    Course.objects.update(steps_count=Coalesce(Subquery(steps), 0))
+
+    completed = (
+        CompletedSteps.objects.filter(courseprogress_id=OuterRef('pk'))
+        .values('courseprogress_id')
+        .annotate(total=Count('step_id'))
+        .values('total')
+    )
+    CourseProgress.objects.update(completed_steps_count=Coalesce(Subquery(completed), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_certificate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='steps_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество шагов'),
+        ),
+        migrations.AddField(
+            model_name='courseprogress',
+            name='completed_steps_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество завершённых шагов'),
+        ),
+        migrations.RunPython(fill_steps_counts, migrations.RunPython.noop),
+    ]
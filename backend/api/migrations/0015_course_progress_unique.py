@@ -0,0 +1,70 @@
+# Generated by Django 5.0.7 on 2026-10-18 15:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_progress(apps, schema_editor):
+    """Сливает дубликаты прогресса (user, course) в самую раннюю запись перед добавлением ограничения."""
+    CourseProgress = apps.get_model('api', 'CourseProgress')
+    CompletedStep = CourseProgress.completed_steps.through
+
+    duplicates = (
+        CourseProgress.objects.values('user_id', 'course_id')
+        .annotate(total=Count('id'), keep_id=Min('id'))
+        .filter(total__gt=1)
+    )
+    for duplicate in duplicates:
+        keep = CourseProgress.objects.get(pk=duplicate['keep_id'])
+        others = CourseProgress.objects.filter(
+            user_id=duplicate['user_id'], course_id=duplicate['course_id']
+        ).exclude(pk=keep.pk)
+
+        step_ids = set(CompletedStep.objects.filter(courseprogress__in=others).values_list('step_id', flat=True))
+        CompletedStep.objects.bulk_create(
+            [CompletedStep(courseprogress_id=keep.pk, step_id=step_id) for step_id in step_ids],
+            ignore_conflicts=True,
+        )
+        keep.completed = keep.completed or others.filter(completed=True).exists()
+        keep.completed_steps_count = CompletedStep.objects.filter(courseprogress_id=keep.pk).count()
+        keep.save(update_fields=['completed', 'completed_steps_count'])
+        others.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_course_content_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_progress, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='ProgressIdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255, verbose_name='Ключ')),
+                ('response', models.JSONField(default=dict, verbose_name='Ответ')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+            ],
+            options={
+                'verbose_name': 'Ключ идемпотентности',
+                'verbose_name_plural': 'Ключи идемпотентности',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='courseprogress',
+            constraint=models.UniqueConstraint(fields=('user', 'course'), name='unique_course_progress_per_user'),
+        ),
+        migrations.AddField(
+            model_name='progressidempotencykey',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='progress_idempotency_keys', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AddConstraint(
+            model_name='progressidempotencykey',
+            constraint=models.UniqueConstraint(fields=('user', 'key'), name='unique_progress_idempotency_key'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.7 on 2026-10-18 15:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_certificatejob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='certificate',
+            name='template_version',
+            field=models.CharField(blank=True, max_length=50, verbose_name='Версия шаблона'),
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.0.7 on 2026-10-18 15:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def remove_duplicate_certificates(apps, schema_editor):
+    """Оставляет последний сертификат для каждой пары (user, course) перед добавлением ограничения."""
+    Certificate = apps.get_model('api', 'Certificate')
+    CertificateJob = apps.get_model('api', 'CertificateJob')
+
+    duplicates = (
+        Certificate.objects.values('user_id', 'course_id')
+        .annotate(total=Count('id'), keep_id=Max('id'))
+        .filter(total__gt=1)
+    )
+    for duplicate in duplicates:
+        others = Certificate.objects.filter(
+            user_id=duplicate['user_id'], course_id=duplicate['course_id']
+        ).exclude(pk=duplicate['keep_id'])
+        CertificateJob.objects.filter(certificate__in=others).update(certificate_id=duplicate['keep_id'])
+        others.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_certificate_template_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_certificates, migrations.RunPython.noop),
+        # Сначала создаются составные индексы, затем удаляются покрытые ими одиночные индексы внешних ключей
+        migrations.AddIndex(
+            model_name='courseprogress',
+            index=models.Index(fields=['user', 'completed'], name='progress_user_completed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lesson',
+            index=models.Index(fields=['module', 'order'], name='lesson_module_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='module',
+            index=models.Index(fields=['course', 'order'], name='module_course_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='step',
+            index=models.Index(fields=['lesson', 'order'], name='step_lesson_order_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='certificate',
+            constraint=models.UniqueConstraint(fields=('user', 'course'), name='unique_certificate_per_user'),
+        ),
+        migrations.AlterField(
+            model_name='certificate',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='certificates', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AlterField(
+            model_name='courseprogress',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='course_progress', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AlterField(
+            model_name='lesson',
+            name='module',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='lessons', to='api.module', verbose_name='Модуль'),
+        ),
+        migrations.AlterField(
+            model_name='module',
+            name='course',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='modules', to='api.course', verbose_name='Курс'),
+        ),
+        migrations.AlterField(
+            model_name='step',
+            name='lesson',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='steps', to='api.lesson', verbose_name='Урок'),
+        ),
+    ]
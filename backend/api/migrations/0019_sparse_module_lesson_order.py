@@ -0,0 +1,31 @@
+from django.db import migrations
+
+ORDER_GAP = 1024
+
+
+def spread_orders(apps, schema_editor):
+    """Разносит порядок модулей и уроков с шагом ORDER_GAP, сохраняя текущую последовательность."""
+    for model_name, parent_field in (('Module', 'course_id'), ('Lesson', 'module_id')):
+        model = apps.get_model('api', model_name)
+        items = list(model.objects.order_by(parent_field, 'order', 'pk').only('pk', parent_field, 'order'))
+        changed = []
+        parent, position = None, 0
+        for item in items:
+            if getattr(item, parent_field) != parent:
+                parent, position = getattr(item, parent_field), 0
+            position += 1
+            if item.order != position * ORDER_GAP:
+                item.order = position * ORDER_GAP
+                changed.append(item)
+        model.objects.bulk_update(changed, ['order'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(spread_orders, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,188 @@
+# Generated by Django 5.0.7 on 2026-10-18 16:21
+
+import html
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils.html import strip_tags
+
+
+# В SQLite — таблица FTS5 с уже приведёнными к основам словами (api/search.py),
+# в Postgres — вычисляемый tsvector, где заголовок весит больше текста (A и B)
+SQLITE_SQL = [
+    "CREATE VIRTUAL TABLE api_searchdocument_fts USING fts5(title, body, tokenize = 'unicode61 remove_diacritics 0')",
+]
+POSTGRES_SQL = [
+    "ALTER TABLE api_searchdocument ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('russian', title), 'A') || setweight(to_tsvector('russian', body), 'B')) STORED",
+    'CREATE INDEX api_searchdocument_vector_idx ON api_searchdocument USING gin (search_vector)',
+]
+
+
+def create_search_index(apps, schema_editor):
+    """Индекс зависит от базы, поэтому создаётся SQL-запросами, а не полями модели."""
+    vendor = schema_editor.connection.vendor
+    for sql in SQLITE_SQL if vendor == 'sqlite' else POSTGRES_SQL if vendor == 'postgresql' else []:
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE api_searchdocument_fts')
+
+
+# Копия стеммера и извлечения текста из api/search.py на момент миграции: историческая
+# миграция не должна меняться вместе с кодом приложения
+WORD_RE = re.compile(r'\w+')
+
+VOWELS = 'аеиоуыэюя'
+PERFECTIVE_GERUND_RE = re.compile(r'(?:(?<=[ая])(?:в|вши|вшись)|ив|ивши|ившись|ыв|ывши|ывшись)$')
+REFLEXIVE_RE = re.compile(r'(?:ся|сь)$')
+ADJECTIVAL_RE = re.compile(
+    r'(?:(?<=[ая])(?:ем|нн|вш|ющ|щ)|ивш|ывш|ующ)?'
+    r'(?:ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых|ую|юю|ая|яя|ою|ею)$'
+)
+VERB_RE = re.compile(
+    r'(?:(?<=[ая])(?:ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)'
+    r'|ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)$'
+)
+NOUN_RE = re.compile(
+    r'(?:а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем|ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$'
+)
+DERIVATIONAL_RE = re.compile(r'ость?$')
+SUPERLATIVE_RE = re.compile(r'ейше?$')
+
+
+def _region_after_vowel(word, start):
+    """Позиция после первой согласной, следующей за гласной (начиная со start)."""
+    for index in range(start + 1, len(word)):
+        if word[index] not in VOWELS and word[index - 1] in VOWELS:
+            return index + 1
+    return len(word)
+
+
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    rv = next((index + 1 for index, char in enumerate(word) if char in VOWELS), len(word))
+    r2 = _region_after_vowel(word, _region_after_vowel(word, 0))
+    prefix, ending = word[:rv], word[rv:]
+
+    match = PERFECTIVE_GERUND_RE.search(ending)
+    if match:
+        ending = ending[:match.start()]
+    else:
+        ending = REFLEXIVE_RE.sub('', ending)
+        for pattern in (ADJECTIVAL_RE, VERB_RE, NOUN_RE):
+            match = pattern.search(ending)
+            if match:
+                ending = ending[:match.start()]
+                break
+
+    if ending.endswith('и'):
+        ending = ending[:-1]
+
+    match = DERIVATIONAL_RE.search(ending)
+    if match and rv + match.start() >= r2:
+        ending = ending[:match.start()]
+
+    match = SUPERLATIVE_RE.search(ending)
+    if match:
+        ending = ending[:match.start()]
+    if ending.endswith('нн'):
+        ending = ending[:-1]
+    elif not match and ending.endswith('ь'):
+        ending = ending[:-1]
+    return prefix + ending
+
+
+def stem_text(text):
+    return ' '.join(stem(word) for word in WORD_RE.findall(text))
+
+
+def html_to_text(value):
+    return html.unescape(strip_tags(value or '')).strip()
+
+
+def step_text(step_type, content):
+    """Текст шага для поиска: HTML без тегов, вопрос с вариантами ответов; у видео текста нет."""
+    content = content if isinstance(content, dict) else {}
+    if step_type == 'text':
+        return html_to_text(content.get('html'))
+    if step_type == 'question':
+        answers = content.get('answers') if isinstance(content.get('answers'), list) else []
+        return ' '.join(html_to_text(str(part)) for part in [content.get('question', ''), *answers])
+    return ''
+
+
+def index_existing_courses(apps, schema_editor, batch_size=2000):
+    Course = apps.get_model('api', 'Course')
+    Step = apps.get_model('api', 'Step')
+    SearchDocument = apps.get_model('api', 'SearchDocument')
+    CourseTag = Course.tags.through
+    sqlite = schema_editor.connection.vendor == 'sqlite'
+
+    def save(batch):
+        documents = SearchDocument.objects.bulk_create(batch)
+        if sqlite:
+            with schema_editor.connection.cursor() as cursor:
+                cursor.executemany(
+                    'INSERT INTO api_searchdocument_fts (rowid, title, body) VALUES (%s, %s, %s)',
+                    [(document.pk, stem_text(document.title), stem_text(document.body)) for document in documents],
+                )
+
+    tags = {}
+    for course_id, name in CourseTag.objects.values_list('course_id', 'tag__name').iterator(chunk_size=batch_size):
+        tags.setdefault(course_id, []).append(name)
+
+    batch = []
+    rows = Course.objects.values_list('id', 'title', 'description').iterator(chunk_size=batch_size)
+    for course_id, title, description in rows:
+        batch.append(SearchDocument(course_id=course_id, title=title[:255],
+                                    body=' '.join([description, *tags.get(course_id, [])])))
+        if len(batch) >= batch_size:
+            save(batch)
+            batch = []
+
+    rows = Step.objects.values_list('id', 'lesson__module__course_id', 'step_type', 'content').iterator(
+        chunk_size=batch_size
+    )
+    for step_id, course_id, step_type, content in rows:
+        text = step_text(step_type, content)
+        if text:
+            batch.append(SearchDocument(course_id=course_id, step_id=step_id, body=text))
+        if len(batch) >= batch_size:
+            save(batch)
+            batch = []
+    if batch:
+        save(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_sparse_module_lesson_order'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(blank=True, max_length=255, verbose_name='Заголовок')),
+                ('body', models.TextField(blank=True, verbose_name='Текст')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_documents', to='api.course', verbose_name='Курс')),
+                ('step', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='search_document', to='api.step', verbose_name='Шаг')),
+            ],
+            options={
+                'verbose_name': 'Поисковый документ',
+                'verbose_name_plural': 'Поисковые документы',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchdocument',
+            constraint=models.UniqueConstraint(condition=models.Q(('step__isnull', True)), fields=('course',), name='unique_course_search_document'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(index_existing_courses, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 5.0.7 on 2026-10-18 16:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_search_documents'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='certificate',
+            options={'verbose_name': 'Сертификат', 'verbose_name_plural': 'Сертификаты'},
+        ),
+        migrations.AlterModelOptions(
+            name='courseprogress',
+            options={'verbose_name': 'Прогресс курса', 'verbose_name_plural': 'Прогрессы курсов'},
+        ),
+        migrations.AlterModelOptions(
+            name='module',
+            options={'ordering': ['order'], 'verbose_name': 'Модуль', 'verbose_name_plural': 'Модули'},
+        ),
+        migrations.AlterModelOptions(
+            name='step',
+            options={'ordering': ['order'], 'verbose_name': 'Шаг', 'verbose_name_plural': 'Шаги'},
+        ),
+        migrations.AlterField(
+            model_name='certificate',
+            name='course',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='certificates', to='api.course', verbose_name='Курс'),
+        ),
+        migrations.AlterField(
+            model_name='certificate',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, verbose_name='Дата создания'),
+        ),
+        migrations.AlterField(
+            model_name='certificate',
+            name='file',
+            field=models.FileField(upload_to='certificates/', verbose_name='Файл'),
+        ),
+        migrations.AlterField(
+            model_name='course',
+            name='price',
+            field=models.PositiveIntegerField(default=0, verbose_name='Цена'),
+        ),
+        migrations.AlterField(
+            model_name='courseprogress',
+            name='completed',
+            field=models.BooleanField(default=False, verbose_name='Завершён'),
+        ),
+        migrations.AlterField(
+            model_name='courseprogress',
+            name='completed_steps',
+            field=models.ManyToManyField(blank=True, related_name='completed_by', to='api.step', verbose_name='Завершённые шаги'),
+        ),
+        migrations.AlterField(
+            model_name='courseprogress',
+            name='course',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='progress', to='api.course', verbose_name='Курс'),
+        ),
+        migrations.AlterField(
+            model_name='courseprogress',
+            name='current_lesson',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='api.lesson', verbose_name='Текущий урок'),
+        ),
+        migrations.AlterField(
+            model_name='courseprogress',
+            name='current_module',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='api.module', verbose_name='Текущий модуль'),
+        ),
+        migrations.AlterField(
+            model_name='courseprogress',
+            name='current_step',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='api.step', verbose_name='Текущий шаг'),
+        ),
+        migrations.AlterField(
+            model_name='module',
+            name='order',
+            field=models.PositiveIntegerField(default=0, verbose_name='Порядок модуля'),
+        ),
+        migrations.AlterField(
+            model_name='step',
+            name='step_type',
+            field=models.CharField(choices=[('text', 'Текст'), ('video', 'Видео'), ('question', 'Вопрос')], max_length=10, verbose_name='Тип шага'),
+        ),
+    ]
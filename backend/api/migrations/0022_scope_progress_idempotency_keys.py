@@ -0,0 +1,51 @@
+# Generated by Django 5.0.7 on 2026-10-18 19:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def delete_keys(apps, schema_editor):
+    # Старые ключи не привязаны к курсу и эндпоинту; это кеш ответов на ретраи, его можно сбросить
+    apps.get_model('api', 'ProgressIdempotencyKey').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0021_sync_model_state'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_keys, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name='progressidempotencykey',
+            name='unique_progress_idempotency_key',
+        ),
+        migrations.AddField(
+            model_name='progressidempotencykey',
+            name='course',
+            field=models.ForeignKey(default=None, on_delete=django.db.models.deletion.CASCADE, related_name='progress_idempotency_keys', to='api.course', verbose_name='Курс'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='progressidempotencykey',
+            name='endpoint',
+            field=models.CharField(default='', max_length=50, verbose_name='Эндпоинт'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='progressidempotencykey',
+            name='request_hash',
+            field=models.CharField(default='', max_length=64, verbose_name='Хеш запроса'),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='progressidempotencykey',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата создания'),
+        ),
+        migrations.AddConstraint(
+            model_name='progressidempotencykey',
+            constraint=models.UniqueConstraint(fields=('user', 'key', 'course', 'endpoint'), name='unique_progress_idempotency_key'),
+        ),
+    ]
@@ -0,0 +1,144 @@
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from .cache import get_course_tree
+from .editor import content_changed, move_item, next_order, rebalance
+from .models import Course
+from .serializers import MoveSerializer, ReorderSerializer
+
+
+class ConditionalContentMixin:
+    """
+    Поддержка условных GET (ETag / If-None-Match, Last-Modified / If-Modified-Since)
+    для чтения содержимого курса. Состояние берётся из Course.content_version одним
+    запросом, поэтому на 304 не выполняется ни выборка объектов, ни сериализация.
+
+    Наследник задаёт content_course_lookup — пару (lookup курса, kwarg из URL),
+    например ('modules__id', 'module_pk').
+    """
+    content_course_lookup = None
+    conditional_actions = ('list', 'retrieve')
+
+    def get_content_course_queryset(self):
+        lookup, url_kwarg = self.content_course_lookup
+        return Course.objects.filter(**{lookup: self.kwargs[url_kwarg]})
+
+    def get_content_course(self):
+        """Возвращает (id, content_version, content_updated_at) курса или None."""
+        if not hasattr(self, '_content_course'):
+            self._content_course = (
+                self.get_content_course_queryset()
+                .values_list('id', 'content_version', 'content_updated_at')
+                .first()
+            )
+        return self._content_course
+
+    def get_content_state(self):
+        """Возвращает (etag, last_modified) или None, если курс не найден."""
+        state = self.get_content_course()
+        if state is None:
+            return None
+        course_id, content_version, content_updated_at = state
+        return f'"course-{course_id}-v{content_version}"', content_updated_at
+
+    def get_cached_content(self):
+        """Готовые данные ответа из кэша или None, если ответ нужно собрать из базы."""
+        return None
+
+    def _conditional_response(self, handler, request, *args, **kwargs):
+        state = self.get_content_state() if self.action in self.conditional_actions else None
+        if state is None:
+            return handler(request, *args, **kwargs)
+
+        etag, last_modified = state
+        response = get_conditional_response(
+            request, etag=etag, last_modified=int(last_modified.timestamp())
+        )
+        if response is None:
+            data = self.get_cached_content()
+            response = Response(data) if data is not None else handler(request, *args, **kwargs)
+
+        if response.status_code in (200, 304):
+            response.headers.setdefault('ETag', etag)
+            response.headers.setdefault('Last-Modified', http_date(last_modified.timestamp()))
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ['Authorization'])
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional_response(super().retrieve, request, *args, **kwargs)
+
+
+class CourseTreeCacheMixin(ConditionalContentMixin):
+    """
+    Отдаёт list/retrieve из общего кэша дерева курса (api/cache.py).
+    tree_section — раздел дерева ('modules', 'lessons' или 'steps'),
+    tree_parent_kwarg — kwarg из URL с id родителя, по которому раздел индексирован.
+    """
+    tree_section = None
+    tree_parent_kwarg = None
+
+    def get_cached_content(self):
+        course = self.get_content_course()
+        if course is None:
+            return None
+        course_id, content_version, _ = course
+
+        items = get_course_tree(course_id, content_version)[self.tree_section].get(self.kwargs[self.tree_parent_kwarg])
+        if items is None or self.action == 'list':
+            return items
+
+        # Для retrieve ищем объект в разделе; если его нет — пусть ответит база (404)
+        return next((item for item in items if str(item['id']) == self.kwargs['pk']), None)
+
+
+class OrderedChildrenMixin:
+    """
+    Порядок модулей курса или уроков модуля на разреженных ключах (api/editor.py):
+    move переставляет один элемент, меняя обычно одну строку, reorder задаёт весь
+    порядок сразу. Правки идут под блокировкой родителя, поэтому одновременные
+    перестановки в разных окнах редактора не получают одинаковые ключи.
+
+    Наследник реализует lock_order_parent() и задаёт content_course_lookup
+    (ConditionalContentMixin), по которому находится курс для сброса кэша.
+    """
+
+    def lock_order_parent(self):
+        """Блокирует и возвращает родителя (курс или модуль) из URL."""
+        raise NotImplementedError
+
+    def set_default_order(self, serializer):
+        """Без явного order новый элемент добавляется в конец. Вызывается под блокировкой родителя."""
+        if 'order' not in serializer.validated_data:
+            serializer.validated_data['order'] = next_order(self.get_queryset())
+
+    @action(detail=True, methods=['post'])
+    def move(self, request, *args, **kwargs):
+        with transaction.atomic():
+            self.lock_order_parent()
+            item = self.get_object()
+            siblings = self.get_queryset()
+            serializer = MoveSerializer(data=request.data, context={'item': item, 'siblings': siblings})
+            serializer.is_valid(raise_exception=True)
+            move_item(item, siblings, serializer.validated_data['after'])
+            content_changed(self.get_content_course()[0])
+        return Response({'id': item.pk, 'order': item.order})
+
+    @action(detail=False, methods=['put'])
+    def reorder(self, request, *args, **kwargs):
+        with transaction.atomic():
+            self.lock_order_parent()
+            siblings = list(self.get_queryset().order_by('order', 'pk'))
+            serializer = ReorderSerializer(data=request.data, context={'siblings': siblings})
+            serializer.is_valid(raise_exception=True)
+            items = serializer.validated_data['ids']
+            if rebalance(items):
+                content_changed(self.get_content_course()[0])
+        return Response([{'id': item.pk, 'order': item.order} for item in items])
@@ -1,4 +1,10 @@
+from datetime import timedelta
+
+from django.conf import settings
 from django.db import models
+from django.db.models import Count, Exists, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
 from enum import Enum
 from rest_framework.exceptions import ValidationError
@@ -55,6 +61,48 @@ class Tag(models.Model):
         verbose_name_plural = 'Теги'
 
 
+class CourseQuerySet(models.QuerySet):
+    def with_user_state(self, user):
+        """
+        Подгружает автора и теги, а для авторизованного пользователя аннотирует
+        is_favorite, is_enrolled и user_completed_steps_count, чтобы сериализатор
+        не делал запросов на каждую строку.
+        """
+        return self.select_related('author').prefetch_related('tags').annotate_user_state(user)
+
+    def annotate_user_state(self, user):
+        if not user or not user.is_authenticated:
+            return self
+
+        return self.annotate(
+            is_favorite=Exists(
+                Course.favorites.through.objects.filter(course_id=OuterRef('pk'), user_id=user.pk)
+            ),
+            is_enrolled=Exists(
+                Course.students.through.objects.filter(course_id=OuterRef('pk'), user_id=user.pk)
+            ),
+            user_completed_steps_count=Subquery(
+                CourseProgress.objects.filter(course_id=OuterRef('pk'), user_id=user.pk)
+                .order_by('pk')
+                .values('completed_steps_count')[:1]
+            ),
+        )
+
+    def touch_content(self):
+        """Отмечает изменение содержимого курсов: увеличивает версию и время изменения."""
+        return self.update(content_version=F('content_version') + 1, content_updated_at=timezone.now())
+
+    def recalculate_steps_counts(self):
+        """Пересчитывает steps_count курсов одним UPDATE (после переноса модуля или урока)."""
+        steps = (
+            Step.objects.filter(lesson__module__course_id=OuterRef('pk'))
+            .values('lesson__module__course_id')
+            .annotate(total=Count('pk'))
+            .values('total')
+        )
+        return self.update(steps_count=Coalesce(Subquery(steps), 0))
+
+
 DEFAULT_COURSE_AVATAR_URL = 'https://www.petbehaviourcompany.co.uk/images/default-course-thumbnail.png'
 
 
@@ -71,9 +119,34 @@ class Course(models.Model):
     students = models.ManyToManyField(User, related_name='enrolled_courses', blank=True, verbose_name='Студенты')
     favorites = models.ManyToManyField(User, related_name='favorite_courses', blank=True, verbose_name='Избранное')
 
+    # Денормализованный счётчик шагов курса, поддерживается сигналами из api/signals.py
+    steps_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество шагов')
+
+    # Версия содержимого курса (модули, уроки, шаги) для ETag / Last-Modified
+    content_version = models.PositiveIntegerField(default=1, editable=False, verbose_name='Версия содержимого')
+    content_updated_at = models.DateTimeField(default=timezone.now, editable=False,
+                                              verbose_name='Содержимое изменено')
+
+    # Поля, которые обновляются только запросами UPDATE и не должны затираться при save()
+    DENORMALIZED_FIELDS = ('steps_count', 'content_version', 'content_updated_at')
+
+    objects = CourseQuerySet.as_manager()
+
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.DENORMALIZED_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    def recalculate_steps_count(self):
+        self.steps_count = Step.objects.filter(lesson__module__course=self).count()
+        Course.objects.filter(pk=self.pk).update(steps_count=self.steps_count)
+
     def get_avatar_url(self):
         if self.avatar:
             return self.avatar.url
@@ -84,9 +157,16 @@ class Course(models.Model):
         verbose_name_plural = 'Курсы'
 
 
+# Шаг между ключами порядка модулей и уроков: перемещение встаёт между соседями
+# и меняет одну строку, а перенумерация нужна, только когда промежуток исчерпан
+ORDER_GAP = 1024
+
+
 class Module(models.Model):
     title = models.CharField(max_length=255, verbose_name='Название модуля')
-    course = models.ForeignKey(Course, related_name='modules', on_delete=models.CASCADE, verbose_name='Курс')
+    # Отдельный индекс по course не нужен: его покрывает составной индекс (course, order)
+    course = models.ForeignKey(Course, related_name='modules', on_delete=models.CASCADE, db_index=False,
+                               verbose_name='Курс')
 
     order = models.PositiveIntegerField(default=0, verbose_name='Порядок модуля')  # Поле для хранения порядка модуля
 
@@ -94,6 +174,9 @@ class Module(models.Model):
         ordering = ['order']
         verbose_name = 'Модуль'
         verbose_name_plural = 'Модули'
+        indexes = [
+            models.Index(fields=['course', 'order'], name='module_course_order_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.course.title})"
@@ -101,17 +184,42 @@ class Module(models.Model):
 
 class Lesson(models.Model):
     title = models.CharField(max_length=255, verbose_name='Название урока')
-    module = models.ForeignKey(Module, related_name='lessons', on_delete=models.CASCADE, verbose_name='Модуль')
+    module = models.ForeignKey(Module, related_name='lessons', on_delete=models.CASCADE, db_index=False,
+                               verbose_name='Модуль')
     order = models.PositiveIntegerField(verbose_name='Порядок')
 
     class Meta:
         ordering = ['order']
         verbose_name = 'Урок'
         verbose_name_plural = 'Уроки'
+        indexes = [
+            models.Index(fields=['module', 'order'], name='lesson_module_order_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    def get_next_in_course(self):
+        """
+        Следующий урок курса в порядке (модуль, урок) одним запросом, с id его
+        первого шага в first_step_id. Модуль урока должен быть загружен.
+        """
+        module = self.module
+        after_current = (
+            Q(module__order__gt=module.order)
+            | Q(module__order=module.order, module_id__gt=module.pk)
+            | Q(module_id=module.pk, order__gt=self.order)
+            | Q(module_id=module.pk, order=self.order, pk__gt=self.pk)
+        )
+        return (
+            Lesson.objects.filter(after_current, module__course_id=module.course_id)
+            .annotate(first_step_id=Subquery(
+                Step.objects.filter(lesson_id=OuterRef('pk')).order_by('order', 'pk').values('pk')[:1]
+            ))
+            .order_by('module__order', 'module_id', 'order', 'pk')
+            .first()
+        )
+
 
 class Step(models.Model):
     STEP_TYPES = [
@@ -120,7 +228,8 @@ class Step(models.Model):
         ('question', 'Вопрос'),
     ]
 
-    lesson = models.ForeignKey(Lesson, related_name='steps', on_delete=models.CASCADE, verbose_name='Урок')
+    lesson = models.ForeignKey(Lesson, related_name='steps', on_delete=models.CASCADE, db_index=False,
+                               verbose_name='Урок')
     order = models.PositiveIntegerField(verbose_name='Порядок')
     step_type = models.CharField(max_length=10, choices=STEP_TYPES, verbose_name='Тип шага')
 
@@ -130,25 +239,44 @@ class Step(models.Model):
         ordering = ['order']
         verbose_name = 'Шаг'
         verbose_name_plural = 'Шаги'
+        indexes = [
+            models.Index(fields=['lesson', 'order'], name='step_lesson_order_idx'),
+        ]
 
     def __str__(self):
         return f"Шаг {self.order} - {self.get_step_type_display()}"
 
     def save(self, *args, **kwargs):
-        if self.step_type == 'text':
-            if not self.content or 'html' not in self.content:
-                raise ValueError("Текстовые шаги должны содержать HTML контент.")
-        elif self.step_type == 'video':
-            if not self.content or 'video_url' not in self.content:
-                raise ValueError("Видео шаги должны содержать URL видео.")
-        elif self.step_type == 'question':
-            if not self.content or 'question' not in self.content or 'answers' not in self.content:
-                raise ValueError("Шаги с вопросами должны содержать текст вопроса и ответы.")
+        validate_step_content(self.step_type, self.content)
         super().save(*args, **kwargs)
 
 
+def validate_step_content(step_type, content):
+    """
+    Проверяет содержимое шага его типу. Вынесено из Step.save, чтобы те же правила
+    применялись и к шагам, которые создаются через bulk_create в обход save().
+    """
+    content = content if isinstance(content, dict) else {}
+    if step_type == 'text':
+        if not isinstance(content.get('html'), str):
+            raise ValueError("Текстовые шаги должны содержать HTML контент.")
+    elif step_type == 'video':
+        if not isinstance(content.get('video_url'), str):
+            raise ValueError("Видео шаги должны содержать URL видео.")
+    elif step_type == 'question':
+        if not isinstance(content.get('question'), str) or not isinstance(content.get('answers'), list):
+            raise ValueError("Шаги с вопросами должны содержать текст вопроса и ответы.")
+
+
+def calculate_progress_percentage(completed_steps_count, steps_count):
+    if not steps_count:
+        return 0
+    return (completed_steps_count / steps_count) * 100
+
+
 class CourseProgress(models.Model):
-    user = models.ForeignKey(User, related_name='course_progress', on_delete=models.CASCADE,
+    # Индекс по user покрывают ограничение (user, course) и индекс (user, completed)
+    user = models.ForeignKey(User, related_name='course_progress', on_delete=models.CASCADE, db_index=False,
                              verbose_name='Пользователь')
     course = models.ForeignKey(Course, related_name='progress', on_delete=models.CASCADE, verbose_name='Курс')
     current_module = models.ForeignKey(Module, on_delete=models.SET_NULL, null=True, blank=True,
@@ -160,58 +288,158 @@ class CourseProgress(models.Model):
                                              verbose_name='Завершённые шаги')
     completed = models.BooleanField(default=False, verbose_name='Завершён')
 
+    # Денормализованный счётчик завершённых шагов, поддерживается сигналами из api/signals.py
+    completed_steps_count = models.PositiveIntegerField(default=0, editable=False,
+                                                        verbose_name='Количество завершённых шагов')
+
     def __str__(self):
         return f"{self.user.username} - {self.course.title} Прогресс"
 
-    def update_progress(self, step):
-        if step not in self.completed_steps.all():
-            self.completed_steps.add(step)
+    def recalculate_completed_steps_count(self):
+        self.completed_steps_count = self.completed_steps.count()
+        CourseProgress.objects.filter(pk=self.pk).update(completed_steps_count=self.completed_steps_count)
 
+    def update_progress(self, step):
+        """
+        Отмечает шаг пройденным и сдвигает текущую позицию. Выполняет не больше
+        четырёх запросов независимо от размера курса: идемпотентная вставка шага,
+        подсчёт прогресса по уроку и курсу, поиск следующего урока (только если
+        текущий урок завершён) и UPDATE изменившихся столбцов.
+
+        Шаг должен быть загружен с select_related('lesson__module').
+        """
+        self.complete_steps([step])
+
+    def complete_steps(self, steps):
+        """
+        Отмечает пройденными несколько шагов одной вставкой; позиция пересчитывается
+        один раз по последнему шагу списка, как если бы шаги отправлялись по одному.
+        """
+        CompletedStep = CourseProgress.completed_steps.through
+        CompletedStep.objects.bulk_create(
+            [CompletedStep(courseprogress_id=self.pk, step_id=step.pk) for step in steps], ignore_conflicts=True
+        )
+
+        step = steps[-1]
+        lesson = step.lesson
+        module = lesson.module
+        lesson_steps, lesson_completed, completed_steps_count = (
+            Lesson.objects.filter(pk=lesson.pk)
+            .annotate(
+                lesson_steps=Count('steps', distinct=True),
+                lesson_completed=Count('steps', filter=Q(steps__completed_by=self), distinct=True),
+                completed_steps_count=Subquery(
+                    CompletedStep.objects.filter(courseprogress_id=self.pk)
+                    .values('courseprogress_id')
+                    .annotate(total=Count('pk'))
+                    .values('total')
+                ),
+            )
+            .values_list('lesson_steps', 'lesson_completed', 'completed_steps_count')
+            .get()
+        )
+
+        self.completed_steps_count = completed_steps_count or 0
         self.current_step = step
-        self.current_lesson = step.lesson
-        self.current_module = step.lesson.module
+        self.current_lesson = lesson
+        self.current_module = module
 
-        all_steps = Step.objects.filter(lesson=self.current_lesson)
-        if all_steps.count() == self.completed_steps.filter(lesson=self.current_lesson).count():
-            next_lesson = Lesson.objects.filter(module=self.current_module,
-                                                order__gt=self.current_lesson.order).order_by('order').first()
+        if lesson_completed >= lesson_steps:
+            next_lesson = lesson.get_next_in_course()
             if next_lesson:
-                self.current_lesson = next_lesson
-                self.current_step = Step.objects.filter(lesson=next_lesson).order_by('order').first()
+                self.current_module_id = next_lesson.module_id
+                self.current_lesson_id = next_lesson.pk
+                self.current_step_id = next_lesson.first_step_id
             else:
-                next_module = Module.objects.filter(course=self.course, order__gt=self.current_module.order).order_by(
-                    'order').first()
-                if next_module:
-                    self.current_module = next_module
-                    self.current_lesson = Lesson.objects.filter(module=next_module).order_by('order').first()
-                    self.current_step = Step.objects.filter(lesson=self.current_lesson).order_by('order').first()
-                else:
-                    self.completed = True
+                self.completed = True
 
-        self.save()
+        self.save(update_fields=[
+            'current_module', 'current_lesson', 'current_step', 'completed', 'completed_steps_count'
+        ])
 
     def is_course_completed(self):
-        all_steps = Step.objects.filter(lesson__module__course=self.course)
-        return all_steps.count() == self.completed_steps.count()
+        return self.course.steps_count == self.completed_steps_count
 
     def progress_percentage(self):
-        all_steps = Step.objects.filter(lesson__module__course=self.course)
-        completed_steps_count = self.completed_steps.count()
+        return calculate_progress_percentage(self.completed_steps_count, self.course.steps_count)
 
-        if not all_steps.exists():
-            return 0
-
-        return (completed_steps_count / all_steps.count()) * 100
+    @classmethod
+    def get_for_update(cls, user, course_id):
+        """
+        Возвращает прогресс пользователя по курсу, создавая его при необходимости,
+        и блокирует строку до конца транзакции. Вызывать внутри transaction.atomic().
+        """
+        progress, created = cls.objects.get_or_create(user=user, course_id=course_id)
+        return cls.objects.select_for_update().get(pk=progress.pk)
 
     class Meta:
         verbose_name = 'Прогресс курса'
         verbose_name_plural = 'Прогрессы курсов'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'course'], name='unique_course_progress_per_user'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'completed'], name='progress_user_completed_idx'),
+        ]
+
+
+def recalculate_completed_steps_counts(progress_ids):
+    """Пересчитывает счётчики завершённых шагов для указанных прогрессов одним UPDATE."""
+    completed = (
+        CourseProgress.completed_steps.through.objects
+        .filter(courseprogress_id=OuterRef('pk'))
+        .values('courseprogress_id')
+        .annotate(total=Count('step_id'))
+        .values('total')
+    )
+    CourseProgress.objects.filter(pk__in=progress_ids).update(
+        completed_steps_count=Coalesce(Subquery(completed), 0)
+    )
+
+
+class ProgressIdempotencyKeyQuerySet(models.QuerySet):
+    def expired(self):
+        """Ключи старше PROGRESS_IDEMPOTENCY_KEY_TTL: ретраи так поздно не приходят."""
+        ttl = timedelta(seconds=settings.PROGRESS_IDEMPOTENCY_KEY_TTL)
+        return self.filter(created_at__lt=timezone.now() - ttl)
+
+
+class ProgressIdempotencyKey(models.Model):
+    """
+    Ключ идемпотентности запроса на обновление прогресса и сохранённый ответ на него.
+    Ключ действует в пределах пользователя, курса и эндпоинта; request_hash — хеш тела
+    запроса, чтобы повтор ключа с другими данными не получал чужой ответ.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='progress_idempotency_keys',
+                             verbose_name='Пользователь')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='progress_idempotency_keys',
+                               verbose_name='Курс')
+    endpoint = models.CharField(max_length=50, verbose_name='Эндпоинт')
+    key = models.CharField(max_length=255, verbose_name='Ключ')
+    request_hash = models.CharField(max_length=64, verbose_name='Хеш запроса')
+    response = models.JSONField(default=dict, verbose_name='Ответ')
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата создания')
+
+    objects = ProgressIdempotencyKeyQuerySet.as_manager()
+
+    def __str__(self):
+        return f'{self.user.username} - {self.key}'
+
+    class Meta:
+        verbose_name = 'Ключ идемпотентности'
+        verbose_name_plural = 'Ключи идемпотентности'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key', 'course', 'endpoint'],
+                                    name='unique_progress_idempotency_key'),
+        ]
 
 
 class Certificate(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='certificates', verbose_name='Пользователь')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='certificates', db_index=False,
+                             verbose_name='Пользователь')
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='certificates', verbose_name='Курс')
     file = models.FileField(upload_to='certificates/', verbose_name='Файл')
+    template_version = models.CharField(max_length=50, blank=True, verbose_name='Версия шаблона')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
 
     def __str__(self):
@@ -220,3 +448,67 @@ class Certificate(models.Model):
     class Meta:
         verbose_name = 'Сертификат'
         verbose_name_plural = 'Сертификаты'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'course'], name='unique_certificate_per_user'),
+        ]
+
+
+class CertificateJob(models.Model):
+    """Фоновая задача генерации сертификата (очередь в базе, см. api/jobs.py)."""
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUSES = [
+        (STATUS_PENDING, 'В очереди'),
+        (STATUS_RUNNING, 'Выполняется'),
+        (STATUS_DONE, 'Готово'),
+        (STATUS_FAILED, 'Ошибка'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='certificate_jobs',
+                             verbose_name='Пользователь')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='certificate_jobs', verbose_name='Курс')
+    status = models.CharField(max_length=10, choices=STATUSES, default=STATUS_PENDING, verbose_name='Статус')
+    certificate = models.ForeignKey(Certificate, on_delete=models.SET_NULL, null=True, blank=True,
+                                    related_name='jobs', verbose_name='Сертификат')
+    error = models.TextField(blank=True, verbose_name='Ошибка')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата изменения')
+
+    def __str__(self):
+        return f'Задача сертификата для {self.user} - {self.course.title} ({self.get_status_display()})'
+
+    class Meta:
+        verbose_name = 'Задача генерации сертификата'
+        verbose_name_plural = 'Задачи генерации сертификатов'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'course'], name='unique_certificate_job_per_user'),
+        ]
+
+
+class SearchDocument(models.Model):
+    """
+    Текст курса или шага для полнотекстового поиска (api/search.py). Сам индекс
+    зависит от базы: в SQLite — таблица FTS5 api_searchdocument_fts, в Postgres —
+    вычисляемый столбец search_vector (tsvector) с GIN-индексом; оба создаются
+    миграцией и в модели не описаны.
+    """
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='search_documents',
+                               verbose_name='Курс')
+    # Пусто у документа самого курса (название, описание, теги)
+    step = models.OneToOneField(Step, on_delete=models.CASCADE, null=True, blank=True,
+                                related_name='search_document', verbose_name='Шаг')
+    title = models.CharField(max_length=255, blank=True, verbose_name='Заголовок')
+    body = models.TextField(blank=True, verbose_name='Текст')
+
+    def __str__(self):
+        return f'Поисковый документ {self.course_id}/{self.step_id or "-"}'
+
+    class Meta:
+        verbose_name = 'Поисковый документ'
+        verbose_name_plural = 'Поисковые документы'
+        constraints = [
+            models.UniqueConstraint(fields=['course'], condition=Q(step__isnull=True),
+                                    name='unique_course_search_document'),
+        ]
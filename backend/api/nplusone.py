@@ -0,0 +1,146 @@
+import logging
+import re
+import sys
+import traceback
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('api.nplusone')
+
+IN_LIST_RE = re.compile(r'\bIN \((?:%s, )*%s\)')
+VALUES_RE = re.compile(r'VALUES (\((?:%s, )*%s\))(?:, \((?:%s, )*%s\))+')
+SAVEPOINT_RE = re.compile(r'^(?:SAVEPOINT|RELEASE SAVEPOINT|ROLLBACK TO SAVEPOINT) ')
+
+# Кадры этих модулей не показываются в стеке: интересен код проекта, а не ORM
+_SKIP_MODULES = (__name__, 'django.', 'rest_framework.', 'asgiref.', 'contextlib', 'threading')
+
+
+class NPlusOneError(AssertionError):
+    """Повторяющиеся запросы одной формы (N+1) в строгом режиме и в тестах."""
+
+
+def normalize_sql(sql):
+    """Форма запроса: параметры уже вынесены в %s, остаётся схлопнуть списки переменной длины."""
+    sql = IN_LIST_RE.sub('IN (...)', sql)
+    return VALUES_RE.sub(r'VALUES \1, ...', sql)
+
+
+def _serializer_field(frame):
+    """Поле сериализатора DRF, при выводе которого выполнен запрос, например 'CourseSerializer.is_favorite'."""
+    while frame is not None:
+        if frame.f_code.co_name == 'to_representation' and 'field' in frame.f_locals:
+            serializer = frame.f_locals.get('self')
+            field = frame.f_locals['field']
+            name = getattr(field, 'field_name', None)
+            if serializer is not None and name:
+                return f'{type(serializer).__name__}.{name}'
+        frame = frame.f_back
+    return None
+
+
+def _is_project_frame(frame):
+    module = frame.f_globals.get('__name__', '')
+    return not module.startswith(_SKIP_MODULES) and 'site-packages' not in frame.f_code.co_filename
+
+
+def _project_stack(frame, limit=8):
+    """Последние кадры кода проекта (без ORM и DRF), от внешнего к внутреннему."""
+    frames = [(frame, lineno) for frame, lineno in traceback.walk_stack(frame) if _is_project_frame(frame)]
+    return ''.join(traceback.StackSummary.extract(reversed(frames[:limit])).format())
+
+
+class QueryShape:
+    def __init__(self, sql):
+        self.sql = sql
+        self.count = 0
+        self.field = None
+        self.stack = ''
+
+
+class NPlusOneDetector:
+    """
+    Собирает формы SQL-запросов (через execute_wrapper соединений) и находит те, что
+    выполнились threshold и более раз. Для каждой такой формы запоминает поле
+    сериализатора и стек кода проекта в момент первого повтора.
+    """
+
+    def __init__(self, threshold=None):
+        self.threshold = threshold or settings.NPLUSONE_THRESHOLD
+        self.shapes = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        if not SAVEPOINT_RE.match(sql):
+            key = normalize_sql(sql)
+            shape = self.shapes.get(key)
+            if shape is None:
+                shape = self.shapes[key] = QueryShape(key)
+            shape.count += 1
+            if shape.count == 2:
+                # Стек снимается один раз на форму — только когда запрос повторился
+                frame = sys._getframe(1)
+                shape.field = _serializer_field(frame)
+                shape.stack = _project_stack(frame)
+        return execute(sql, params, many, context)
+
+    @contextmanager
+    def capture(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+    @property
+    def violations(self):
+        return [shape for shape in self.shapes.values() if shape.count >= self.threshold]
+
+    def report(self):
+        lines = []
+        for shape in self.violations:
+            lines.append(f'{shape.count} одинаковых запросов: {shape.sql}')
+            if shape.field:
+                lines.append(f'  поле сериализатора: {shape.field}')
+            if shape.stack:
+                lines.append('  стек:\n' + shape.stack.rstrip())
+        return '\n'.join(lines)
+
+
+@contextmanager
+def assert_no_n_plus_one(threshold=None):
+    """
+    Проверка для тестов (Django TestCase и pytest):
+
+        with assert_no_n_plus_one():
+            client.get('/api/courses/')
+    """
+    detector = NPlusOneDetector(threshold)
+    with detector.capture():
+        yield detector
+    if detector.violations:
+        raise NPlusOneError('Обнаружены N+1 запросы:\n' + detector.report())
+
+
+class NPlusOneMiddleware:
+    """
+    Ищет N+1 в каждом запросе при NPLUSONE_ENABLED: пишет предупреждение в лог
+    api.nplusone, а при NPLUSONE_STRICT (для CI) выбрасывает NPlusOneError.
+    """
+
+    def __init__(self, get_response):
+        if not settings.NPLUSONE_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        detector = NPlusOneDetector()
+        with detector.capture():
+            response = self.get_response(request)
+
+        if detector.violations:
+            message = f'N+1 в {request.method} {request.path}:\n{detector.report()}'
+            if settings.NPLUSONE_STRICT:
+                raise NPlusOneError(message)
+            logger.warning(message)
+        return response
@@ -0,0 +1,144 @@
+import json
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+from rest_framework.pagination import BasePagination, Cursor, CursorPagination, _reverse_ordering
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class CourseCursorPagination(CursorPagination):
+    """
+    Курсорная (keyset) пагинация каталога: стоимость страницы не зависит от её номера,
+    а новые курсы не сдвигают уже загруженные страницы.
+
+    Цены и названия повторяются, поэтому к выбранной сортировке (?ordering=) всегда
+    добавляется id, а курсор хранит значения всех полей сортировки, и страница
+    начинается строго после них — как (price, id) > (p, i). Стандартный курсор DRF
+    помнит только первое поле и при совпадениях сдвигается на offset, что при
+    неуникальном порядке пропускает или повторяет строки.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-id',)
+    tiebreaker = '-id'
+
+    def get_ordering(self, request, queryset, view):
+        ordering = tuple(super().get_ordering(request, queryset, view))
+        if 'id' in (field.lstrip('-') for field in ordering):
+            return ordering
+        return ordering + (self.tiebreaker,)
+
+    def _get_position_from_instance(self, instance, ordering):
+        return json.dumps([getattr(instance, field.lstrip('-')) for field in ordering], ensure_ascii=False)
+
+    def _after_position(self, position, reverse):
+        """Условие «строка идёт после position» для составного ключа сортировки."""
+        values = json.loads(position)
+        conditions = []
+        for index, field in enumerate(self.ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') != reverse else 'gt'
+            equal = {other.lstrip('-'): value for other, value in zip(self.ordering[:index], values)}
+            conditions.append(Q(**equal, **{f'{name}__{lookup}': values[index]}))
+        return reduce(or_, conditions)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # Повторяет CursorPagination.paginate_queryset, кроме фильтра по позиции курсора
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        offset, reverse, current_position = self.cursor or (0, False, None)
+
+        queryset = queryset.order_by(*(_reverse_ordering(self.ordering) if reverse else self.ordering))
+        if current_position is not None:
+            try:
+                queryset = queryset.filter(self._after_position(current_position, reverse))
+            except (TypeError, ValueError, IndexError):
+                raise NotFound(self.invalid_cursor_message)
+
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_following_position = len(results) > len(self.page)
+        following_position = (
+            self._get_position_from_instance(results[-1], self.ordering) if has_following_position else None
+        )
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = current_position is not None or offset > 0
+            self.has_previous = has_following_position
+            self.next_position = current_position
+            self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = current_position is not None or offset > 0
+            self.next_position = following_position
+            self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+
+class UserCoursesCursorPagination(CursorPagination):
+    """Пагинация «Моего обучения»: отдельно для текущих и завершённых курсов (?status=)."""
+    page_size = 12
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-id',)
+
+    def get_link_after(self, request, progress_status, position):
+        """
+        Ссылка на страницу после записи position. Нужна для первых страниц, которые
+        UserCoursesView выбирает одним запросом, минуя paginate_queryset.
+        """
+        self.base_url = replace_query_param(request.build_absolute_uri(), 'status', progress_status)
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=str(position)))
+
+
+class SearchPagination(BasePagination):
+    """
+    Постраничный вывод результатов поиска (?page=, ?page_size=). Общее число совпадений
+    не считается: выбирается на одну запись больше страницы, чтобы узнать, есть ли следующая.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def _positive_int(self, request, name, default, maximum=None):
+        try:
+            value = int(request.query_params.get(name, default))
+        except (TypeError, ValueError):
+            return default
+        if value < 1:
+            return default
+        return min(value, maximum) if maximum else value
+
+    def paginate(self, request, search):
+        """search(offset, limit) возвращает список результатов; отдаётся одна страница."""
+        self.request = request
+        self.page = self._positive_int(request, 'page', 1)
+        self.size = self._positive_int(request, self.page_size_query_param, self.page_size, self.max_page_size)
+        results = search((self.page - 1) * self.size, self.size + 1)
+        self.has_next = len(results) > self.size
+        return results[:self.size]
+
+    def _page_link(self, page):
+        url = self.request.build_absolute_uri()
+        return remove_query_param(url, 'page') if page == 1 else replace_query_param(url, 'page', page)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self._page_link(self.page + 1) if self.has_next else None,
+            'previous': self._page_link(self.page - 1) if self.page > 1 else None,
+            'results': data,
+        })
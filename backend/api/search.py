@@ -0,0 +1,281 @@
+import html
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.html import strip_tags
+
+from .models import Course, SearchDocument, Step
+
+# Таблица FTS5 в SQLite: rowid совпадает с id SearchDocument (создаётся миграцией 0020)
+FTS_TABLE = 'api_searchdocument_fts'
+
+WORD_RE = re.compile(r'\w+')
+
+
+# Стеммер русского языка по алгоритму Snowball — тому же, что использует словарь
+# russian в Postgres. В SQLite индексируются и ищутся уже приведённые к основе слова.
+VOWELS = 'аеиоуыэюя'
+PERFECTIVE_GERUND_RE = re.compile(r'(?:(?<=[ая])(?:в|вши|вшись)|ив|ивши|ившись|ыв|ывши|ывшись)$')
+REFLEXIVE_RE = re.compile(r'(?:ся|сь)$')
+ADJECTIVAL_RE = re.compile(
+    r'(?:(?<=[ая])(?:ем|нн|вш|ющ|щ)|ивш|ывш|ующ)?'
+    r'(?:ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых|ую|юю|ая|яя|ою|ею)$'
+)
+VERB_RE = re.compile(
+    r'(?:(?<=[ая])(?:ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)'
+    r'|ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)$'
+)
+NOUN_RE = re.compile(
+    r'(?:а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем|ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$'
+)
+DERIVATIONAL_RE = re.compile(r'ость?$')
+SUPERLATIVE_RE = re.compile(r'ейше?$')
+
+
+def _region_after_vowel(word, start):
+    """Позиция после первой согласной, следующей за гласной (начиная со start)."""
+    for index in range(start + 1, len(word)):
+        if word[index] not in VOWELS and word[index - 1] in VOWELS:
+            return index + 1
+    return len(word)
+
+
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    rv = next((index + 1 for index, char in enumerate(word) if char in VOWELS), len(word))
+    r2 = _region_after_vowel(word, _region_after_vowel(word, 0))
+    prefix, ending = word[:rv], word[rv:]
+
+    match = PERFECTIVE_GERUND_RE.search(ending)
+    if match:
+        ending = ending[:match.start()]
+    else:
+        ending = REFLEXIVE_RE.sub('', ending)
+        for pattern in (ADJECTIVAL_RE, VERB_RE, NOUN_RE):
+            match = pattern.search(ending)
+            if match:
+                ending = ending[:match.start()]
+                break
+
+    if ending.endswith('и'):
+        ending = ending[:-1]
+
+    match = DERIVATIONAL_RE.search(ending)
+    if match and rv + match.start() >= r2:
+        ending = ending[:match.start()]
+
+    match = SUPERLATIVE_RE.search(ending)
+    if match:
+        ending = ending[:match.start()]
+    if ending.endswith('нн'):
+        ending = ending[:-1]
+    elif not match and ending.endswith('ь'):
+        ending = ending[:-1]
+    return prefix + ending
+
+
+def stem_text(text):
+    return ' '.join(stem(word) for word in WORD_RE.findall(text))
+
+
+def html_to_text(value):
+    return html.unescape(strip_tags(value or '')).strip()
+
+
+def step_text(step_type, content):
+    """Текст шага для поиска: HTML без тегов, вопрос с вариантами ответов; у видео текста нет."""
+    content = content if isinstance(content, dict) else {}
+    if step_type == 'text':
+        return html_to_text(content.get('html'))
+    if step_type == 'question':
+        answers = content.get('answers') if isinstance(content.get('answers'), list) else []
+        return ' '.join(html_to_text(str(part)) for part in [content.get('question', ''), *answers])
+    return ''
+
+
+def _course_document(course_id, title, description, tags):
+    return SearchDocument(course_id=course_id, title=title[:255], body=' '.join([description, *tags]))
+
+
+def _fts_insert(documents):
+    if connection.vendor != 'sqlite' or not documents:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, body) VALUES (%s, %s, %s)',
+            [(document.pk, stem_text(document.title), stem_text(document.body)) for document in documents],
+        )
+
+
+def _delete_documents(documents):
+    """
+    Удаляет документы и (в SQLite) их строки FTS. В Postgres вектор живёт в той же строке.
+    У SearchDocument нет сигналов и зависимых моделей, поэтому delete() — один DELETE.
+    """
+    if connection.vendor == 'sqlite':
+        sql, params = documents.values('pk').query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({sql})', params)
+    documents.delete()
+
+
+def _save_documents(documents):
+    documents = SearchDocument.objects.bulk_create(documents)
+    _fts_insert(documents)
+    return documents
+
+
+def index_course_documents(course_ids):
+    """Обновляет документы курсов (название, описание, теги) — после сохранения курса или смены тегов."""
+    course_ids = list(course_ids)
+    _delete_documents(SearchDocument.objects.filter(course_id__in=course_ids, step__isnull=True))
+
+    tags = {}
+    for course_id, name in Course.tags.through.objects.filter(course_id__in=course_ids).values_list(
+        'course_id', 'tag__name'
+    ):
+        tags.setdefault(course_id, []).append(name)
+    return _save_documents([
+        _course_document(course_id, title, description, tags.get(course_id, []))
+        for course_id, title, description in Course.objects.filter(pk__in=course_ids).values_list(
+            'id', 'title', 'description'
+        )
+    ])
+
+
+def index_steps(steps, course_id):
+    """Переиндексирует шаги одного курса — после сохранения шага или массовой правки урока."""
+    if not steps:
+        return
+    remove_step_documents([step.pk for step in steps])
+    _save_documents([
+        SearchDocument(course_id=course_id, step_id=step.pk, body=text)
+        for step in steps if (text := step_text(step.step_type, step.content))
+    ])
+
+
+def remove_step_documents(step_ids):
+    _delete_documents(SearchDocument.objects.filter(step_id__in=step_ids))
+
+
+def remove_course_documents(course_ids):
+    _delete_documents(SearchDocument.objects.filter(course_id__in=course_ids))
+
+
+def index_courses(course_ids, batch_size=2000):
+    """
+    Полностью переиндексирует курсы: для bulk-операций в обход сигналов (копирование,
+    импорт, генерация данных) и команды rebuild_search_index. Шаги читаются пачками.
+    Возвращает число созданных документов.
+    """
+    course_ids = list(course_ids)
+    remove_course_documents(course_ids)
+    created = len(index_course_documents(course_ids))
+
+    steps = (
+        Step.objects.filter(lesson__module__course_id__in=course_ids)
+        .values_list('id', 'lesson__module__course_id', 'step_type', 'content')
+        .iterator(chunk_size=batch_size)
+    )
+    batch = []
+    for step_id, course_id, step_type, content in steps:
+        text = step_text(step_type, content)
+        if text:
+            batch.append(SearchDocument(course_id=course_id, step_id=step_id, body=text))
+        if len(batch) >= batch_size:
+            created += len(_save_documents(batch))
+            batch = []
+    created += len(_save_documents(batch))
+    return created
+
+
+def _fts_match(query):
+    """Запрос FTS5: префиксы основ всех слов запроса."""
+    return ' '.join(f'"{stem(word)}"*' for word in WORD_RE.findall(query))
+
+
+def search_documents(query, offset=0, limit=20):
+    """
+    Ранжированный поиск: список (id документа, ранг), лучшие первыми. В SQLite
+    запрос приводится к основам слов и ищется по префиксам основ в FTS5 (bm25),
+    в Postgres — websearch_to_tsquery со словарём russian и ts_rank по GIN-индексу.
+    """
+    if connection.vendor == 'postgresql':
+        sql = (
+            'SELECT id, ts_rank(search_vector, query) AS rank '
+            "FROM api_searchdocument, websearch_to_tsquery('russian', %s) query "
+            'WHERE search_vector @@ query ORDER BY rank DESC, id LIMIT %s OFFSET %s'
+        )
+        params = [query, limit, offset]
+    else:
+        match = _fts_match(query)
+        if not match:
+            return []
+        # bm25 в FTS5 тем меньше, чем релевантнее документ; заголовок весит больше текста
+        sql = (
+            f'SELECT rowid, -bm25({FTS_TABLE}, 5.0, 1.0) AS score FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s ORDER BY score DESC, rowid LIMIT %s OFFSET %s'
+        )
+        params = [match, limit, offset]
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def matching_course_ids(query):
+    """
+    id курсов, в названии, описании, тегах или шагах которых найден запрос, — подзапрос
+    без ранжирования и ограничения числа совпадений (для фильтрации, например в админке).
+    """
+    if connection.vendor == 'postgresql':
+        documents = RawSQL(
+            "SELECT id FROM api_searchdocument WHERE search_vector @@ websearch_to_tsquery('russian', %s)",
+            [query],
+        )
+    else:
+        match = _fts_match(query)
+        if not match:
+            return SearchDocument.objects.none().values('course_id')
+        documents = RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match])
+    return SearchDocument.objects.filter(pk__in=documents).values('course_id')
+
+
+def make_snippet(text, query, width=160):
+    """Фрагмент текста вокруг первого найденного слова запроса."""
+    stems = [stem(word) for word in WORD_RE.findall(query)]
+    normalized = text.lower().replace('ё', 'е')
+    positions = []
+    for word in stems:
+        match = re.search(rf'\b{re.escape(word)}', normalized)
+        if match:
+            positions.append(match.start())
+    start = max(0, min(positions) - width // 4) if positions else 0
+    snippet = text[start:start + width].strip()
+    return ('…' if start else '') + snippet + ('…' if start + width < len(text) else '')
+
+
+def build_hits(ranked, query):
+    """Результаты поиска в порядке ранга: курс, шаг с уроком и модулем, фрагмент текста."""
+    documents = (
+        SearchDocument.objects.select_related('course', 'step__lesson__module')
+        .only('body', 'course__title', 'step__step_type', 'step__lesson__title', 'step__lesson__module__title')
+        .in_bulk([document_id for document_id, _ in ranked])
+    )
+    hits = []
+    for document_id, rank in ranked:
+        document = documents.get(document_id)
+        if document is None:
+            continue
+        step = document.step
+        hits.append({
+            'type': 'step' if step else 'course',
+            'rank': round(float(rank), 4),
+            'course': {'id': document.course_id, 'title': document.course.title},
+            'module': {'id': step.lesson.module_id, 'title': step.lesson.module.title} if step else None,
+            'lesson': {'id': step.lesson_id, 'title': step.lesson.title} if step else None,
+            'step': {'id': step.id, 'step_type': step.step_type} if step else None,
+            'snippet': make_snippet(document.body, query),
+        })
+    return hits
@@ -0,0 +1,199 @@
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from .models import ORDER_GAP, User, UserRole, Tag, Course, Module, Lesson, Step, CourseProgress
+from .search import index_courses
+
+# Префикс имён пользователей, созданных генератором: по нему сгенерированные данные удаляются
+SEED_PREFIX = 'seed_'
+
+TAG_NAMES = [
+    'HTML', 'CSS', 'JavaScript', 'Python', 'Django', 'React', 'SQL', 'Алгоритмы', 'Математика', 'Физика',
+    'Дизайн', 'Веб-разработка', 'Frontend', 'Backend', 'DevOps', 'Тестирование', 'Английский', 'Linux',
+    'Git', 'Безопасность',
+]
+
+
+def flush_seed_data():
+    """
+    Удаляет всё, что создал генератор: курсы, модули, уроки и шаги удаляются каскадом
+    вместе с пользователями. Сигналы шагов, уроков и модулей при удалении курса
+    целиком ничего не пересчитывают (api/signals.py), поэтому это быстро.
+    """
+    with transaction.atomic():
+        return User.objects.filter(username__startswith=SEED_PREFIX).delete()[0]
+
+
+def _batches(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _step_content(step_type, index):
+    if step_type == 'video':
+        return {'video_url': f'https://example.com/video/{index}.mp4'}
+    if step_type == 'question':
+        return {'question': f'Вопрос {index}', 'answers': ['Да', 'Нет'], 'correct_answer': 0}
+    return {'html': f'<p>Материал шага {index}</p>'}
+
+
+class SeedGenerator:
+    """
+    Детерминированный генератор больших объёмов данных: одинаковый seed и параметры
+    дают одинаковые данные. Всё создаётся через bulk_create, поэтому сигналы не
+    срабатывают — денормализованные счётчики (Course.steps_count,
+    CourseProgress.completed_steps_count) заполняются сразу при создании строк,
+    а поисковый индекс строится после вставки шагов каждой пачки курсов.
+    """
+
+    def __init__(self, seed=0, courses=1000, users=10000, courses_per_user=5, modules=(3, 6), lessons=(3, 6),
+                 steps=(5, 12), batch_size=5000, log=None):
+        self.rng = random.Random(seed)
+        self.courses = courses
+        self.users = users
+        self.courses_per_user = min(courses_per_user, courses)
+        self.modules = modules
+        self.lessons = lessons
+        self.steps = steps
+        self.batch_size = batch_size
+        self.log = log or (lambda message: None)
+        self.stats = {'users': 0, 'courses': 0, 'steps': 0, 'progress': 0, 'completed_steps': 0}
+
+    def run(self):
+        password = make_password(None)
+        tags = self.create_tags()
+        authors = self.create_users('author', max(1, self.courses // 50), password, UserRole.TEACHER.value[0])
+        users = self.create_users('user', self.users, password, UserRole.USER.value[0])
+
+        # Для каждого курса — id его шагов в порядке прохождения
+        course_steps = {}
+        for start in range(0, self.courses, 100):
+            with transaction.atomic():
+                course_steps.update(self.create_courses(range(start, min(start + 100, self.courses)), authors, tags))
+            self.log(f'Курсов: {len(course_steps)} из {self.courses}')
+
+        course_ids = list(course_steps)
+        for chunk in _batches(users, 1000):
+            with transaction.atomic():
+                self.create_progress(chunk, course_ids, course_steps)
+            self.log(f'Прогресс: {self.stats["progress"]}, завершённых шагов: {self.stats["completed_steps"]}')
+        return self.stats
+
+    def create_tags(self):
+        existing = set(Tag.objects.filter(name__in=TAG_NAMES).values_list('name', flat=True))
+        Tag.objects.bulk_create([Tag(name=name) for name in TAG_NAMES if name not in existing])
+        return list(Tag.objects.filter(name__in=TAG_NAMES).order_by('name'))
+
+    def create_users(self, kind, count, password, role):
+        users = [
+            User(username=f'{SEED_PREFIX}{kind}_{index}', email=f'{kind}_{index}@example.com', password=password,
+                 first_name=f'Имя{index}', last_name=f'Фамилия{index}', role=role)
+            for index in range(count)
+        ]
+        created = []
+        for batch in _batches(users, self.batch_size):
+            created.extend(User.objects.bulk_create(batch))
+        self.stats['users'] += len(created)
+        return created
+
+    def create_courses(self, indexes, authors, tags):
+        rng = self.rng
+        courses = []
+        shapes = []
+        for index in indexes:
+            shape = [
+                [rng.randint(*self.steps) for _ in range(rng.randint(*self.lessons))]
+                for _ in range(rng.randint(*self.modules))
+            ]
+            shapes.append(shape)
+            courses.append(Course(
+                title=f'Курс {index}', description=f'Описание курса {index}', author=rng.choice(authors),
+                price=rng.choice([0, 0, 990, 1990, 4990]), steps_count=sum(map(sum, shape)),
+            ))
+        courses = Course.objects.bulk_create(courses)
+
+        CourseTag = Course.tags.through
+        CourseTag.objects.bulk_create([
+            CourseTag(course_id=course.id, tag_id=tag.id)
+            for course in courses for tag in rng.sample(tags, rng.randint(1, 3))
+        ])
+
+        modules = Module.objects.bulk_create([
+            Module(title=f'Модуль {order + 1}', course=course, order=(order + 1) * ORDER_GAP)
+            for course, shape in zip(courses, shapes) for order in range(len(shape))
+        ])
+        module_iter = iter(modules)
+        lessons = []
+        for shape in shapes:
+            for lesson_steps in shape:
+                module = next(module_iter)
+                lessons.extend(
+                    Lesson(title=f'Урок {order + 1}', module=module, order=(order + 1) * ORDER_GAP)
+                    for order in range(len(lesson_steps))
+                )
+        lessons = Lesson.objects.bulk_create(lessons)
+
+        steps = []
+        lesson_iter = iter(lessons)
+        for shape in shapes:
+            for lesson_steps in shape:
+                for count in lesson_steps:
+                    lesson = next(lesson_iter)
+                    for order in range(count):
+                        step_type = rng.choice(['text', 'text', 'video', 'question'])
+                        steps.append(Step(lesson=lesson, order=order, step_type=step_type,
+                                          content=_step_content(step_type, order)))
+        created_steps = []
+        for batch in _batches(steps, self.batch_size):
+            created_steps.extend(Step.objects.bulk_create(batch))
+        index_courses([course.id for course in courses], self.batch_size)
+
+        # Шаги созданы в порядке прохождения курса, поэтому их можно разрезать по курсам
+        course_steps = {}
+        position = 0
+        for course in courses:
+            course_steps[course.id] = [step.id for step in created_steps[position:position + course.steps_count]]
+            position += course.steps_count
+
+        self.stats['courses'] += len(courses)
+        self.stats['steps'] += len(created_steps)
+        return course_steps
+
+    def create_progress(self, users, course_ids, course_steps):
+        rng = self.rng
+        progress = []
+        completed = []
+        Student = Course.students.through
+        Favorite = Course.favorites.through
+        students = []
+        favorites = []
+
+        for user in users:
+            for course_id in rng.sample(course_ids, self.courses_per_user):
+                step_ids = course_steps[course_id]
+                done = step_ids[:rng.randint(0, len(step_ids))]
+                progress.append(CourseProgress(
+                    user=user, course_id=course_id, completed=len(done) == len(step_ids),
+                    current_step_id=done[-1] if done else None, completed_steps_count=len(done),
+                ))
+                completed.append(done)
+                students.append(Student(course_id=course_id, user_id=user.id))
+                if rng.random() < 0.2:
+                    favorites.append(Favorite(course_id=course_id, user_id=user.id))
+
+        progress = CourseProgress.objects.bulk_create(progress)
+        Student.objects.bulk_create(students, ignore_conflicts=True)
+        Favorite.objects.bulk_create(favorites, ignore_conflicts=True)
+
+        CompletedStep = CourseProgress.completed_steps.through
+        rows = [
+            CompletedStep(courseprogress_id=item.id, step_id=step_id)
+            for item, done in zip(progress, completed) for step_id in done
+        ]
+        for batch in _batches(rows, self.batch_size):
+            CompletedStep.objects.bulk_create(batch)
+
+        self.stats['progress'] += len(progress)
+        self.stats['completed_steps'] += len(rows)
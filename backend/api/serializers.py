@@ -9,7 +9,10 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import status
 
-from .models import User, Course, Lesson, Tag, Step, Module, CourseProgress
+from .models import (
+    User, Course, Lesson, Tag, Step, Module, CourseProgress, CertificateJob, calculate_progress_percentage,
+    validate_step_content
+)
 
 
 class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
@@ -65,6 +68,8 @@ class LessonSerializer(serializers.ModelSerializer):
     class Meta:
         model = Lesson
         fields = ['id', 'title', 'order']
+        # Без order урок добавляется в конец модуля
+        extra_kwargs = {'order': {'required': False}}
 
     def validate_content(self, value):
         if not isinstance(value, dict):
@@ -77,7 +82,7 @@ class ModuleSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Module
-        fields = ['id', 'title', 'course', 'lessons']
+        fields = ['id', 'title', 'course', 'order', 'lessons']
 
     def validate_title(self, value):
         if not value:
@@ -122,21 +127,33 @@ class CourseSerializer(serializers.ModelSerializer):
     def get_is_favorite(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return request.user in obj.favorites.all()
+            # Значение аннотируется в CourseQuerySet.with_user_state
+            if hasattr(obj, 'is_favorite'):
+                return obj.is_favorite
+            return obj.favorites.filter(pk=request.user.pk).exists()
         return False
 
     def get_is_enrolled(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return request.user in obj.students.all()
+            if hasattr(obj, 'is_enrolled'):
+                return obj.is_enrolled
+            return obj.students.filter(pk=request.user.pk).exists()
         return False
 
     def get_progress_percentage(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            progress = CourseProgress.objects.filter(user=request.user, course=obj).first()
-            if progress:
-                return progress.progress_percentage()
+            if hasattr(obj, 'user_completed_steps_count'):
+                completed_steps_count = obj.user_completed_steps_count
+            else:
+                completed_steps_count = (
+                    CourseProgress.objects.filter(user=request.user, course=obj)
+                    .values_list('completed_steps_count', flat=True)
+                    .first()
+                )
+            if completed_steps_count is not None:
+                return calculate_progress_percentage(completed_steps_count, obj.steps_count)
         return 0
 
 
@@ -149,11 +166,12 @@ class StepSerializer(serializers.ModelSerializer):
         step_type = self.initial_data.get('step_type')
 
         if step_type == 'text':
-            if not isinstance(value, dict) or 'html' not in value or not value['html'].strip():
+            if not isinstance(value, dict) or not isinstance(value.get('html'), str) or not value['html'].strip():
                 raise serializers.ValidationError("Text steps must have HTML content.")
 
         elif step_type == 'video':
-            if not isinstance(value, dict) or 'video_url' not in value or not value['video_url'].strip():
+            if (not isinstance(value, dict) or not isinstance(value.get('video_url'), str)
+                    or not value['video_url'].strip()):
                 raise serializers.ValidationError("Video steps must have a valid video URL.")
 
         elif step_type == 'question':
@@ -165,16 +183,183 @@ class StepSerializer(serializers.ModelSerializer):
         return value
 
 
+class MoveSerializer(serializers.Serializer):
+    """Перемещение модуля или урока: after — id соседа, после которого встать, null — в начало."""
+    after = serializers.IntegerField(allow_null=True)
+
+    def validate_after(self, value):
+        if value is None:
+            return None
+        if value == self.context['item'].pk:
+            raise serializers.ValidationError("Нельзя поставить элемент после самого себя.")
+        after = self.context['siblings'].filter(pk=value).first()
+        if after is None:
+            raise serializers.ValidationError(f"Элемент {value} не найден среди соседей.")
+        return after
+
+
+class ReorderSerializer(serializers.Serializer):
+    """Полный новый порядок модулей курса или уроков модуля. В context['siblings'] — текущие элементы."""
+    ids = serializers.ListField(child=serializers.IntegerField())
+
+    def validate_ids(self, value):
+        siblings = {item.pk: item for item in self.context['siblings']}
+        if len(value) != len(set(value)) or set(value) != set(siblings):
+            raise serializers.ValidationError("Список должен содержать каждый элемент ровно один раз.")
+        return [siblings[pk] for pk in value]
+
+
+class LessonStepItemSerializer(serializers.Serializer):
+    # Без id — новый шаг; порядок задаётся позицией в списке
+    id = serializers.IntegerField(required=False)
+    step_type = serializers.ChoiceField(choices=Step.STEP_TYPES)
+    content = serializers.JSONField()
+
+    def validate(self, attrs):
+        if not isinstance(attrs['content'], dict):
+            raise serializers.ValidationError({'content': "Контент шага должен быть объектом JSON."})
+        try:
+            validate_step_content(attrs['step_type'], attrs['content'])
+        except ValueError as error:
+            raise serializers.ValidationError({'content': str(error)})
+        return attrs
+
+
+class LessonStepsSerializer(serializers.Serializer):
+    """
+    Полный упорядоченный список шагов урока для массового сохранения из редактора.
+    В context['existing'] передаются текущие шаги урока ({id: Step}).
+    """
+    MAX_STEPS = 500
+
+    steps = LessonStepItemSerializer(many=True)
+
+    def validate_steps(self, value):
+        if len(value) > self.MAX_STEPS:
+            raise serializers.ValidationError(f"Нельзя отправить больше {self.MAX_STEPS} шагов за раз.")
+
+        step_ids = [item['id'] for item in value if 'id' in item]
+        if len(step_ids) != len(set(step_ids)):
+            raise serializers.ValidationError("Шаги в списке повторяются.")
+
+        foreign = sorted(set(step_ids) - set(self.context['existing']))
+        if foreign:
+            raise serializers.ValidationError(f"Шаги не найдены в уроке: {foreign}.")
+        return value
+
+
+class StepOutlineSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Step
+        fields = ['id', 'order', 'step_type', 'content']
+
+    def get_fields(self):
+        # Поля строятся один раз на ответ, когда сериализатор уже привязан к родителю с контекстом.
+        # Тело шага отдаём только по запросу, иначе клиент подгружает его лениво по уроку
+        fields = super().get_fields()
+        if not self.context.get('include_content'):
+            fields.pop('content')
+        return fields
+
+
+class LessonOutlineSerializer(serializers.ModelSerializer):
+    steps = StepOutlineSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Lesson
+        fields = ['id', 'title', 'order', 'steps']
+
+
+class ModuleOutlineSerializer(serializers.ModelSerializer):
+    lessons = LessonOutlineSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Module
+        fields = ['id', 'title', 'order', 'lessons']
+
+
+class CourseOutlineSerializer(serializers.ModelSerializer):
+    """Структура курса для плеера: модули, уроки, заголовки шагов и прогресс пользователя."""
+    modules = ModuleOutlineSerializer(many=True, read_only=True)
+    completed_steps = serializers.SerializerMethodField()
+    current_step = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Course
+        fields = ['id', 'title', 'modules', 'completed_steps', 'current_step']
+
+    def get_completed_steps(self, obj):
+        progress = self.context.get('progress')
+        if progress is None:
+            return []
+        return list(progress.completed_steps.values_list('id', flat=True))
+
+    def get_current_step(self, obj):
+        progress = self.context.get('progress')
+        return progress.current_step_id if progress else None
+
+
 class CourseProgressSerializer(serializers.ModelSerializer):
     class Meta:
         model = CourseProgress
         fields = ['current_module', 'current_lesson', 'current_step', 'completed_steps']
 
+class UserCourseCardSerializer(serializers.ModelSerializer):
+    """Карточка курса в «Моём обучении»: строится из прогресса с select_related('course') без доп. запросов."""
+    id = serializers.IntegerField(source='course_id')
+    title = serializers.CharField(source='course.title')
+    avatar = serializers.ImageField(source='course.avatar')
+    steps_count = serializers.IntegerField(source='course.steps_count')
+    progress_percentage = serializers.FloatField()
+
+    class Meta:
+        model = CourseProgress
+        fields = ['id', 'title', 'avatar', 'completed', 'completed_steps_count', 'steps_count', 'progress_percentage']
+        read_only_fields = fields
+
+
 class UpdateProgressSerializer(serializers.Serializer):
     step_id = serializers.IntegerField()
 
     def validate_step_id(self, value):
         try:
-            return Step.objects.get(id=value)
+            return Step.objects.select_related('lesson__module').get(id=value)
         except Step.DoesNotExist:
-            raise serializers.ValidationError("Step does not exist.")
\ No newline at end of file
+            raise serializers.ValidationError("Step does not exist.")
+
+
+class CompletedStepSerializer(serializers.Serializer):
+    step_id = serializers.IntegerField()
+    completed_at = serializers.DateTimeField(required=False)
+
+
+class BatchProgressSerializer(serializers.Serializer):
+    MAX_STEPS = 500
+
+    steps = CompletedStepSerializer(many=True, allow_empty=False)
+
+    def validate_steps(self, value):
+        if len(value) > self.MAX_STEPS:
+            raise serializers.ValidationError(f"Нельзя отправить больше {self.MAX_STEPS} шагов за раз.")
+
+        step_ids = [item['step_id'] for item in value]
+        steps = Step.objects.select_related('lesson__module').in_bulk(step_ids)
+
+        missing = sorted(set(step_ids) - set(steps))
+        if missing:
+            raise serializers.ValidationError(f"Шаги не найдены: {missing}.")
+
+        course_id = self.context['course_id']
+        if any(step.lesson.module.course_id != course_id for step in steps.values()):
+            raise serializers.ValidationError("Все шаги должны принадлежать курсу.")
+
+        # Если у всех шагов есть клиентские метки времени, порядок задают они, иначе — порядок списка
+        if all('completed_at' in item for item in value):
+            value = sorted(value, key=lambda item: item['completed_at'])
+        return [steps[item['step_id']] for item in value]
+
+
+class CertificateJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CertificateJob
+        fields = ['id', 'course', 'status', 'certificate', 'error', 'created_at', 'updated_at']
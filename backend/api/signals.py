@@ -0,0 +1,315 @@
+from django.db.models import F, QuerySet
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .cache import invalidate_course_trees
+from .editor import StepRemoval, content_changed, is_bulk_step_removal
+from .models import (
+    Course, CourseProgress, Lesson, Module, SearchDocument, Step, Tag, recalculate_completed_steps_counts,
+)
+from .search import index_course_documents, index_steps, remove_course_documents, remove_step_documents
+
+
+def _course_id_for_lesson(lesson_id):
+    return Course.objects.filter(modules__lessons__id=lesson_id).values_list('id', flat=True).first()
+
+
+def _deleted_with_parent(origin, model):
+    """
+    Объект модели model удаляется каскадом вместе с родителем: удаление начато
+    (origin) не с объектов model. Учёт тогда делает родитель, один раз на всех детей.
+    """
+    if origin is None:
+        return False
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return origin_model is not model
+
+
+def _skip_step_delete(origin):
+    return is_bulk_step_removal() or _deleted_with_parent(origin, Step)
+
+
+@receiver(pre_save, sender=Step)
+def remember_step_lesson(sender, instance, raw=False, **kwargs):
+    # Запоминаем прежний урок, чтобы при переносе шага поправить счётчики обоих курсов
+    instance._previous_lesson_id = None
+    if raw or instance._state.adding or not instance.pk:
+        return
+    instance._previous_lesson_id = Step.objects.filter(pk=instance.pk).values_list('lesson_id', flat=True).first()
+
+
+@receiver(post_save, sender=Step)
+def update_course_steps_count_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+
+    if created:
+        Course.objects.filter(modules__lessons__id=instance.lesson_id).update(steps_count=F('steps_count') + 1)
+        return
+
+    previous_lesson_id = getattr(instance, '_previous_lesson_id', None)
+    if previous_lesson_id is None or previous_lesson_id == instance.lesson_id:
+        return
+
+    previous_course_id = _course_id_for_lesson(previous_lesson_id)
+    course_id = _course_id_for_lesson(instance.lesson_id)
+    if previous_course_id != course_id:
+        Course.objects.filter(pk=previous_course_id).update(steps_count=F('steps_count') - 1)
+        Course.objects.filter(pk=course_id).update(steps_count=F('steps_count') + 1)
+
+
+@receiver(pre_save, sender=Module)
+def remember_module_course(sender, instance, raw=False, **kwargs):
+    # Модуль можно перенести в другой курс: тогда меняется содержимое обоих курсов
+    instance._previous_course_id = None
+    if raw or instance._state.adding or not instance.pk:
+        return
+    instance._previous_course_id = Module.objects.filter(pk=instance.pk).values_list('course_id', flat=True).first()
+
+
+@receiver(pre_save, sender=Lesson)
+def remember_lesson_course(sender, instance, raw=False, **kwargs):
+    instance._previous_course_id = None
+    if raw or instance._state.adding or not instance.pk:
+        return
+    instance._previous_course_id = _course_id_for_lesson(instance.pk)
+
+
+def _moved_course_ids(instance, course_id):
+    """[прежний курс, новый курс], если модуль или урок перенесён в другой курс, иначе []."""
+    previous_course_id = getattr(instance, '_previous_course_id', None)
+    if previous_course_id is None or previous_course_id == course_id:
+        return []
+    return [previous_course_id, course_id]
+
+
+@receiver(post_save, sender=Module)
+def update_steps_counts_on_module_move(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    course_ids = _moved_course_ids(instance, instance.course_id)
+    if course_ids:
+        Course.objects.filter(pk__in=course_ids).recalculate_steps_counts()
+
+
+@receiver(post_save, sender=Lesson)
+def update_steps_counts_on_lesson_move(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    course_ids = _moved_course_ids(instance, _course_id_for_lesson(instance.pk))
+    if course_ids:
+        Course.objects.filter(pk__in=course_ids).recalculate_steps_counts()
+
+
+@receiver(pre_delete, sender=Step)
+def update_completed_steps_count_on_step_delete(sender, instance, origin=None, **kwargs):
+    if _skip_step_delete(origin):
+        return
+    # Строки связи completed_steps удаляются каскадно и m2m_changed не вызывают
+    CourseProgress.objects.filter(completed_steps=instance).update(
+        completed_steps_count=F('completed_steps_count') - 1
+    )
+
+
+@receiver(post_delete, sender=Step)
+def update_course_steps_count_on_delete(sender, instance, origin=None, **kwargs):
+    if _skip_step_delete(origin):
+        return
+    Course.objects.filter(modules__lessons__id=instance.lesson_id).update(steps_count=F('steps_count') - 1)
+
+
+@receiver(pre_delete, sender=Module)
+@receiver(pre_delete, sender=Lesson)
+def start_step_removal(sender, instance, origin=None, **kwargs):
+    # Шаги удаляемого модуля или урока учитываются одной пачкой, а не сигналом на каждый шаг.
+    # При удалении курса целиком учитывать нечего: счётчики и прогрессы удаляются вместе с ним
+    if _deleted_with_parent(origin, sender):
+        return
+    lookup = {'lesson__module': instance} if sender is Module else {'lesson': instance}
+    instance._step_removal = StepRemoval(Step.objects.filter(**lookup))
+
+
+@receiver(post_delete, sender=Module)
+@receiver(post_delete, sender=Lesson)
+def finish_step_removal(sender, instance, **kwargs):
+    removal = getattr(instance, '_step_removal', None)
+    if removal is not None:
+        removal.finish()
+
+
+@receiver(m2m_changed, sender=CourseProgress.completed_steps.through)
+def update_completed_steps_count(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        # instance — CourseProgress, pk_set — id шагов
+        if action == 'post_add' and pk_set:
+            # В post_add pk_set содержит только действительно добавленные шаги
+            CourseProgress.objects.filter(pk=instance.pk).update(
+                completed_steps_count=F('completed_steps_count') + len(pk_set)
+            )
+        elif action == 'post_remove':
+            recalculate_completed_steps_counts([instance.pk])
+        elif action == 'post_clear':
+            CourseProgress.objects.filter(pk=instance.pk).update(completed_steps_count=0)
+        return
+
+    # instance — Step, pk_set — id прогрессов
+    if action == 'post_add' and pk_set:
+        CourseProgress.objects.filter(pk__in=pk_set).update(completed_steps_count=F('completed_steps_count') + 1)
+    elif action == 'post_remove' and pk_set:
+        recalculate_completed_steps_counts(pk_set)
+    elif action == 'pre_clear':
+        CourseProgress.objects.filter(completed_steps=instance).update(
+            completed_steps_count=F('completed_steps_count') - 1
+        )
+
+
+def _course_ids(**lookup):
+    return list(Course.objects.filter(**lookup).values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Course)
+def touch_course_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    content_changed(instance.pk)
+
+
+@receiver(post_delete, sender=Course)
+def invalidate_course_on_delete(sender, instance, **kwargs):
+    invalidate_course_trees([instance.pk])
+
+
+@receiver(m2m_changed, sender=Course.tags.through)
+def touch_course_on_tags_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            content_changed(instance.pk)
+        return
+
+    # instance — Tag, pk_set — id курсов (при очистке pk_set не передаётся)
+    if action == 'pre_clear':
+        content_changed(*_course_ids(tags=instance))
+    elif action in ('post_add', 'post_remove') and pk_set:
+        content_changed(*pk_set)
+
+
+@receiver(post_save, sender=Tag)
+def touch_courses_on_tag_save(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    content_changed(*_course_ids(tags=instance))
+
+
+@receiver(pre_delete, sender=Tag)
+def touch_courses_on_tag_delete(sender, instance, **kwargs):
+    # После удаления связи с курсами уже не найти
+    content_changed(*_course_ids(tags=instance))
+
+
+@receiver(post_save, sender=Module)
+@receiver(post_delete, sender=Module)
+def touch_course_on_module_change(sender, instance, raw=False, origin=None, **kwargs):
+    if raw or _deleted_with_parent(origin, Module):
+        return
+    # При переносе модуля меняется и курс, из которого он ушёл
+    content_changed(instance.course_id, getattr(instance, '_previous_course_id', None))
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def touch_course_on_lesson_change(sender, instance, raw=False, origin=None, **kwargs):
+    if raw or _deleted_with_parent(origin, Lesson):
+        return
+    content_changed(getattr(instance, '_previous_course_id', None), *_course_ids(modules__id=instance.module_id))
+
+
+@receiver(post_save, sender=Step)
+@receiver(post_delete, sender=Step)
+def touch_course_on_step_change(sender, instance, raw=False, origin=None, **kwargs):
+    if raw or _skip_step_delete(origin):
+        return
+    course_ids = _course_ids(modules__lessons__id=instance.lesson_id)
+    previous_lesson_id = getattr(instance, '_previous_lesson_id', None)
+    if previous_lesson_id and previous_lesson_id != instance.lesson_id:
+        course_ids += _course_ids(modules__lessons__id=previous_lesson_id)
+    content_changed(*course_ids)
+
+
+# Поисковый индекс: документ курса (название, описание, теги) и документы шагов.
+# Массовые операции в обход сигналов обновляют индекс сами (см. api.search.index_courses).
+
+@receiver(post_save, sender=Course)
+def index_course_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    index_course_documents([instance.pk])
+
+
+@receiver(pre_delete, sender=Course)
+def remove_course_from_index(sender, instance, **kwargs):
+    # Строки SearchDocument удаляются каскадом, но строки FTS-таблицы SQLite — только здесь
+    remove_course_documents([instance.pk])
+
+
+@receiver(m2m_changed, sender=Course.tags.through)
+def index_course_on_tags_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            index_course_documents([instance.pk])
+        return
+
+    if action == 'pre_clear':
+        instance._search_course_ids = _course_ids(tags=instance)
+    elif action == 'post_clear':
+        index_course_documents(getattr(instance, '_search_course_ids', []))
+    elif action in ('post_add', 'post_remove') and pk_set:
+        index_course_documents(pk_set)
+
+
+@receiver(post_save, sender=Tag)
+def index_courses_on_tag_save(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    index_course_documents(_course_ids(tags=instance))
+
+
+@receiver(pre_delete, sender=Tag)
+def remember_tag_courses(sender, instance, **kwargs):
+    instance._search_course_ids = _course_ids(tags=instance)
+
+
+@receiver(post_delete, sender=Tag)
+def index_courses_on_tag_delete(sender, instance, **kwargs):
+    index_course_documents(getattr(instance, '_search_course_ids', []))
+
+
+@receiver(post_save, sender=Module)
+def move_module_documents(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    # Модуль мог перейти в другой курс — документы его шагов переезжают вместе с ним
+    SearchDocument.objects.filter(step__lesson__module=instance).exclude(course_id=instance.course_id).update(
+        course_id=instance.course_id
+    )
+
+
+@receiver(post_save, sender=Lesson)
+def move_lesson_documents(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    course_id = _course_id_for_lesson(instance.pk)
+    SearchDocument.objects.filter(step__lesson=instance).exclude(course_id=course_id).update(course_id=course_id)
+
+
+@receiver(post_save, sender=Step)
+def index_step_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    index_steps([instance], _course_id_for_lesson(instance.lesson_id))
+
+
+@receiver(pre_delete, sender=Step)
+def remove_step_from_index(sender, instance, origin=None, **kwargs):
+    if _skip_step_delete(origin):
+        return
+    remove_step_documents([instance.pk])
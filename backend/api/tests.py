@@ -1,3 +1,1504 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory
+
+from .cache import get_cache, get_course_tree_stats
+from .certificates import get_certificate_template
+from .issuance import issue_course_certificates
+from .metrics import registry as metrics_registry
+from .nplusone import NPlusOneError, assert_no_n_plus_one
+from .search import FTS_TABLE, stem
+from .seed import SeedGenerator, flush_seed_data
+from .serializers import CourseSerializer, StepOutlineSerializer
+from .utils import get_certificate_filename
+from .views import CourseViewSet
+from .models import (
+    ORDER_GAP, User, Tag, Course, Module, Lesson, Step, CourseProgress, Certificate, CertificateJob, SearchDocument,
+    ProgressIdempotencyKey,
+)
+
+
+def create_course(author, title='Курс', steps=2, tags=()):
+    course = Course.objects.create(title=title, description='Описание', author=author)
+    course.tags.set(tags)
+    module = Module.objects.create(title='Модуль', course=course, order=0)
+    lesson = Lesson.objects.create(title='Урок', module=module, order=0)
+    for index in range(steps):
+        Step.objects.create(lesson=lesson, order=index, step_type='text', content={'html': f'<p>{index}</p>'})
+    return course
+
+
+class StepCountersTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create(username='author')
+        self.course = create_course(self.author, steps=3)
+        self.steps = list(Step.objects.filter(lesson__module__course=self.course).order_by('order'))
+        self.progress = CourseProgress.objects.create(user=User.objects.create(username='student'), course=self.course)
+
+    def assertCounters(self, steps_count, completed_steps_count):
+        self.course.refresh_from_db()
+        self.progress.refresh_from_db()
+        self.assertEqual((self.course.steps_count, self.progress.completed_steps_count),
+                         (steps_count, completed_steps_count))
+
+    def test_steps_count_follows_step_create_and_delete(self):
+        self.assertCounters(3, 0)
+        Step.objects.create(lesson=self.steps[0].lesson, order=3, step_type='text', content={'html': '<p>3</p>'})
+        self.assertCounters(4, 0)
+        self.steps[0].delete()
+        self.assertCounters(3, 0)
+
+    def test_step_move_updates_both_courses(self):
+        other = create_course(self.author, title='Другой', steps=1)
+        step = self.steps[0]
+        step.lesson = Lesson.objects.get(module__course=other)
+        step.save()
+
+        other.refresh_from_db()
+        self.assertEqual(other.steps_count, 2)
+        self.assertCounters(2, 0)
+
+    def test_completed_steps_count_follows_completed_steps(self):
+        self.progress.completed_steps.add(self.steps[0], self.steps[1])
+        self.assertCounters(3, 2)
+        # Повторное добавление не увеличивает счётчик
+        self.progress.completed_steps.add(self.steps[1])
+        self.assertCounters(3, 2)
+        self.progress.completed_steps.remove(self.steps[0])
+        self.assertCounters(3, 1)
+        # Со стороны шага
+        self.steps[2].completed_by.add(self.progress)
+        self.assertCounters(3, 2)
+        self.steps[2].completed_by.remove(self.progress)
+        self.assertCounters(3, 1)
+        self.steps[2].completed_by.add(self.progress)
+
+        # Удаление пройденного шага уменьшает оба счётчика
+        self.steps[1].delete()
+        self.assertCounters(2, 1)
+        self.progress.completed_steps.clear()
+        self.assertCounters(2, 0)
+
+    def test_progress_reads_stored_counters(self):
+        self.progress.completed_steps.add(*self.steps)
+        progress = CourseProgress.objects.select_related('course').get(pk=self.progress.pk)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(progress.progress_percentage(), 100)
+            self.assertTrue(progress.is_course_completed())
+
+
+class CourseListQueryCountTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create(username='author')
+        self.student = User.objects.create(username='student')
+        self.tags = [Tag.objects.create(name='HTML'), Tag.objects.create(name='CSS')]
+        self.client = APIClient()
+
+    def add_courses(self, count):
+        for index in range(count):
+            course = create_course(self.author, title=f'Курс {index}', tags=self.tags)
+            course.students.add(self.student)
+            course.favorites.add(self.student)
+            progress = CourseProgress.objects.create(user=self.student, course=course)
+            progress.update_progress(course.modules.first().lessons.first().steps.first())
+
+    def count_list_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/courses/')
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response
+
+    def test_query_count_does_not_depend_on_course_count(self):
+        self.client.force_authenticate(self.student)
+
+        self.add_courses(2)
+        small_count, _ = self.count_list_queries()
+
+        self.add_courses(8)
+        large_count, response = self.count_list_queries()
+
+        self.assertEqual(small_count, large_count)
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_authenticated_list(self):
+        self.client.force_authenticate(self.student)
+        self.add_courses(3)
+
+        # Курсы (с автором и аннотациями) + теги
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/courses/')
+
+        course = response.data['results'][0]
+        self.assertTrue(course['is_favorite'])
+        self.assertTrue(course['is_enrolled'])
+        self.assertEqual(course['progress_percentage'], 50)
+        self.assertEqual(course['author']['username'], 'author')
+        self.assertEqual({tag['name'] for tag in course['tags']}, {'HTML', 'CSS'})
+
+    def test_anonymous_list(self):
+        self.add_courses(3)
+
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/courses/')
+
+        course = response.data['results'][0]
+        self.assertFalse(course['is_favorite'])
+        self.assertFalse(course['is_enrolled'])
+        self.assertEqual(course['progress_percentage'], 0)
+
+
+class CourseCatalogPaginationTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create(username='author')
+        self.other_author = User.objects.create(username='other')
+        self.student = User.objects.create(username='student')
+        self.tag = Tag.objects.create(name='HTML')
+        self.client = APIClient()
+
+    def test_cursor_pagination_walks_all_courses_once(self):
+        courses = [
+            Course.objects.create(title=f'Курс {index}', description='', author=self.author)
+            for index in range(5)
+        ]
+
+        seen = []
+        url = '/api/courses/?page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 2)
+            seen.extend(course['id'] for course in response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(seen, sorted((course.id for course in courses), reverse=True))
+
+    def test_ordering_with_ties_walks_all_courses_once(self):
+        courses = [
+            Course.objects.create(title=f'Курс {index % 2}', description='', price=(index % 3) * 100,
+                                  author=self.author)
+            for index in range(9)
+        ]
+        for ordering, key in (
+            ('price', lambda course: (course.price, -course.id)),
+            ('-price', lambda course: (-course.price, -course.id)),
+            ('title', lambda course: (course.title, -course.id)),
+        ):
+            expected = [course.id for course in sorted(courses, key=key)]
+            pages = []
+            url = f'/api/courses/?ordering={ordering}&page_size=2'
+            while url:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                pages.append(response.data)
+                url = response.data['next']
+            self.assertEqual([course['id'] for page in pages for course in page['results']], expected)
+
+            # Обратно по ссылкам previous — те же страницы
+            previous = self.client.get(pages[-1]['previous']).data
+            self.assertEqual(previous['results'], pages[-2]['results'])
+
+    def test_filters(self):
+        cheap = Course.objects.create(title='Дешёвый', description='', price=100, author=self.author)
+        expensive = Course.objects.create(title='Дорогой', description='', price=5000, author=self.other_author)
+        cheap.tags.add(self.tag)
+        expensive.students.add(self.student)
+        expensive.favorites.add(self.student)
+
+        def ids(query):
+            response = self.client.get(f'/api/courses/?{query}')
+            self.assertEqual(response.status_code, 200)
+            return {course['id'] for course in response.data['results']}
+
+        self.assertEqual(ids(f'tag={self.tag.id}'), {cheap.id})
+        self.assertEqual(ids('tag_name=html'), {cheap.id})
+        self.assertEqual(ids('price_min=1000'), {expensive.id})
+        self.assertEqual(ids('price_max=1000'), {cheap.id})
+        self.assertEqual(ids(f'author={self.author.id}'), {cheap.id})
+
+        self.assertEqual(ids('enrolled=true'), set())
+
+        self.client.force_authenticate(self.student)
+        self.assertEqual(ids('enrolled=true'), {expensive.id})
+        self.assertEqual(ids('enrolled=false'), {cheap.id})
+        self.assertEqual(ids('favorite=true'), {expensive.id})
+
+
+class CourseOutlineTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create(username='author')
+        self.student = User.objects.create(username='student')
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def add_lessons(self, course, count):
+        module = Module.objects.create(title='Модуль', course=course, order=course.modules.count())
+        for index in range(count):
+            lesson = Lesson.objects.create(title=f'Урок {index}', module=module, order=index)
+            for order in range(3):
+                Step.objects.create(lesson=lesson, order=order, step_type='text', content={'html': '<p>Текст</p>'})
+
+    def test_outline_query_count_does_not_depend_on_course_size(self):
+        course = create_course(self.author, steps=3)
+        progress = CourseProgress.objects.create(user=self.student, course=course)
+        first_step = Step.objects.filter(lesson__module__course=course).first()
+        progress.update_progress(first_step)
+
+        # Курс, модули, уроки, шаги, прогресс, завершённые шаги
+        with self.assertNumQueries(6):
+            response = self.client.get(f'/api/courses/{course.id}/outline/')
+
+        self.add_lessons(course, 20)
+        with self.assertNumQueries(6):
+            response = self.client.get(f'/api/courses/{course.id}/outline/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['modules']), 2)
+        self.assertEqual(len(response.data['modules'][1]['lessons']), 20)
+        self.assertEqual(response.data['completed_steps'], [first_step.id])
+
+        step = response.data['modules'][0]['lessons'][0]['steps'][0]
+        self.assertEqual(set(step), {'id', 'order', 'step_type'})
+
+        # Сериализатор шагов собирает поля один раз на ответ, а не для каждого урока
+        with mock.patch.object(StepOutlineSerializer, 'get_fields', autospec=True,
+                               side_effect=StepOutlineSerializer.get_fields) as get_fields:
+            self.client.get(f'/api/courses/{course.id}/outline/')
+        self.assertEqual(get_fields.call_count, 1)
+
+    def test_outline_with_content(self):
+        course = create_course(self.author, steps=1)
+
+        response = self.client.get(f'/api/courses/{course.id}/outline/?include_content=true')
+
+        step = response.data['modules'][0]['lessons'][0]['steps'][0]
+        self.assertEqual(step['content'], {'html': '<p>0</p>'})
+        self.assertEqual(response.data['completed_steps'], [])
+
+
+class ConditionalContentTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.author = User.objects.create(username='author')
+        self.course = create_course(self.author, steps=2)
+        self.module = self.course.modules.first()
+        self.lesson = self.module.lessons.first()
+        self.client = APIClient()
+        self.steps_url = f'/api/courses/{self.course.id}/modules/{self.module.id}/lessons/{self.lesson.id}/steps/'
+
+    def test_unchanged_content_returns_not_modified(self):
+        response = self.client.get(self.steps_url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        # Только запрос версии курса, без выборки шагов
+        with self.assertNumQueries(1):
+            response = self.client.get(self.steps_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_step_change_invalidates_etag(self):
+        etag = self.client.get(self.steps_url)['ETag']
+        module_etag = self.client.get(f'/api/courses/{self.course.id}/modules/')['ETag']
+
+        Step.objects.create(lesson=self.lesson, order=5, step_type='video', content={'video_url': 'https://video'})
+
+        response = self.client.get(self.steps_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.data), 3)
+
+        response = self.client.get(f'/api/courses/{self.course.id}/modules/', HTTP_IF_NONE_MATCH=module_etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_move_invalidates_etag_of_both_courses(self):
+        other = create_course(self.author, title='Другой', steps=0)
+        urls = [f'/api/courses/{self.course.id}/modules/', f'/api/courses/{other.id}/modules/']
+        etags = [self.client.get(url)['ETag'] for url in urls]
+
+        self.module.course = other
+        self.module.save()
+        for url, etag in zip(urls, etags):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        # Урок возвращается из перенесённого модуля в исходный курс
+        module = Module.objects.create(title='Новый модуль', course=self.course, order=ORDER_GAP)
+        etags = [self.client.get(url)['ETag'] for url in urls]
+        self.lesson.module = module
+        self.lesson.save()
+        for url, etag in zip(urls, etags):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_course_etag_depends_on_user_state(self):
+        student = User.objects.create(username='student')
+        self.client.force_authenticate(student)
+        url = f'/api/courses/{self.course.id}/'
+
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.course.favorites.add(student)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['is_favorite'])
+
+
+class CourseTreeCacheTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.author = User.objects.create(username='author')
+        self.course = create_course(self.author, steps=2)
+        self.module = self.course.modules.first()
+        self.lesson = self.module.lessons.first()
+        self.client = APIClient()
+        self.lessons_url = f'/api/courses/{self.course.id}/modules/{self.module.id}/lessons/'
+        self.steps_url = f'{self.lessons_url}{self.lesson.id}/steps/'
+
+    def test_second_read_is_served_from_cache(self):
+        first = self.client.get(self.steps_url)
+        self.assertEqual(get_course_tree_stats()['misses'], 1)
+
+        # Только запрос версии курса
+        with self.assertNumQueries(1):
+            second = self.client.get(self.steps_url)
+        self.assertEqual(first.data, second.data)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(f'{self.steps_url}{first.data[0]["id"]}/')
+        self.assertEqual(response.data, first.data[0])
+
+        self.assertEqual(get_course_tree_stats()['hits'], 2)
+
+    def test_cache_is_invalidated_on_change(self):
+        self.client.get(self.lessons_url)
+
+        self.lesson.title = 'Новое название'
+        self.lesson.save()
+
+        response = self.client.get(self.lessons_url)
+        self.assertEqual(response.data[0]['title'], 'Новое название')
+
+    def test_moved_lesson_leaves_source_course_tree(self):
+        self.assertEqual(len(self.client.get(self.lessons_url).data), 1)
+
+        other = create_course(self.author, title='Другой', steps=0)
+        self.lesson.module = other.modules.get()
+        self.lesson.save()
+
+        self.assertEqual(self.client.get(self.lessons_url).data, [])
+
+    def test_missing_object_falls_back_to_database(self):
+        response = self.client.get(f'{self.steps_url}999999/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_stats_endpoint_is_admin_only(self):
+        self.client.force_authenticate(self.author)
+        self.assertEqual(self.client.get('/api/cache/stats/').status_code, 403)
+
+        admin = User.objects.create(username='admin', is_staff=True)
+        self.client.force_authenticate(admin)
+        response = self.client.get('/api/cache/stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data), {'hits', 'misses', 'hit_ratio'})
+
+
+class UpdateProgressTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create(username='author')
+        self.student = User.objects.create(username='student')
+        self.course = Course.objects.create(title='Курс', description='', author=self.author)
+        self.lessons = []
+        for module_order in range(2):
+            module = Module.objects.create(title=f'Модуль {module_order}', course=self.course, order=module_order)
+            for lesson_order in range(2):
+                lesson = Lesson.objects.create(title='Урок', module=module, order=lesson_order)
+                for step_order in range(2):
+                    Step.objects.create(lesson=lesson, order=step_order, step_type='text', content={'html': 'x'})
+                self.lessons.append(lesson)
+        self.progress = CourseProgress.objects.create(user=self.student, course=self.course)
+
+    def steps(self, lesson):
+        return list(Step.objects.select_related('lesson__module').filter(lesson=lesson).order_by('order'))
+
+    def test_walks_through_course(self):
+        for index, lesson in enumerate(self.lessons):
+            first, second = self.steps(lesson)
+
+            with self.assertNumQueries(3):
+                self.progress.update_progress(first)
+            self.assertEqual(self.progress.current_step_id, first.id)
+
+            # Урок завершён — дополнительный запрос за следующим уроком
+            with self.assertNumQueries(4):
+                self.progress.update_progress(second)
+
+            if index < len(self.lessons) - 1:
+                next_lesson = self.lessons[index + 1]
+                self.assertEqual(self.progress.current_lesson_id, next_lesson.id)
+                self.assertEqual(self.progress.current_module_id, next_lesson.module_id)
+                self.assertEqual(self.progress.current_step_id, self.steps(next_lesson)[0].id)
+                self.assertFalse(self.progress.completed)
+
+        self.progress.refresh_from_db()
+        self.assertTrue(self.progress.completed)
+        self.assertEqual(self.progress.completed_steps_count, 8)
+        self.assertEqual(self.progress.progress_percentage(), 100)
+
+    def test_repeated_step_is_idempotent(self):
+        step = self.steps(self.lessons[0])[0]
+        self.progress.update_progress(step)
+        self.progress.update_progress(step)
+
+        self.progress.refresh_from_db()
+        self.assertEqual(self.progress.completed_steps_count, 1)
+        self.assertEqual(self.progress.completed_steps.count(), 1)
+
+
+class StepsCountMoveTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create(username='author')
+        self.source = create_course(self.author, title='A', steps=3)
+        self.target = create_course(self.author, title='B', steps=2)
+
+    def assertStepsCounts(self, source, target):
+        self.source.refresh_from_db()
+        self.target.refresh_from_db()
+        self.assertEqual((self.source.steps_count, self.target.steps_count), (source, target))
+
+    def test_module_move_updates_both_courses(self):
+        module = self.source.modules.get()
+        client = APIClient()
+        client.force_authenticate(self.author)
+        response = client.patch(f'/api/courses/{self.source.id}/modules/{module.id}/',
+                                {'course': self.target.id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertStepsCounts(0, 5)
+
+    def test_lesson_move_updates_both_courses(self):
+        lesson = Lesson.objects.get(module__course=self.target)
+        lesson.module = self.source.modules.get()
+        lesson.save()
+        self.assertStepsCounts(5, 0)
+
+
+class CourseProgressWriteTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create(username='author')
+        self.student = User.objects.create(username='student')
+        self.course = create_course(self.author, steps=3)
+        self.steps = list(Step.objects.filter(lesson__module__course=self.course).order_by('order'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+        self.url = f'/api/courses/{self.course.id}/progress/'
+
+    def test_progress_is_unique_per_user_and_course(self):
+        CourseProgress.objects.create(user=self.student, course=self.course)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            CourseProgress.objects.create(user=self.student, course=self.course)
+
+    def test_idempotency_key_replays_response(self):
+        headers = {'HTTP_IDEMPOTENCY_KEY': 'click-1'}
+        first = self.client.post(self.url, {'step_id': self.steps[1].id}, **headers)
+        self.assertEqual(first.status_code, 200)
+
+        second = self.client.post(self.url, {'step_id': self.steps[1].id}, **headers)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(second.data, first.data)
+
+        # Тот же ключ с другим телом не получает чужой ответ и не применяется
+        third = self.client.post(self.url, {'step_id': self.steps[0].id}, **headers)
+        self.assertEqual(third.status_code, 422)
+
+        progress = CourseProgress.objects.get(user=self.student, course=self.course)
+        self.assertEqual(progress.current_step_id, self.steps[1].id)
+        self.assertEqual(progress.completed_steps_count, 1)
+
+    def test_idempotency_key_is_scoped_to_course_and_endpoint(self):
+        other = create_course(self.author, title='Другой', steps=1)
+        other_step = Step.objects.get(lesson__module__course=other)
+        headers = {'HTTP_IDEMPOTENCY_KEY': 'click-1'}
+        self.assertEqual(self.client.post(self.url, {'step_id': self.steps[0].id}, **headers).status_code, 200)
+
+        response = self.client.post(f'/api/courses/{other.id}/progress/', {'step_id': other_step.id}, **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Idempotent-Replayed', response)
+        response = self.client.post(f'{self.url}batch/', {'steps': [{'step_id': self.steps[1].id}]},
+                                    format='json', **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Idempotent-Replayed', response)
+
+        self.assertEqual(CourseProgress.objects.get(user=self.student, course=other).completed_steps_count, 1)
+        self.assertEqual(CourseProgress.objects.get(user=self.student, course=self.course).completed_steps_count, 2)
+
+    def test_expired_idempotency_keys_are_removed(self):
+        headers = {'HTTP_IDEMPOTENCY_KEY': 'click-1'}
+        self.client.post(self.url, {'step_id': self.steps[0].id}, **headers)
+        ProgressIdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+
+        # Просроченный ключ удаляется при следующем запросе пользователя и больше не повторяет ответ
+        response = self.client.post(self.url, {'step_id': self.steps[1].id}, **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(ProgressIdempotencyKey.objects.count(), 1)
+
+        ProgressIdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+        call_command('cleanup_idempotency_keys', stdout=StringIO())
+        self.assertFalse(ProgressIdempotencyKey.objects.exists())
+
+    def test_posts_without_key_share_one_progress_row(self):
+        for step in self.steps:
+            self.assertEqual(self.client.post(self.url, {'step_id': step.id}).status_code, 200)
+
+        progress = CourseProgress.objects.get(user=self.student, course=self.course)
+        self.assertEqual(progress.completed_steps_count, 3)
+        self.assertTrue(progress.completed)
+
+
+class BatchProgressTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create(username='author')
+        self.student = User.objects.create(username='student')
+        self.course = create_course(self.author, steps=30)
+        self.steps = list(Step.objects.filter(lesson__module__course=self.course).order_by('order'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+        self.url = f'/api/courses/{self.course.id}/progress/batch/'
+
+    def post(self, steps):
+        return self.client.post(self.url, {'steps': steps}, format='json')
+
+    def count_queries(self, steps):
+        with CaptureQueriesContext(connection) as context:
+            response = self.post([{'step_id': step.id} for step in steps])
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_query_count_does_not_depend_on_batch_size(self):
+        # Первый запрос создаёт прогресс, дальше сравниваем запросы одинаковой формы
+        self.count_queries(self.steps[:1])
+        small = self.count_queries(self.steps[1:2])
+        large = self.count_queries(self.steps[2:25])
+        self.assertEqual(small, large)
+
+        progress = CourseProgress.objects.get(user=self.student, course=self.course)
+        self.assertEqual(progress.completed_steps_count, 25)
+        self.assertEqual(progress.current_step_id, self.steps[24].id)
+
+    def test_client_timestamps_define_order(self):
+        response = self.post([
+            {'step_id': self.steps[5].id, 'completed_at': '2024-08-05T10:00:05Z'},
+            {'step_id': self.steps[3].id, 'completed_at': '2024-08-05T10:00:03Z'},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['current_step'], self.steps[5].id)
+        self.assertEqual(set(response.data['completed_steps']), {self.steps[3].id, self.steps[5].id})
+
+    def test_completing_every_step_completes_course(self):
+        response = self.post([{'step_id': step.id} for step in self.steps])
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(CourseProgress.objects.get(user=self.student, course=self.course).completed)
+
+    def test_rejects_steps_from_other_course(self):
+        other_step = Step.objects.filter(lesson__module__course=create_course(self.author)).first()
+        response = self.post([{'step_id': self.steps[0].id}, {'step_id': other_step.id}])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(CourseProgress.objects.filter(user=self.student).exists())
+
+
+class CertificateTemplateTests(TestCase):
+    def test_background_is_embedded_as_jpeg(self):
+        template = get_certificate_template()
+        os.remove(template.prepared_background_path)
+
+        # Подготовленный фон восстанавливается, если файл удалили из временного каталога
+        output = BytesIO()
+        template.render(output, 'Иван Иванов', 'Основы HTML', '01.01.2024')
+        pdf = output.getvalue()
+        self.assertTrue(pdf.startswith(b'%PDF'))
+        self.assertIn(b'/DCTDecode', pdf)
+        self.assertNotIn(b'/ASCII85Decode', pdf)
+
+
+@override_settings(CERTIFICATE_JOBS_MODE='sync')
+class CertificateJobTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.author = User.objects.create(username='author')
+        self.student = User.objects.create(username='student', first_name='Иван', last_name='Иванов')
+        self.course = create_course(self.author)
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def test_generation_runs_as_job(self):
+        with self.settings(MEDIA_ROOT=self.media_root), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/generate-certificate/{self.course.id}/')
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], CertificateJob.STATUS_PENDING)
+
+        job = self.client.get(f'/api/certificate-jobs/{response.data["id"]}/').data
+        self.assertEqual(job['status'], CertificateJob.STATUS_DONE)
+
+        certificate = Certificate.objects.get(user=self.student, course=self.course)
+        self.assertEqual(job['certificate'], certificate.id)
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, certificate.file.name)))
+        self.assertEqual(certificate.template_version, get_certificate_template().version)
+
+    def test_job_is_not_enqueued_twice(self):
+        with self.settings(CERTIFICATE_JOBS_MODE='worker'):
+            first = self.client.post(f'/api/generate-certificate/{self.course.id}/')
+            second = self.client.post(f'/api/generate-certificate/{self.course.id}/')
+
+        self.assertEqual(first.data['id'], second.data['id'])
+        self.assertEqual(CertificateJob.objects.count(), 1)
+
+    def test_job_status_is_private(self):
+        job = CertificateJob.objects.create(user=self.author, course=self.course)
+        self.assertEqual(self.client.get(f'/api/certificate-jobs/{job.id}/').status_code, 404)
+
+    @override_settings(CERTIFICATE_JOBS_MODE='thread')
+    def test_status_request_resumes_job_lost_by_thread_pool(self):
+        fresh = CertificateJob.objects.create(user=self.student, course=self.course)
+        lost = CertificateJob.objects.create(user=self.student, course=create_course(self.author, title='Другой'),
+                                             status=CertificateJob.STATUS_RUNNING)
+        CertificateJob.objects.filter(pk=lost.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+
+        with mock.patch('api.jobs.get_executor') as get_executor, self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.get(f'/api/certificate-jobs/{fresh.id}/').status_code, 200)
+            response = self.client.get(f'/api/certificate-jobs/{lost.id}/')
+            self.client.get(f'/api/certificate-jobs/{lost.id}/')
+
+        self.assertEqual(response.data['status'], CertificateJob.STATUS_PENDING)
+        get_executor.return_value.submit.assert_called_once_with(mock.ANY, lost.id)
+
+
+class BulkIssuanceTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.author = User.objects.create(username='author')
+        self.course = create_course(self.author)
+        for index in range(3):
+            student = User.objects.create(username=f'student{index}', first_name='Студент', last_name=str(index))
+            CourseProgress.objects.create(user=student, course=self.course, completed=index < 2)
+
+    def test_issues_missing_certificates_and_resumes(self):
+        Certificate.objects.create(user=User.objects.get(username='student0'), course=self.course, file='old.pdf')
+
+        with self.settings(MEDIA_ROOT=self.media_root):
+            stats = issue_course_certificates(self.course, workers=1, batch_size=1)
+            again = issue_course_certificates(self.course, workers=1)
+
+        self.assertEqual(stats['issued'], 1)
+        self.assertEqual(again['issued'], 0)
+        certificate = Certificate.objects.get(user__username='student1', course=self.course)
+        self.assertEqual(certificate.template_version, get_certificate_template().version)
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, certificate.file.name)))
+        self.assertFalse(Certificate.objects.filter(user__username='student2').exists())
+
+    def test_certificate_issued_meanwhile_keeps_its_file(self):
+        # Список пользователей устарел: student0 получил сертификат (строку и файл), пока шла отрисовка
+        student = User.objects.get(username='student0')
+        name = get_certificate_filename(student, self.course)
+        os.makedirs(os.path.join(self.media_root, 'certificates'))
+        with open(os.path.join(self.media_root, name), 'wb') as file:
+            file.write(b'issued by job')
+        Certificate.objects.create(user=student, course=self.course, file=name)
+        users = User.objects.filter(username__in=['student0', 'student1']).order_by('pk')
+
+        with self.settings(MEDIA_ROOT=self.media_root), \
+                mock.patch('api.issuance.get_users_without_certificate', return_value=users):
+            stats = issue_course_certificates(self.course, workers=1)
+
+        self.assertEqual(stats['issued'], 1)
+        with open(os.path.join(self.media_root, name), 'rb') as file:
+            self.assertEqual(file.read(), b'issued by job')
+        self.assertEqual(sorted(os.listdir(os.path.join(self.media_root, 'certificates'))), sorted([
+            os.path.basename(name),
+            os.path.basename(get_certificate_filename(User.objects.get(username='student1'), self.course)),
+        ]))
+
+
+class CertificateDownloadTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        os.makedirs(os.path.join(self.media_root, 'certificates'))
+        with open(os.path.join(self.media_root, 'certificates', 'student.pdf'), 'wb') as file:
+            file.write(bytes(range(100)))
+
+        self.student = User.objects.create(username='student')
+        course = create_course(User.objects.create(username='author'))
+        self.certificate = Certificate.objects.create(user=self.student, course=course, file='certificates/student.pdf')
+        self.url = f'/api/download-certificate/{self.certificate.id}/'
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def get(self, url=None, **headers):
+        with self.settings(MEDIA_ROOT=self.media_root):
+            return self.client.get(url or self.url, headers=headers)
+
+    def test_full_download(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), bytes(range(100)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('attachment', response['Content-Disposition'])
+
+    def test_range_requests(self):
+        response = self.get(Range='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/100')
+        self.assertEqual(b''.join(response.streaming_content), bytes(range(10, 20)))
+
+        response = self.get(Range='bytes=-5')
+        self.assertEqual(b''.join(response.streaming_content), bytes(range(95, 100)))
+
+        response = self.get(Range='bytes=200-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */100')
+
+    def test_conditional_requests(self):
+        etag = self.get()['ETag']
+        self.assertEqual(self.get(If_None_Match=etag).status_code, 304)
+        # Устаревший If-Range — отдаётся весь файл
+        self.assertEqual(self.get(Range='bytes=0-9', If_Range='"stale"').status_code, 200)
+        self.assertEqual(self.get(Range='bytes=0-9', If_Range=etag).status_code, 206)
+
+    def test_x_accel_redirect(self):
+        with self.settings(FILE_DELIVERY_MODE='x-accel'):
+            response = self.get()
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/certificates/student.pdf')
+        self.assertEqual(response.content, b'')
+
+    def test_permissions(self):
+        self.client.force_authenticate(User.objects.create(username='other'))
+        self.assertEqual(self.get().status_code, 404)
+        # Приватные каталоги не отдаются по MEDIA_URL
+        self.assertEqual(self.get('/media/certificates/student.pdf').status_code, 404)
+        self.assertEqual(self.get('/media/avatars/../certificates/student.pdf').status_code, 404)
+        self.assertEqual(self.get('/media/certificates/').status_code, 404)
+        self.assertEqual(self.get('/media/certificates').status_code, 404)
+
+    def test_directories_are_not_served(self):
+        os.makedirs(os.path.join(self.media_root, 'avatars', 'sub'))
+        self.assertEqual(self.get('/media/avatars/sub/').status_code, 404)
+        self.assertEqual(self.get('/media/avatars/').status_code, 404)
+
+
+class DatabaseProfileTests(TestCase):
+    @skipUnless(connection.vendor == 'sqlite', 'Прагмы задаются только для SQLite')
+    def test_sqlite_pragmas_applied(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA temp_store')
+            self.assertEqual(cursor.fetchone()[0], 2)  # MEMORY
+
+
+class IndexUsageTests(TestCase):
+    """Основные запросы чтения должны идти по индексам, а не полным сканированием таблиц."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(username='author')
+        users = User.objects.bulk_create(User(username=f'user{index}') for index in range(200))
+        courses = Course.objects.bulk_create(
+            Course(title=f'Курс {index}', description='Описание', author=author) for index in range(20)
+        )
+        modules = Module.objects.bulk_create(
+            Module(title='Модуль', course=course, order=order) for course in courses for order in range(5)
+        )
+        lessons = Lesson.objects.bulk_create(
+            Lesson(title='Урок', module=module, order=order) for module in modules for order in range(5)
+        )
+        Step.objects.bulk_create(
+            Step(lesson=lesson, order=order, step_type='text', content={'html': ''})
+            for lesson in lessons for order in range(10)
+        )
+        CourseProgress.objects.bulk_create(
+            CourseProgress(user=user, course=course, completed=index % 2 == 0)
+            for index, user in enumerate(users) for course in courses[:5]
+        )
+        Certificate.objects.bulk_create(
+            Certificate(user=user, course=courses[0], file='certificates/test.pdf') for user in users[::2]
+        )
+        cls.user, cls.course, cls.module, cls.lesson = users[0], courses[0], modules[0], lessons[0]
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def assertUsesIndex(self, queryset, index_name=None):
+        plan = queryset.explain()
+        if connection.vendor == 'sqlite':
+            self.assertNotRegex(plan, r'\bSCAN api_', plan)
+        else:
+            self.assertNotIn('Seq Scan', plan)
+        if index_name:
+            self.assertIn(index_name, plan)
+
+    def test_content_tree_queries(self):
+        self.assertUsesIndex(Module.objects.filter(course=self.course), 'module_course_order_idx')
+        self.assertUsesIndex(Lesson.objects.filter(module=self.module), 'lesson_module_order_idx')
+        self.assertUsesIndex(Step.objects.filter(lesson=self.lesson), 'step_lesson_order_idx')
+        self.assertUsesIndex(Step.objects.filter(lesson__in=[self.lesson]), 'step_lesson_order_idx')
+        if connection.vendor == 'sqlite':
+            # Сортировка по order берётся из составного индекса, без отдельного шага сортировки
+            self.assertNotIn('TEMP B-TREE', Step.objects.filter(lesson=self.lesson).explain())
+
+    def test_progress_and_certificate_queries(self):
+        self.assertUsesIndex(CourseProgress.objects.filter(user=self.user, course=self.course))
+        self.assertUsesIndex(CourseProgress.objects.filter(user=self.user, completed=True),
+                             'progress_user_completed_idx')
+        self.assertUsesIndex(Certificate.objects.filter(user=self.user, course=self.course))
+
+    def test_certificate_is_unique_per_course(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Certificate.objects.create(user=self.user, course=self.course, file='certificates/again.pdf')
+
+
+class SeedDataTests(TestCase):
+    def fingerprint(self):
+        return list(
+            CourseProgress.objects.order_by('user__username', 'course__title')
+            .values_list('user__username', 'course__title', 'completed_steps_count', 'completed')
+        )
+
+    def test_seed_is_deterministic_and_consistent(self):
+        SeedGenerator(seed=7, courses=4, users=10, courses_per_user=2).run()
+        first = self.fingerprint()
+        flush_seed_data()
+        self.assertFalse(Course.objects.exists())
+        stats = SeedGenerator(seed=7, courses=4, users=10, courses_per_user=2).run()
+
+        self.assertEqual(self.fingerprint(), first)
+        self.assertEqual(stats['progress'], 20)
+        # Денормализованные счётчики заполнены без сигналов и совпадают с фактическими
+        for course in Course.objects.all():
+            self.assertEqual(course.steps_count, Step.objects.filter(lesson__module__course=course).count())
+        for progress in CourseProgress.objects.all():
+            self.assertEqual(progress.completed_steps_count, progress.completed_steps.count())
+
+    def test_benchmark_command_runs(self):
+        SeedGenerator(seed=1, courses=3, users=5, courses_per_user=3).run()
+        steps_before = CourseProgress.completed_steps.through.objects.count()
+        output = StringIO()
+        call_command('benchmark_api', iterations=2, warmup=0, stdout=output)
+
+        self.assertIn('progress POST', output.getvalue())
+        # Замер откатывает свои изменения
+        self.assertEqual(CourseProgress.completed_steps.through.objects.count(), steps_before)
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        metrics_registry.reset()
+        self.admin = User.objects.create(username='admin', is_staff=True)
+        create_course(self.admin)
+
+    def test_disabled_by_default(self):
+        response = APIClient().get('/api/courses/')
+        self.assertNotIn('Server-Timing', response.headers)
+
+    @override_settings(REQUEST_METRICS_ENABLED=True)
+    def test_server_timing_and_prometheus_endpoint(self):
+        client = APIClient()
+        with self.assertLogs('api.metrics', level='INFO') as logs:
+            response = client.get('/api/courses/')
+
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="2 queries", serialize;dur=[\d.]+, total')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual((record['route'], record['queries'], record['status']), ('course-list', 2, 200))
+
+        with self.assertLogs('api.metrics', level='INFO'):
+            self.assertEqual(client.get('/api/metrics/').status_code, 401)
+            client.force_authenticate(self.admin)
+            metrics = client.get('/api/metrics/').content.decode()
+        self.assertIn('api_request_duration_seconds_count{route="course-list",method="GET"} 1', metrics)
+        self.assertIn('api_db_queries_total{route="course-list",method="GET"} 2', metrics)
+
+
+class NPlusOneDetectorTests(TestCase):
+    def setUp(self):
+        self.student = User.objects.create(username='student')
+        for index in range(3):
+            create_course(self.student, title=f'Курс {index}')
+
+    def test_reports_serializer_field_and_stack(self):
+        request = APIRequestFactory().get('/api/courses/')
+        request.user = self.student
+
+        with self.assertRaises(NPlusOneError) as error, assert_no_n_plus_one():
+            # Без with_user_state каждый курс проверяет избранное отдельным запросом
+            CourseSerializer(Course.objects.all(), many=True, context={'request': request}).data
+
+        report = str(error.exception)
+        self.assertIn('поле сериализатора: CourseSerializer.is_favorite', report)
+        self.assertIn('get_is_favorite', report)
+        self.assertIn('test_reports_serializer_field_and_stack', report)
+
+    def test_course_list_has_no_n_plus_one(self):
+        client = APIClient()
+        client.force_authenticate(self.student)
+        with assert_no_n_plus_one():
+            client.get('/api/courses/')
+
+    @override_settings(NPLUSONE_ENABLED=True, NPLUSONE_STRICT=True)
+    def test_strict_middleware_raises(self):
+        client = APIClient()
+        client.force_authenticate(self.student)
+        self.assertEqual(client.get('/api/courses/').status_code, 200)
+
+        # Без аннотаций with_user_state список снова делает запросы на каждый курс
+        with mock.patch.object(CourseViewSet, 'get_queryset', lambda view: Course.objects.order_by('-id')):
+            with self.assertRaises(NPlusOneError):
+                client.get('/api/courses/')
+
+
+class UserCoursesTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create(username='author')
+        self.student = User.objects.create(username='student')
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def enroll(self, count, completed):
+        for index in range(count):
+            course = create_course(self.author, title=f'Курс {completed} {index}', steps=4)
+            progress = CourseProgress.objects.create(user=self.student, course=course, completed=completed)
+            progress.complete_steps(list(Step.objects.filter(lesson__module__course=course)[:4 if completed else 1]))
+
+    def test_split_in_one_query(self):
+        self.enroll(2, completed=False)
+        self.enroll(1, completed=True)
+        with self.assertNumQueries(1):
+            small = self.client.get('/api/user/courses/')
+
+        self.enroll(8, completed=False)
+        self.enroll(6, completed=True)
+        with self.assertNumQueries(1), assert_no_n_plus_one():
+            response = self.client.get('/api/user/courses/?page_size=5')
+
+        self.assertEqual(len(small.data['ongoing']), 2)
+        self.assertEqual(len(response.data['ongoing']), 5)
+        self.assertEqual(len(response.data['completed']), 5)
+        card = response.data['ongoing'][0]
+        self.assertEqual((card['title'], card['progress_percentage']), ('Курс False 7', 25.0))
+        self.assertEqual(response.data['completed'][0]['progress_percentage'], 100.0)
+
+    def test_next_pages(self):
+        self.enroll(7, completed=False)
+        self.enroll(2, completed=True)
+        response = self.client.get('/api/user/courses/?page_size=3')
+        self.assertIsNone(response.data['completed_next'])
+
+        titles = [course['title'] for course in response.data['ongoing']]
+        next_url = response.data['ongoing_next']
+        while next_url:
+            page = self.client.get(next_url).data
+            titles += [course['title'] for course in page['results']]
+            next_url = page['next']
+
+        self.assertEqual(titles, [f'Курс False {index}' for index in reversed(range(7))])
+
+
+class LessonStepsBulkTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.author = User.objects.create(username='author')
+        self.student = User.objects.create(username='student')
+        self.course = create_course(self.author, steps=3)
+        self.module = self.course.modules.first()
+        self.lesson = self.module.lessons.first()
+        self.steps = list(self.lesson.steps.all())
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+        self.steps_url = f'/api/courses/{self.course.id}/modules/{self.module.id}/lessons/{self.lesson.id}/steps/'
+        self.bulk_url = f'{self.steps_url}bulk/'
+
+    def item(self, step=None, html='<p>новый</p>'):
+        data = {'step_type': 'text', 'content': {'html': html}}
+        if step is not None:
+            data['id'] = step.id
+            data['content'] = step.content
+        return data
+
+    def test_diff_is_applied_in_order(self):
+        first, second, third = self.steps
+        progress = CourseProgress.objects.create(user=self.student, course=self.course)
+        progress.update_progress(first)
+        progress.update_progress(second)
+        self.client.get(self.steps_url)
+
+        changed = self.item(third)
+        changed['content'] = {'html': '<p>изменён</p>'}
+        response = self.client.put(self.bulk_url, {'steps': [changed, self.item(), self.item(first)]}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        steps = list(self.lesson.steps.order_by('order'))
+        self.assertEqual([step.id for step in steps][::2], [third.id, first.id])
+        self.assertEqual([step.order for step in steps], [0, 1, 2])
+        self.assertEqual(steps[0].content, {'html': '<p>изменён</p>'})
+        self.assertEqual([item['id'] for item in response.data], [step.id for step in steps])
+        self.assertFalse(Step.objects.filter(pk=second.id).exists())
+
+        # Счётчики и кэш дерева поддерживаются без сигналов
+        self.course.refresh_from_db()
+        progress.refresh_from_db()
+        self.assertEqual(self.course.steps_count, 3)
+        self.assertEqual(progress.completed_steps_count, 1)
+        self.assertIsNone(progress.current_step_id)
+        self.assertEqual([item['id'] for item in self.client.get(self.steps_url).data], [step.id for step in steps])
+
+    def test_query_count_does_not_depend_on_step_count(self):
+        items = [self.item(html=f'<p>{index}</p>') for index in range(50)]
+        with CaptureQueriesContext(connection) as created:
+            self.client.put(self.bulk_url, {'steps': items}, format='json')
+
+        steps = list(self.lesson.steps.order_by('order'))
+        self.assertEqual(len(steps), 50)
+        items = [self.item(step) for step in reversed(steps[5:])] + [self.item() for _ in range(5)]
+        with CaptureQueriesContext(connection) as mixed, assert_no_n_plus_one():
+            response = self.client.put(self.bulk_url, {'steps': items}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(created.captured_queries), 24)
+        self.assertLessEqual(len(mixed.captured_queries), 24)
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.steps_count, 50)
+
+    def test_invalid_payload_changes_nothing(self):
+        other = create_course(self.author, title='Другой', steps=1)
+        foreign = Step.objects.get(lesson__module__course=other)
+        version = Course.objects.get(pk=self.course.pk).content_version
+
+        for items in (
+            [self.item(foreign)],
+            [self.item(self.steps[0]), self.item(self.steps[0])],
+            [{'step_type': 'video', 'content': {}}],
+            [{'step_type': 'text', 'content': {'html': 5}}],
+            [{'step_type': 'question', 'content': {'question': 'Вопрос', 'answers': 'Да'}}],
+        ):
+            response = self.client.put(self.bulk_url, {'steps': items}, format='json')
+            self.assertEqual(response.status_code, 400)
+
+        self.assertEqual(list(self.lesson.steps.all()), self.steps)
+        self.assertEqual(Course.objects.get(pk=self.course.pk).content_version, version)
+
+
+class CascadeDeleteTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.author = User.objects.create(username='author')
+        self.course = create_course(self.author, steps=50)
+        self.module = self.course.modules.get()
+        self.lesson = self.module.lessons.get()
+        # Второй урок в другом модуле остаётся после удаления
+        other_module = Module.objects.create(title='Модуль 2', course=self.course, order=ORDER_GAP)
+        other_lesson = Lesson.objects.create(title='Урок 2', module=other_module, order=0)
+        self.kept = Step.objects.create(lesson=other_lesson, order=0, step_type='text', content={'html': '<p>Остаётся</p>'})
+
+        self.progress = CourseProgress.objects.create(user=User.objects.create(username='student'), course=self.course)
+        for step in [*self.lesson.steps.all()[:3], self.kept]:
+            self.progress.update_progress(step)
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def assertCleanedUp(self):
+        self.course.refresh_from_db()
+        self.progress.refresh_from_db()
+        self.assertEqual(self.course.steps_count, 1)
+        self.assertEqual(self.progress.completed_steps_count, 1)
+        self.assertEqual(SearchDocument.objects.filter(step__isnull=False).count(), 1)
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute(f'SELECT count(*) FROM {FTS_TABLE}')
+                self.assertEqual(cursor.fetchone()[0], SearchDocument.objects.count())
+
+    def test_lesson_delete_does_not_fire_per_step_work(self):
+        url = f'/api/courses/{self.course.id}/modules/{self.module.id}/lessons/{self.lesson.id}/'
+        etag = self.client.get(f'/api/courses/{self.course.id}/modules/')['ETag']
+        with CaptureQueriesContext(connection) as queries, assert_no_n_plus_one():
+            response = self.client.delete(url)
+        self.assertEqual(response.status_code, 204)
+        self.assertLess(len(queries.captured_queries), 30)
+        self.assertCleanedUp()
+        response = self.client.get(f'/api/courses/{self.course.id}/modules/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_module_delete_does_not_fire_per_step_work(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.delete(f'/api/courses/{self.course.id}/modules/{self.module.id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertLess(len(queries.captured_queries), 30)
+        self.assertCleanedUp()
+
+    def test_course_delete_removes_search_rows(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.course.delete()
+        self.assertLess(len(queries.captured_queries), 30)
+        self.assertFalse(SearchDocument.objects.exists())
+
+
+class OrderingTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.author = User.objects.create(username='author')
+        self.course = Course.objects.create(title='Курс', description='Описание', author=self.author)
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+        self.modules_url = f'/api/courses/{self.course.id}/modules/'
+        self.modules = [self.client.post(self.modules_url, {'title': f'Модуль {index}', 'course': self.course.id}).data for index in range(4)]
+
+    def module_ids(self):
+        return [module['id'] for module in self.client.get(self.modules_url).data]
+
+    def test_new_items_are_appended_with_gaps(self):
+        self.assertEqual([module['order'] for module in self.modules], [ORDER_GAP * index for index in range(1, 5)])
+
+        lessons_url = f'{self.modules_url}{self.modules[0]["id"]}/lessons/'
+        first = self.client.post(lessons_url, {'title': 'Урок 1'}).data
+        second = self.client.post(lessons_url, {'title': 'Урок 2'}).data
+        self.assertEqual((first['order'], second['order']), (ORDER_GAP, 2 * ORDER_GAP))
+
+    def test_move_updates_one_row(self):
+        ids = [module['id'] for module in self.modules]
+        self.client.get(self.modules_url)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(f'{self.modules_url}{ids[3]}/move/', {'after': None}, format='json')
+        self.assertEqual(response.status_code, 200)
+        updates = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE "api_module"')]
+        self.assertEqual(len(updates), 1)
+
+        self.client.post(f'{self.modules_url}{ids[0]}/move/', {'after': ids[1]}, format='json')
+        self.assertEqual(self.module_ids(), [ids[3], ids[1], ids[0], ids[2]])
+
+    def test_exhausted_gap_rebalances_siblings(self):
+        module = Module.objects.get(pk=self.modules[0]['id'])
+        lessons = [Lesson.objects.create(title=f'Урок {index}', module=module, order=index) for index in range(3)]
+        url = f'{self.modules_url}{module.id}/lessons/'
+
+        response = self.client.post(f'{url}{lessons[2].id}/move/', {'after': lessons[0].id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            list(module.lessons.values_list('id', 'order')),
+            [(lessons[0].id, ORDER_GAP), (lessons[2].id, 2 * ORDER_GAP), (lessons[1].id, 3 * ORDER_GAP)],
+        )
+
+        response = self.client.post(f'{url}{lessons[2].id}/move/', {'after': lessons[2].id}, format='json')
+        self.assertEqual(response.status_code, 400)
+        other = Lesson.objects.create(title='Чужой урок', module_id=self.modules[1]['id'], order=ORDER_GAP)
+        response = self.client.post(f'{url}{lessons[2].id}/move/', {'after': other.id}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_reorder_sets_full_order(self):
+        ids = [module['id'] for module in self.modules]
+        response = self.client.put(f'{self.modules_url}reorder/', {'ids': ids[::-1]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.module_ids(), ids[::-1])
+
+        response = self.client.put(f'{self.modules_url}reorder/', {'ids': ids[1:]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class CourseCloneTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='author')
+        cls.course = Course.objects.create(title='Большой курс', description='Описание', author=cls.author)
+        cls.course.tags.set([Tag.objects.create(name='HTML'), Tag.objects.create(name='CSS')])
+
+        # 10 модулей × 10 уроков × 100 шагов = 10 000 шагов
+        modules = Module.objects.bulk_create([
+            Module(title=f'Модуль {index}', course=cls.course, order=(index + 1) * ORDER_GAP) for index in range(10)
+        ])
+        lessons = Lesson.objects.bulk_create([
+            Lesson(title=f'Урок {index}', module=module, order=(index + 1) * ORDER_GAP)
+            for module in modules for index in range(10)
+        ])
+        Step.objects.bulk_create([
+            Step(lesson=lesson, order=index, step_type='text', content={'html': f'<p>{lesson.id}-{index}</p>'})
+            for lesson in lessons for index in range(100)
+        ], batch_size=2000)
+        cls.course.recalculate_steps_count()
+
+    def tree(self, course):
+        return list(
+            Step.objects.filter(lesson__module__course=course)
+            .order_by('lesson__module__order', 'lesson__order', 'order')
+            .values_list('lesson__module__title', 'lesson__title', 'order', 'content')
+        )
+
+    def test_clone_copies_tree_in_batches(self):
+        client = APIClient()
+        client.force_authenticate(self.author)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.post(f'/api/courses/{self.course.id}/clone/', {'title': 'Новый поток'}, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['copied'], {'tags': 2, 'modules': 10, 'lessons': 100, 'steps': 10000})
+        # Число запросов определяется пачками вставки шагов и поисковых документов, а не числом строк
+        self.assertLess(len(queries.captured_queries), 150)
+
+        clone = Course.objects.get(pk=response.data['id'])
+        self.assertEqual((clone.title, clone.author, clone.steps_count), ('Новый поток', self.author, 10000))
+        self.assertEqual(set(clone.tags.values_list('name', flat=True)), {'HTML', 'CSS'})
+        self.assertEqual(self.tree(clone), self.tree(self.course))
+
+    def test_only_author_can_clone(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create(username='stranger'))
+        response = client.post(f'/api/courses/{self.course.id}/clone/')
+        self.assertEqual(response.status_code, 403)
+
+    def test_command(self):
+        out = StringIO()
+        call_command('clone_course', self.course.id, '--batch-size', '5000', stdout=out)
+        self.assertIn('шагов 10000', out.getvalue())
+        self.assertEqual(Course.objects.filter(title='Большой курс (копия)').count(), 1)
+
+
+class CourseArchiveTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        os.makedirs(os.path.join(self.media_root, 'avatars'))
+        with open(os.path.join(self.media_root, 'avatars', 'html.png'), 'wb') as file:
+            file.write(b'avatar-bytes')
+
+        self.author = User.objects.create(username='author')
+        self.course = create_course(self.author, title='HTML', steps=0, tags=[Tag.objects.create(name='HTML')])
+        self.course.avatar = 'avatars/html.png'
+        self.course.save()
+        lesson = Lesson.objects.get(module__course=self.course)
+        Step.objects.bulk_create([
+            Step(lesson=lesson, order=index, step_type='question',
+                 content={'question': f'Вопрос {index}', 'answers': ['Да', 'Нет'], 'correct_answer': 0})
+            for index in range(450)
+        ])
+        # Модуль без уроков тоже переносится
+        Module.objects.create(title='Пустой модуль', course=self.course, order=2 * ORDER_GAP)
+        self.course.recalculate_steps_count()
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def tree(self, course):
+        modules = list(course.modules.order_by('order').values_list('title', 'order'))
+        steps = list(
+            Step.objects.filter(lesson__module__course=course)
+            .order_by('lesson__module__order', 'lesson__order', 'order')
+            .values_list('lesson__title', 'order', 'step_type', 'content')
+        )
+        return modules, steps
+
+    def test_api_round_trip(self):
+        with self.settings(MEDIA_ROOT=self.media_root):
+            response = self.client.get(f'/api/courses/{self.course.id}/export/')
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.streaming)
+            data = b''.join(response.streaming_content)
+
+            upload = SimpleUploadedFile('course.zip', data, content_type='application/zip')
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post('/api/courses/import/', {'archive': upload, 'title': 'Копия HTML'})
+            self.assertEqual(response.status_code, 201)
+
+            imported = Course.objects.get(pk=response.data['id'])
+            self.assertEqual(imported.title, 'Копия HTML')
+            self.assertEqual(imported.steps_count, 450)
+            self.assertEqual(list(imported.tags.values_list('name', flat=True)), ['HTML'])
+            self.assertEqual(self.tree(imported), self.tree(self.course))
+            with imported.avatar.open('rb') as avatar:
+                self.assertEqual(avatar.read(), b'avatar-bytes')
+
+        step_inserts = [query for query in queries.captured_queries
+                        if query['sql'].startswith('INSERT INTO "api_step"')]
+        self.assertLessEqual(len(step_inserts), 3)
+
+    def test_commands_and_batches(self):
+        path = os.path.join(self.media_root, 'course.zip')
+        with self.settings(MEDIA_ROOT=self.media_root):
+            call_command('export_course', self.course.id, '--output', path, stdout=StringIO())
+            with CaptureQueriesContext(connection) as queries:
+                call_command('import_course', path, '--author', 'author', '--batch-size', '100', stdout=StringIO())
+
+        imported = Course.objects.exclude(pk=self.course.pk).get(title='HTML')
+        self.assertEqual(self.tree(imported), self.tree(self.course))
+        step_inserts = [query for query in queries.captured_queries
+                        if query['sql'].startswith('INSERT INTO "api_step"')]
+        self.assertEqual(len(step_inserts), 5)
+
+    def test_invalid_archive(self):
+        for data in (b'not a zip', self.make_archive('{"type": "course", "version": 99}\n')):
+            upload = SimpleUploadedFile('course.zip', data)
+            response = self.client.post('/api/courses/import/', {'archive': upload})
+            self.assertEqual(response.status_code, 400)
+
+        header = '{"type": "course", "version": 1, "title": "T", "description": "", "price": 0, "tags": []}\n'
+        records = header + '{"type": "module", "title": "M", "order": 1}\n{"type": "step", "order": 0}\n'
+        upload = SimpleUploadedFile('course.zip', self.make_archive(records))
+        response = self.client.post('/api/courses/import/', {'archive': upload})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('шаг вне урока', response.data['error'])
+        self.assertFalse(Course.objects.filter(title='T').exists())
+
+    def test_only_author_can_export(self):
+        self.client.force_authenticate(User.objects.create(username='stranger'))
+        self.assertEqual(self.client.get(f'/api/courses/{self.course.id}/export/').status_code, 403)
+
+    def make_archive(self, records):
+        buffer = BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as archive:
+            archive.writestr('course.jsonl', records)
+        return buffer.getvalue()
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create(username='author')
+        self.python = Tag.objects.create(name='Python')
+        self.course = create_course(self.author, title='Основы программирования', steps=0, tags=[self.python])
+        self.lesson = Lesson.objects.get(module__course=self.course)
+        self.text_step = Step.objects.create(lesson=self.lesson, order=0, step_type='text',
+                                             content={'html': '<p>Переменные хранят значения &laquo;типов&raquo;</p>'})
+        self.question_step = Step.objects.create(lesson=self.lesson, order=1, step_type='question', content={
+            'question': 'Что такое функция?', 'answers': ['Подпрограмма', 'Переменная'], 'correct_answer': 0,
+        })
+        self.other = create_course(self.author, title='Рисование акварелью', steps=0)
+        self.client = APIClient()
+
+    def search(self, query, **params):
+        response = self.client.get('/api/search/', {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_stemming_matches_word_forms(self):
+        self.assertEqual(stem('программирование'), stem('программированию'))
+        self.assertEqual(stem('функции'), stem('функция'))
+        self.assertEqual(stem('Переменных'), 'перемен')
+
+        results = self.search('переменной')['results']
+        self.assertEqual([(hit['type'], hit['step'] and hit['step']['id']) for hit in results],
+                         [('step', self.text_step.id), ('step', self.question_step.id)])
+        self.assertEqual(results[0]['lesson']['id'], self.lesson.id)
+        self.assertIn('Переменные хранят значения «типов»', results[0]['snippet'])
+
+    def test_title_ranks_above_body(self):
+        Step.objects.create(lesson=Lesson.objects.get(module__course=self.other), order=0, step_type='text',
+                            content={'html': '<p>Программирование кистью</p>'})
+        results = self.search('программирования')['results']
+        self.assertEqual(results[0]['type'], 'course')
+        self.assertEqual(results[0]['course']['id'], self.course.id)
+        self.assertEqual([hit['course']['id'] for hit in results[1:]], [self.other.id])
+        self.assertGreater(results[0]['rank'], results[1]['rank'])
+
+    def test_course_tags_are_searchable(self):
+        self.assertEqual([hit['course']['id'] for hit in self.search('python')['results']], [self.course.id])
+        self.other.tags.add(self.python)
+        self.assertEqual({hit['course']['id'] for hit in self.search('python')['results']},
+                         {self.course.id, self.other.id})
+        self.python.delete()
+        self.assertEqual(self.search('python')['results'], [])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.text_step.content = {'html': '<p>Циклы повторяют действия</p>'}
+        self.text_step.save()
+        self.assertEqual([hit['step']['id'] for hit in self.search('цикл')['results']], [self.text_step.id])
+        self.assertEqual([hit['step']['id'] for hit in self.search('переменные')['results']],
+                         [self.question_step.id])
+
+        self.question_step.delete()
+        self.assertEqual(self.search('подпрограмма')['results'], [])
+
+        self.other.title = 'Основы рисования'
+        self.other.save()
+        self.assertEqual({hit['course']['id'] for hit in self.search('основы')['results']},
+                         {self.course.id, self.other.id})
+
+        self.course.delete()
+        self.assertEqual(self.search('циклы')['results'], [])
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute(f'SELECT count(*) FROM {FTS_TABLE}')
+                self.assertEqual(cursor.fetchone()[0], SearchDocument.objects.count())
+
+    def test_bulk_step_save_updates_index(self):
+        client = APIClient()
+        client.force_authenticate(self.author)
+        url = (f'/api/courses/{self.course.id}/modules/{self.lesson.module_id}/lessons/{self.lesson.id}'
+               f'/steps/bulk/')
+        response = client.put(url, {'steps': [
+            {'id': self.text_step.id, 'step_type': 'text', 'content': {'html': '<p>Словари и множества</p>'}},
+            {'step_type': 'text', 'content': {'html': '<p>Кортежи неизменяемы</p>'}},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual([hit['step']['id'] for hit in self.search('словарь')['results']], [self.text_step.id])
+        self.assertEqual(len(self.search('кортеж')['results']), 1)
+        self.assertEqual(self.search('подпрограмма')['results'], [])
+
+    def test_pagination_without_count(self):
+        Step.objects.bulk_create([
+            Step(lesson=self.lesson, order=index + 2, step_type='text', content={'html': f'<p>Задача {index}</p>'})
+            for index in range(25)
+        ])
+        call_command('rebuild_search_index', stdout=StringIO())
+
+        with CaptureQueriesContext(connection) as queries:
+            first = self.search('задачи', page_size=10)
+        self.assertEqual(len(first['results']), 10)
+        self.assertIsNone(first['previous'])
+        self.assertEqual(len(queries.captured_queries), 2)
+        self.assertFalse(any('COUNT(' in query['sql'].upper() for query in queries.captured_queries))
+
+        last = self.search('задачи', page_size=10, page=3)
+        self.assertEqual(len(last['results']), 5)
+        self.assertIsNone(last['next'])
+        self.assertIn('page=2', last['previous'])
+        ids = [hit['step']['id'] for page in (1, 2, 3)
+               for hit in self.search('задачи', page_size=10, page=page)['results']]
+        self.assertEqual(len(set(ids)), 25)
+
+    def test_empty_query(self):
+        self.assertEqual(self.client.get('/api/search/', {'q': ' '}).status_code, 400)
+        self.assertEqual(self.search('!!!')['results'], [])
+
+    def test_admin_search_uses_index(self):
+        admin_user = User.objects.create_superuser(username='admin', password='pass', email='admin@example.com')
+        self.client.force_login(admin_user)
+        response = self.client.get('/admin/api/course/', {'q': 'функции'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['cl'].result_list), [self.course])
+
+    def test_admin_search_is_not_capped(self):
+        # Тысяча коротких шагов ранжируется выше длинного описания третьего курса
+        Step.objects.bulk_create([
+            Step(lesson=Lesson.objects.get(module__course=self.other), order=index, step_type='text',
+                 content={'html': '<p>Функции</p>'})
+            for index in range(1000)
+        ])
+        third = create_course(self.author, title='Алгоритмы', steps=0)
+        Course.objects.filter(pk=third.pk).update(description=' '.join(['сортировка'] * 200 + ['функции']))
+        call_command('rebuild_search_index', stdout=StringIO())
+
+        admin_user = User.objects.create_superuser(username='admin', password='pass', email='admin@example.com')
+        self.client.force_login(admin_user)
+        response = self.client.get('/admin/api/course/', {'q': 'функции'})
+        self.assertEqual({course.id for course in response.context['cl'].result_list},
+                         {self.course.id, self.other.id, third.id})
@@ -11,7 +11,8 @@ from .views import (
     RegisterView,
     test_end_point,
     get_routes, CourseProgressView, UserCoursesView, CertificateGenerateView, CertificateDownloadView,
-    CertificateDetailView, UserProfileUpdateView
+    CertificateDetailView, UserProfileUpdateView, CourseCacheStatsView, CourseProgressBatchView,
+    CertificateJobDetailView, MetricsView, SearchView
 )
 
 # Основной роутер
@@ -36,14 +37,20 @@ urlpatterns = [
     path('', include(lessons_router.urls)),
 
     path('courses/<int:course_id>/progress/', CourseProgressView.as_view(), name='course-progress'),
+    path('courses/<int:course_id>/progress/batch/', CourseProgressBatchView.as_view(), name='course-progress-batch'),
     path('user/courses/', UserCoursesView.as_view(), name='user-courses'),
+    path('search/', SearchView.as_view(), name='search'),
 
     path('generate-certificate/<int:course_id>/', CertificateGenerateView.as_view(), name='generate-certificate'),
     path('download-certificate/<int:certificate_id>/', CertificateDownloadView.as_view(), name='download-certificate'),
     path('certificates/<int:course_id>/', CertificateDetailView.as_view(), name='certificate-detail'),
+    path('certificate-jobs/<int:job_id>/', CertificateJobDetailView.as_view(), name='certificate-job-detail'),
 
     path('profile/', UserProfileUpdateView.as_view(), name='profile-update'),
 
+    path('cache/stats/', CourseCacheStatsView.as_view(), name='cache-stats'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+
     # Аутентификация и авторизация
     path('token/', MyTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
@@ -1,22 +1,28 @@
 import os
 
-from django.http import FileResponse
 from rest_framework import viewsets, generics, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny, IsAuthenticated, IsAuthenticatedOrReadOnly
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated, IsAuthenticatedOrReadOnly
+from rest_framework.filters import OrderingFilter
 from django_filters.rest_framework import DjangoFilterBackend
 
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import status
 
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.db.models import F, Prefetch, Window
+from django.db.models.functions import RowNumber
 from django.shortcuts import get_object_or_404
 
-from config import settings
-from .models import User, Course, Module, Lesson, Step, Tag, CourseProgress, Certificate
+from .models import (
+    User, Course, Module, Lesson, Step, Tag, CourseProgress, Certificate, CertificateJob, ProgressIdempotencyKey
+)
 from .serializers import (
     MyTokenObtainPairSerializer,
     RegisterSerializer,
@@ -24,11 +30,24 @@ from .serializers import (
     ModuleSerializer,
     LessonSerializer,
     StepSerializer,
-    TagSerializer, UpdateProgressSerializer, CourseProgressSerializer, UserUpdateSerializer
+    TagSerializer, UpdateProgressSerializer, CourseProgressSerializer, UserUpdateSerializer,
+    CourseOutlineSerializer, BatchProgressSerializer, CertificateJobSerializer, UserCourseCardSerializer,
+    LessonStepsSerializer
 )
+import hashlib
 import json
 
-from .utils import generate_certificate
+from .archive import CourseArchiveError, read_course_archive, stream_course_archive
+from .cache import get_course_tree_stats
+from .cloning import clone_course
+from .downloads import serve_file
+from .editor import sync_lesson_steps
+from .metrics import registry as metrics_registry
+from .filters import CourseFilter
+from .mixins import ConditionalContentMixin, CourseTreeCacheMixin, OrderedChildrenMixin
+from .pagination import CourseCursorPagination, SearchPagination, UserCoursesCursorPagination
+from .jobs import enqueue_certificate_job, resume_lost_job
+from .search import build_hits, search_documents
 
 
 class MyTokenObtainPairView(TokenObtainPairView):
@@ -80,15 +99,21 @@ class UserProfileUpdateView(generics.RetrieveUpdateAPIView):
         return self.request.user
 
 
-class CourseViewSet(viewsets.ModelViewSet):
+class CourseViewSet(ConditionalContentMixin, viewsets.ModelViewSet):
     serializer_class = CourseSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend]
-    filterset_fields = ['author']
+    pagination_class = CourseCursorPagination
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_class = CourseFilter
+    ordering_fields = ['id', 'price', 'title']
+    ordering = ['-id']
+    # Список зависит от пагинации и фильтров, поэтому условные запросы — только для детального просмотра
+    conditional_actions = ('retrieve',)
+    content_course_lookup = ('pk', 'pk')
 
     def get_queryset(self):
-        queryset = Course.objects.all()
         user = self.request.user
+        queryset = Course.objects.with_user_state(user)
 
         # Проверяем наличие параметра "owned" в запросе
         owned = self.request.query_params.get('owned', None)
@@ -100,6 +125,26 @@ class CourseViewSet(viewsets.ModelViewSet):
         return queryset
 
 
+    def get_content_state(self):
+        user = self.request.user
+        if not user.is_authenticated:
+            return super().get_content_state()
+
+        # Ответ содержит пользовательские поля, поэтому они входят в ETag
+        state = (
+            self.get_content_course_queryset()
+            .annotate_user_state(user)
+            .values_list('id', 'content_version', 'content_updated_at',
+                         'is_favorite', 'is_enrolled', 'user_completed_steps_count')
+            .first()
+        )
+        if state is None:
+            return None
+        course_id, content_version, content_updated_at, is_favorite, is_enrolled, completed_steps_count = state
+        etag = (f'"course-{course_id}-v{content_version}-u{user.pk}'
+                f'-{int(is_favorite)}{int(is_enrolled)}-{completed_steps_count or 0}"')
+        return etag, content_updated_at
+
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
@@ -123,44 +168,131 @@ class CourseViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def favorite(self, request, pk=None):
         course = self.get_object()
-        if request.user in course.favorites.all():
+        if course.is_favorite:
             course.favorites.remove(request.user)
             return Response({'status': 'removed from favorites'}, status=status.HTTP_200_OK)
         else:
             course.favorites.add(request.user)
             return Response({'status': 'added to favorites'}, status=status.HTTP_200_OK)
 
-class ModuleViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
+    def clone(self, request, pk=None):
+        """Копия курса для нового потока; автором копии становится текущий пользователь."""
+        course = get_object_or_404(Course, pk=pk)
+        if course.author_id != request.user.id and not request.user.is_staff:
+            return Response({"error": "Копировать курс может только его автор."}, status=status.HTTP_403_FORBIDDEN)
+
+        clone, stats = clone_course(course, author=request.user, title=request.data.get('title'))
+        return Response({
+            'id': clone.id,
+            'title': clone.title,
+            'copied': {key: value for key, value in stats.items() if key != 'elapsed'},
+            'elapsed': round(stats['elapsed'], 3),
+        }, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['get'], url_path='export', permission_classes=[IsAuthenticated])
+    def export_archive(self, request, pk=None):
+        """Архив курса (zip с course.jsonl и аватаркой), отдаётся потоком по мере чтения из базы."""
+        course = get_object_or_404(Course, pk=pk)
+        if course.author_id != request.user.id and not request.user.is_staff:
+            return Response({"error": "Экспортировать курс может только его автор."}, status=status.HTTP_403_FORBIDDEN)
+
+        response = StreamingHttpResponse(stream_course_archive(course), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="course-{course.id}.zip"'
+        return response
+
+    @action(detail=False, methods=['post'], url_path='import', permission_classes=[IsAuthenticated])
+    def import_archive(self, request):
+        """Создаёт курс из архива в поле archive (multipart); автором становится текущий пользователь."""
+        archive = request.FILES.get('archive')
+        if archive is None:
+            return Response({"error": "Файл архива не передан (поле archive)."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            course, stats = read_course_archive(archive, author=request.user, title=request.data.get('title'))
+        except CourseArchiveError as error:
+            return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'id': course.id,
+            'title': course.title,
+            'imported': {key: value for key, value in stats.items() if key != 'elapsed'},
+            'elapsed': round(stats['elapsed'], 3),
+        }, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['get'])
+    def outline(self, request, pk=None):
+        include_content = request.query_params.get('include_content') == 'true'
+
+        steps = Step.objects.all()
+        if not include_content:
+            steps = steps.defer('content')
+        course = get_object_or_404(
+            Course.objects.prefetch_related('modules__lessons', Prefetch('modules__lessons__steps', queryset=steps)),
+            pk=pk
+        )
+
+        progress = None
+        if request.user.is_authenticated:
+            progress = CourseProgress.objects.filter(user=request.user, course=course).first()
+
+        serializer = CourseOutlineSerializer(course, context={
+            'request': request,
+            'include_content': include_content,
+            'progress': progress,
+        })
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class ModuleViewSet(OrderedChildrenMixin, CourseTreeCacheMixin, viewsets.ModelViewSet):
     serializer_class = ModuleSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    content_course_lookup = ('pk', 'course_pk')
+    tree_section = 'modules'
+    tree_parent_kwarg = 'course_pk'
 
     def get_queryset(self):
         course_id = self.kwargs.get('course_pk')
         return Module.objects.filter(course__id=course_id)
 
+    def lock_order_parent(self):
+        return get_object_or_404(Course.objects.select_for_update(), id=self.kwargs.get('course_pk'))
+
     def perform_create(self, serializer):
-        course_id = self.kwargs.get('course_pk')
-        course = get_object_or_404(Course, id=course_id)
-        serializer.save(course=course)
+        with transaction.atomic():
+            course = self.lock_order_parent()
+            self.set_default_order(serializer)
+            serializer.save(course=course)
 
 
-class LessonViewSet(viewsets.ModelViewSet):
+class LessonViewSet(OrderedChildrenMixin, CourseTreeCacheMixin, viewsets.ModelViewSet):
     serializer_class = LessonSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    content_course_lookup = ('modules__id', 'module_pk')
+    tree_section = 'lessons'
+    tree_parent_kwarg = 'module_pk'
 
     def get_queryset(self):
         module_id = self.kwargs.get('module_pk')
         return Lesson.objects.filter(module__id=module_id)
 
+    def lock_order_parent(self):
+        return get_object_or_404(
+            Module.objects.select_for_update(), id=self.kwargs.get('module_pk'), course_id=self.kwargs.get('course_pk')
+        )
+
     def perform_create(self, serializer):
-        module_id = self.kwargs.get('module_pk')
-        module = get_object_or_404(Module, id=module_id)
-        serializer.save(module=module)
+        with transaction.atomic():
+            module = self.lock_order_parent()
+            self.set_default_order(serializer)
+            serializer.save(module=module)
 
 
-class StepViewSet(viewsets.ModelViewSet):
+class StepViewSet(CourseTreeCacheMixin, viewsets.ModelViewSet):
     serializer_class = StepSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    content_course_lookup = ('modules__lessons__id', 'lesson_pk')
+    tree_section = 'steps'
+    tree_parent_kwarg = 'lesson_pk'
 
     def get_queryset(self):
         lesson_id = self.kwargs.get('lesson_pk')
@@ -171,6 +303,24 @@ class StepViewSet(viewsets.ModelViewSet):
         lesson = Lesson.objects.get(id=lesson_id)
         serializer.save(lesson=lesson)
 
+    @action(detail=False, methods=['put'], url_path='bulk')
+    def bulk(self, request, *args, **kwargs):
+        """
+        Сохраняет весь урок одним запросом: {"steps": [{"id"?, "step_type", "content"}, ...]}
+        в нужном порядке. Шаги без id создаются, отсутствующие в списке удаляются.
+        """
+        with transaction.atomic():
+            lesson = get_object_or_404(
+                Lesson.objects.select_for_update(of=('self',)).select_related('module'),
+                id=self.kwargs['lesson_pk'], module_id=self.kwargs['module_pk'],
+                module__course_id=self.kwargs['course_pk'],
+            )
+            existing = Step.objects.filter(lesson=lesson).in_bulk()
+            serializer = LessonStepsSerializer(data=request.data, context={'existing': existing})
+            serializer.is_valid(raise_exception=True)
+            steps = sync_lesson_steps(lesson, serializer.validated_data['steps'], existing)
+        return Response(StepSerializer(steps, many=True).data, status=status.HTTP_200_OK)
+
 
 class TagViewSet(viewsets.ModelViewSet):
     queryset = Tag.objects.all()
@@ -178,8 +328,87 @@ class TagViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticatedOrReadOnly]
 
 
-class CourseProgressView(APIView):
+class CourseCacheStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(get_course_tree_stats(), status=status.HTTP_200_OK)
+
+
+class SearchView(APIView):
+    """
+    Полнотекстовый поиск по курсам (название, описание, теги) и тексту шагов: ?q=.
+    Результаты упорядочены по релевантности и выдаются страницами (api/search.py).
+    """
+    permission_classes = [AllowAny]
+    pagination_class = SearchPagination
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({"error": "Укажите поисковый запрос в параметре q."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        paginator = self.pagination_class()
+        ranked = paginator.paginate(request, lambda offset, limit: search_documents(query, offset, limit))
+        return paginator.get_paginated_response(build_hits(ranked, query))
+
+
+class MetricsView(APIView):
+    """Гистограммы запросов по маршрутам в текстовом формате Prometheus (api/metrics.py)."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        if not settings.REQUEST_METRICS_ENABLED:
+            return Response({"error": "Метрики выключены (REQUEST_METRICS_ENABLED)."},
+                            status=status.HTTP_404_NOT_FOUND)
+        return HttpResponse(metrics_registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class ProgressUpdateMixin:
+    idempotency_endpoint = None
+
+    def apply_steps(self, request, course_id, steps, build_response_data):
+        """
+        Применяет пройденные шаги в одной транзакции под блокировкой строки прогресса.
+        Повтор запроса с тем же Idempotency-Key (двойной клик, ретрай клиента) к тому же
+        курсу и эндпоинту получает сохранённый ответ и повторно не применяется; тот же ключ
+        с другим телом запроса — ошибка 422. Просроченные ключи пользователя удаляются здесь же.
+        """
+        idempotency_key = request.headers.get('Idempotency-Key')
+
+        with transaction.atomic():
+            if idempotency_key:
+                request_hash = hashlib.sha256(
+                    json.dumps(request.data, sort_keys=True, default=str).encode()
+                ).hexdigest()
+                ProgressIdempotencyKey.objects.filter(user=request.user).expired().delete()
+                record, created = ProgressIdempotencyKey.objects.get_or_create(
+                    user=request.user, key=idempotency_key, course_id=course_id,
+                    endpoint=self.idempotency_endpoint, defaults={'request_hash': request_hash},
+                )
+                if not created:
+                    if record.request_hash != request_hash:
+                        return Response({'error': 'Idempotency-Key уже использован для другого запроса.'},
+                                        status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+                    return Response(record.response, status=status.HTTP_200_OK,
+                                    headers={'Idempotent-Replayed': 'true'})
+
+            # Строка прогресса блокируется, параллельные запросы того же пользователя ждут
+            progress = CourseProgress.get_for_update(request.user, course_id)
+            progress.complete_steps(steps)
+
+            data = build_response_data(progress)
+            if idempotency_key:
+                record.response = data
+                record.save(update_fields=['response'])
+
+        return Response(data, status=status.HTTP_200_OK)
+
+
+class CourseProgressView(ProgressUpdateMixin, APIView):
     permission_classes = [IsAuthenticated]
+    idempotency_endpoint = 'progress'
 
     def get(self, request, course_id):
         try:
@@ -194,32 +423,75 @@ class CourseProgressView(APIView):
         serializer = UpdateProgressSerializer(data=request.data)
         if serializer.is_valid():
             step = serializer.validated_data['step_id']
-            progress, created = CourseProgress.objects.get_or_create(user=request.user, course=step.lesson.module.course)
-            progress.update_progress(step)
-            return Response({'status': 'Progress updated.'}, status=status.HTTP_200_OK)
+            return self.apply_steps(request, step.lesson.module.course_id, [step],
+                                    lambda progress: {'status': 'Progress updated.'})
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class UserCoursesView(APIView):
+class CourseProgressBatchView(ProgressUpdateMixin, APIView):
+    """Принимает упорядоченный список пройденных шагов и применяет его одной транзакцией."""
     permission_classes = [IsAuthenticated]
+    idempotency_endpoint = 'progress_batch'
 
-    def get(self, request, *args, **kwargs):
-        ongoing_progress = CourseProgress.objects.filter(user=request.user, completed=False)
-        completed_progress = CourseProgress.objects.filter(user=request.user, completed=True)
+    def post(self, request, course_id):
+        get_object_or_404(Course, id=course_id)
+        serializer = BatchProgressSerializer(data=request.data, context={'course_id': course_id})
+        if serializer.is_valid():
+            return self.apply_steps(request, course_id, serializer.validated_data['steps'],
+                                    lambda progress: CourseProgressSerializer(progress).data)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        ongoing_courses = [progress.course for progress in ongoing_progress]
-        completed_courses = [progress.course for progress in completed_progress]
 
-        ongoing_courses_serialized = CourseSerializer(ongoing_courses, many=True, context={'request': request}).data
-        completed_courses_serialized = CourseSerializer(completed_courses, many=True, context={'request': request}).data
+class UserCoursesView(APIView):
+    """
+    «Моё обучение». Без параметров отдаёт первые страницы текущих и завершённых курсов
+    одним запросом (ROW_NUMBER по признаку завершения) и ссылки ongoing_next/completed_next;
+    с ?status=ongoing|completed — следующую страницу одного списка.
+    """
+    permission_classes = [IsAuthenticated]
+    pagination_class = UserCoursesCursorPagination
+    STATUSES = {'ongoing': False, 'completed': True}
 
-        return Response({
-            'ongoing': ongoing_courses_serialized,
-            'completed': completed_courses_serialized
-        })
+    def get_queryset(self):
+        return (
+            CourseProgress.objects.filter(user=self.request.user)
+            .select_related('course')
+            .only('id', 'completed', 'completed_steps_count', 'course__title', 'course__avatar',
+                  'course__steps_count')
+        )
+
+    def get(self, request, *args, **kwargs):
+        paginator = self.pagination_class()
+        context = {'request': request}
+
+        progress_status = request.query_params.get('status')
+        if progress_status in self.STATUSES:
+            queryset = self.get_queryset().filter(completed=self.STATUSES[progress_status])
+            page = paginator.paginate_queryset(queryset, request, view=self)
+            return paginator.get_paginated_response(UserCourseCardSerializer(page, many=True, context=context).data)
+
+        page_size = paginator.get_page_size(request)
+        # Лишняя строка в каждой группе показывает, есть ли следующая страница
+        rows = list(
+            self.get_queryset()
+            .annotate(row_number=Window(RowNumber(), partition_by=[F('completed')], order_by=F('id').desc()))
+            .filter(row_number__lte=page_size + 1)
+            .order_by('-id')
+        )
+
+        data = {}
+        for name, completed in self.STATUSES.items():
+            items = [progress for progress in rows if progress.completed == completed]
+            data[name] = UserCourseCardSerializer(items[:page_size], many=True, context=context).data
+            data[f'{name}_next'] = (
+                paginator.get_link_after(request, name, items[page_size - 1].id) if len(items) > page_size else None
+            )
+        return Response(data)
 
 
 class CertificateGenerateView(APIView):
+    permission_classes = [IsAuthenticated]
+
     def post(self, request, course_id):
         user = request.user
         course = get_object_or_404(Course, id=course_id)
@@ -228,16 +500,26 @@ class CertificateGenerateView(APIView):
         if Certificate.objects.filter(user=user, course=course).exists():
             return Response({"error": "Сертификат уже сгенерирован."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Путь к фоновому изображению
-        background_image = os.path.join(settings.STATIC_ROOT, 'images\\background.jpg')
+        # Генерация выполняется в фоне, клиент опрашивает статус задачи
+        with transaction.atomic():
+            job, created = CertificateJob.objects.select_for_update().get_or_create(user=user, course=course)
+            if job.status != CertificateJob.STATUS_RUNNING:
+                if not created:
+                    job.status = CertificateJob.STATUS_PENDING
+                    job.error = ''
+                    job.save(update_fields=['status', 'error', 'updated_at'])
+                enqueue_certificate_job(job)
 
-        # Генерация сертификата
-        certificate_path = generate_certificate(user, course, background_image)
+        return Response(CertificateJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
 
-        # Сохранение сертификата в базе данных
-        Certificate.objects.create(user=user, course=course, file=certificate_path)
 
-        return Response({"success": "Сертификат успешно создан."}, status=status.HTTP_201_CREATED)
+class CertificateJobDetailView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        job = get_object_or_404(CertificateJob, id=job_id, user=request.user)
+        resume_lost_job(job)
+        return Response(CertificateJobSerializer(job).data, status=status.HTTP_200_OK)
 
 
 class CertificateDownloadView(APIView):
@@ -245,9 +527,9 @@ class CertificateDownloadView(APIView):
         certificate = get_object_or_404(Certificate, id=certificate_id, user=request.user)
 
         # Убедитесь, что файл сертификата существует
-        if certificate.file and certificate.file.path:
-            return FileResponse(open(certificate.file.path, 'rb'), as_attachment=True,
-                                filename=os.path.basename(certificate.file.path))
+        if certificate.file and os.path.exists(certificate.file.path):
+            # Права проверены выше; сам файл отдаёт nginx (x-accel) или Django с поддержкой Range
+            return serve_file(request, certificate.file.name, as_attachment=True)
         return Response({"error": "Файл сертификата не найден."}, status=404)
 
 
@@ -44,6 +44,10 @@ JAZZMIN_SETTINGS = jazzmin_settings.SETTINGS
 JAZZMIN_UI_TWEAKS = jazzmin_settings.UI_TWEAKS
 
 MIDDLEWARE = [
+    # Первым, чтобы учитывать полное время запроса; без REQUEST_METRICS_ENABLED отключается сам
+    'api.metrics.RequestMetricsMiddleware',
+    # Поиск N+1 запросов (api/nplusone.py); без NPLUSONE_ENABLED отключается сам
+    'api.nplusone.NPlusOneMiddleware',
     'corsheaders.middleware.CorsMiddleware',
 
     'django.middleware.security.SecurityMiddleware',
@@ -116,24 +120,129 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'config.wsgi.application'
 
-# DATABASES = {
-#     'default': {
-#         'ENGINE': 'django.db.backends.postgresql',
-#         'NAME': os.getenv('POSTGRES_DB', 'hakaton02082024'),
-#         'USER': os.getenv('POSTGRES_USER', 'postgres'),
-#         'PASSWORD': os.getenv('POSTGRES_PASSWORD', 'root'),
-#         'HOST': os.getenv('POSTGRES_HOST', 'db'),
-#         'PORT': os.getenv('POSTGRES_PORT', '5432'),
-#     }
-# }
+def build_database(engine):
+    """
+    Профиль базы выбирается переменной DB_ENGINE:
+    sqlite (по умолчанию) — для разработки и одного узла, прагмы WAL задаются в api/db.py;
+    postgres — постоянные соединения с проверкой (CONN_MAX_AGE, CONN_HEALTH_CHECKS)
+    и настройки для внешнего пула pgbouncer (POSTGRES_POOL=pgbouncer).
+    """
+    if engine == 'postgres':
+        database = {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('POSTGRES_DB', 'hakaton02082024'),
+            'USER': os.getenv('POSTGRES_USER', 'postgres'),
+            'PASSWORD': os.getenv('POSTGRES_PASSWORD', 'root'),
+            'HOST': os.getenv('POSTGRES_HOST', 'db'),
+            'PORT': os.getenv('POSTGRES_PORT', '5432'),
+            # Соединение переиспользуется между запросами и проверяется перед использованием
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 600)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', 5)),
+            },
+            'TEST': {
+                'NAME': os.getenv('POSTGRES_TEST_DB'),
+            },
+        }
+        if os.getenv('POSTGRES_POOL', '') == 'pgbouncer':
+            # Внешний пул в режиме transaction: соединения держит pgbouncer
+            database['CONN_MAX_AGE'] = 0
+            database['DISABLE_SERVER_SIDE_CURSORS'] = True
+        return database
+
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.getenv('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),  # Используем базу данных в каталоге проекта
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        'OPTIONS': {
+            # Сколько секунд ждать освобождения блокировки вместо ошибки "database is locked"
+            'timeout': int(os.getenv('SQLITE_TIMEOUT', 20)),
+        },
+    }
+
 
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',  # Используем базу данных в каталоге проекта
+    'default': build_database(os.getenv('DB_ENGINE', 'sqlite')),
+}
+
+# Прагмы, выполняемые на каждом новом соединении SQLite (api/db.py)
+SQLITE_PRAGMAS = {
+    # WAL навсегда меняет заголовок файла базы, поэтому включается только для базы из SQLITE_PATH:
+    # учебная db.sqlite3 из репозитория остаётся в режиме DELETE и не меняется от запуска manage.py
+    'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL' if os.getenv('SQLITE_PATH') else 'DELETE'),
+    'synchronous': 'NORMAL',
+    'temp_store': 'MEMORY',
+    'cache_size': -int(os.getenv('SQLITE_CACHE_SIZE_KB', 20000)),
+    'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', 128 * 1024 * 1024)),
+}
+
+
+def build_cache(backend, location):
+    if backend == 'redis':
+        return {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': location or 'redis://127.0.0.1:6379/1',
+        }
+    if backend == 'file':
+        return {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': location or os.path.join(BASE_DIR, 'cache'),
+        }
+    return {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': location or backend,
     }
+
+
+# Кэш сериализованного содержимого курсов (api/cache.py): locmem | file | redis
+CACHES = {
+    'default': build_cache('locmem', 'default'),
+    'course_content': build_cache(
+        os.getenv('COURSE_CONTENT_CACHE_BACKEND', 'locmem'),
+        os.getenv('COURSE_CONTENT_CACHE_LOCATION'),
+    ),
 }
 
+COURSE_CONTENT_CACHE_ALIAS = 'course_content'
+COURSE_CONTENT_CACHE_TIMEOUT = int(os.getenv('COURSE_CONTENT_CACHE_TIMEOUT', 60 * 60 * 24))
+
+# Сколько секунд хранится ключ Idempotency-Key запросов прогресса (api/views.py)
+PROGRESS_IDEMPOTENCY_KEY_TTL = int(os.getenv('PROGRESS_IDEMPOTENCY_KEY_TTL', 60 * 60 * 24))
+
+# Фоновая генерация сертификатов (api/jobs.py): thread | worker | sync. В продакшене (docker-compose) —
+# worker: очередь thread живёт в памяти веб-процесса и после перезапуска поднимается только запросом статуса
+CERTIFICATE_JOBS_MODE = os.getenv('CERTIFICATE_JOBS_MODE', 'thread')
+CERTIFICATE_JOB_WORKERS = int(os.getenv('CERTIFICATE_JOB_WORKERS', 2))
+# Фон шаблона сертификата уменьшается до этой ширины (2x ширины страницы letter)
+CERTIFICATE_BACKGROUND_MAX_WIDTH = int(os.getenv('CERTIFICATE_BACKGROUND_MAX_WIDTH', 1584))
+
+# Метрики запросов (api/metrics.py): Server-Timing, лог api.metrics и /api/metrics/
+REQUEST_METRICS_ENABLED = os.getenv('REQUEST_METRICS_ENABLED', 'False') == 'True'
+
+# Поиск N+1 (api/nplusone.py): одинаковый по форме запрос NPLUSONE_THRESHOLD и более раз за запрос.
+# NPLUSONE_STRICT=True (CI) превращает предупреждение в ошибку
+NPLUSONE_ENABLED = os.getenv('NPLUSONE_ENABLED', 'False') == 'True'
+NPLUSONE_STRICT = os.getenv('NPLUSONE_STRICT', 'False') == 'True'
+NPLUSONE_THRESHOLD = int(os.getenv('NPLUSONE_THRESHOLD', 3))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'api.metrics': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+        'api.nplusone': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+    },
+}
+
+# Отдача файлов (api/downloads.py): django — сам Django с поддержкой Range,
+# x-accel — проверка прав в Django, сам файл отдаёт nginx через internal location
+FILE_DELIVERY_MODE = os.getenv('FILE_DELIVERY_MODE', 'django')
+FILE_ACCEL_REDIRECT_PREFIX = os.getenv('FILE_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -7,7 +7,8 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 # Инициализируйте Django
 django.setup()
 
-from api.models import User, Tag, Course, Module, Lesson, Step, UserRole
+from api.archive import ARCHIVE_VERSION, import_course_records
+from api.models import ORDER_GAP, User, Course, UserRole
 
 # Шаг 1: Создать или выбрать пользователя
 author, created = User.objects.get_or_create(
@@ -20,41 +21,10 @@ author, created = User.objects.get_or_create(
     }
 )
 
-# Шаг 2: Создать теги
-tag_names = ['HTML', 'Веб-разработка', 'Frontend']
-tags = [Tag.objects.get_or_create(name=name)[0] for name in tag_names]
-
-# Шаг 3: Создать курс
-course, created = Course.objects.get_or_create(
-    title='Основы HTML для начинающих',
-    defaults={
-        'description': 'Курс по основам HTML, охватывающий создание структуры веб-страниц и работу с элементами.',
-        'author': author,
-        'price': 1000
-    }
-)
-course.tags.set(tags)
-
-# Шаг 4: Создать первый модуль
-module1 = Module.objects.create(
-    title='Основные элементы HTML',
-    course=course,
-    order=0
-)
-
-# Создать уроки для первого модуля
-lesson_titles_module1 = [
-    'Введение в HTML',
-    'Элементы и атрибуты',
-    'Работа с текстом'
-]
-
-lessons_module1 = [Lesson.objects.create(title=title, module=module1, order=index) for index, title in enumerate(lesson_titles_module1)]
-
 # Ссылка на видео для всех шагов с видео
 default_video_url = 'https://www.youtube.com/embed/salY_Sm6mv4?si=xVM6qf4ItW5CqmRc'
 
-# Создать шаги для каждого урока в первом модуле
+# Шаги уроков первого модуля (уроки идут в порядке ключей)
 steps_data_module1 = {
     'Введение в HTML': [
         ('text', {'html': '<p>HTML — это язык разметки, используемый для создания структуры веб-страниц.</p>'}),
@@ -88,28 +58,7 @@ steps_data_module1 = {
     ],
 }
 
-for lesson in lessons_module1:
-    step_data = steps_data_module1.get(lesson.title, [])
-    for index, (step_type, content) in enumerate(step_data):
-        Step.objects.create(lesson=lesson, order=index, step_type=step_type, content=content)
-
-# Шаг 5: Создать второй модуль
-module2 = Module.objects.create(
-    title='Продвинутые концепции HTML',
-    course=course,
-    order=1
-)
-
-# Создать уроки для второго модуля
-lesson_titles_module2 = [
-    'Списки и таблицы',
-    'Мультимедийные элементы',
-    'Формы и ввод данных'
-]
-
-lessons_module2 = [Lesson.objects.create(title=title, module=module2, order=index) for index, title in enumerate(lesson_titles_module2)]
-
-# Создать шаги для каждого урока во втором модуле
+# Шаги уроков второго модуля
 steps_data_module2 = {
     'Списки и таблицы': [
         ('text', {'html': '<p>HTML предоставляет теги для создания упорядоченных и неупорядоченных списков, а также таблиц для организации данных.</p>'}),
@@ -143,9 +92,34 @@ steps_data_module2 = {
     ],
 }
 
-for lesson in lessons_module2:
-    step_data = steps_data_module2.get(lesson.title, [])
-    for index, (step_type, content) in enumerate(step_data):
-        Step.objects.create(lesson=lesson, order=index, step_type=step_type, content=content)
+modules = [
+    ('Основные элементы HTML', steps_data_module1),
+    ('Продвинутые концепции HTML', steps_data_module2),
+]
+
 
-print("Курс по HTML успешно создан!")
+def course_records():
+    """Курс в формате записей архива (api/archive.py): создаётся тем же путём, что и импорт."""
+    yield {
+        'type': 'course',
+        'version': ARCHIVE_VERSION,
+        'title': 'Основы HTML для начинающих',
+        'description': 'Курс по основам HTML, охватывающий создание структуры веб-страниц и работу с элементами.',
+        'price': 1000,
+        'tags': ['HTML', 'Веб-разработка', 'Frontend'],
+        'avatar': None,
+    }
+    for module_index, (module_title, lessons) in enumerate(modules, start=1):
+        yield {'type': 'module', 'title': module_title, 'order': module_index * ORDER_GAP}
+        for lesson_index, (lesson_title, steps) in enumerate(lessons.items(), start=1):
+            yield {'type': 'lesson', 'title': lesson_title, 'order': lesson_index * ORDER_GAP}
+            for order, (step_type, content) in enumerate(steps):
+                yield {'type': 'step', 'order': order, 'step_type': step_type, 'content': content}
+
+
+# Шаг 2: Создать курс, если его ещё нет
+if Course.objects.filter(title='Основы HTML для начинающих', author=author).exists():
+    print("Курс по HTML уже создан.")
+else:
+    import_course_records(course_records(), author)
+    print("Курс по HTML успешно создан!")
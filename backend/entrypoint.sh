@@ -0,0 +1,26 @@
+#!/bin/sh
+# Режимы запуска контейнера backend:
+#   web        — gunicorn (настройки в gunicorn.conf.py), миграции не применяет
+#   preflight  — ожидание базы и миграции; запускается один раз перед web
+#   worker     — обработчик очереди сертификатов (CERTIFICATE_JOBS_MODE=worker)
+#   dev        — runserver с миграциями, как раньше
+set -e
+
+case "${1:-web}" in
+    web)
+        exec gunicorn -c gunicorn.conf.py
+        ;;
+    preflight)
+        exec python manage.py preflight
+        ;;
+    worker)
+        exec python manage.py process_certificate_jobs
+        ;;
+    dev)
+        python manage.py migrate
+        exec python manage.py runserver 0.0.0.0:8000
+        ;;
+    *)
+        exec "$@"
+        ;;
+esac
@@ -0,0 +1,42 @@
+"""
+Настройки gunicorn для продакшена: gunicorn -c gunicorn.conf.py
+Все параметры задаются переменными окружения, значения ниже — по умолчанию.
+
+SERVER_INTERFACE=wsgi (по умолчанию) — воркеры gthread на config.wsgi;
+SERVER_INTERFACE=asgi — воркеры uvicorn на config.asgi.
+"""
+import multiprocessing
+import os
+
+
+def env_int(name, default):
+    return int(os.getenv(name, default))
+
+
+interface = os.getenv('SERVER_INTERFACE', 'wsgi')
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+# WEB_CONCURRENCY — стандартная переменная gunicorn/PaaS для числа процессов
+workers = env_int('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1)
+threads = env_int('GUNICORN_THREADS', 4)
+
+if interface == 'asgi':
+    wsgi_app = 'config.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'config.wsgi:application'
+    worker_class = 'gthread' if threads > 1 else 'sync'
+
+# Соединение с nginx держится между запросами
+keepalive = env_int('GUNICORN_KEEPALIVE', 5)
+timeout = env_int('GUNICORN_TIMEOUT', 30)
+graceful_timeout = env_int('GUNICORN_GRACEFUL_TIMEOUT', 30)
+# Перезапуск воркера после N запросов ограничивает рост памяти; jitter разносит перезапуски по времени
+max_requests = env_int('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = env_int('GUNICORN_MAX_REQUESTS_JITTER', 100)
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+# Временные файлы воркеров в памяти, а не на диске контейнера
+worker_tmp_dir = os.getenv('GUNICORN_WORKER_TMP_DIR', '/dev/shm' if os.path.isdir('/dev/shm') else None)
@@ -0,0 +1,89 @@
+"""
+Нагрузочный тест списка курсов: python loadtest.py --url http://localhost:8000/api/courses/
+
+Несколько потоков в течение заданного времени запрашивают эндпоинт и выводят
+пропускную способность (запросов в секунду), перцентили задержки и число ошибок.
+Зависит только от стандартной библиотеки, чтобы запускаться с любой машины.
+"""
+import argparse
+import http.client
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+
+def percentile(values, percent):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, round(percent / 100 * (len(values) - 1)))
+    return values[index]
+
+
+def worker(url, headers, deadline, results, lock):
+    parts = urlsplit(url)
+    connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+    path = parts.path + (f'?{parts.query}' if parts.query else '')
+    # Одно соединение на поток: проверяется и keep-alive сервера
+    connection = connection_class(parts.netloc, timeout=30)
+
+    latencies, errors = [], 0
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            connection.request('GET', path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            if response.status != 200:
+                errors += 1
+            if response.getheader('Connection', '').lower() == 'close':
+                connection.close()
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            connection.close()
+            continue
+        latencies.append(time.perf_counter() - started)
+    connection.close()
+
+    with lock:
+        results['latencies'].extend(latencies)
+        results['errors'] += errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Нагрузочный тест эндпоинта списка курсов')
+    parser.add_argument('--url', default='http://localhost:8000/api/courses/')
+    parser.add_argument('--concurrency', type=int, default=16, help='Количество параллельных клиентов')
+    parser.add_argument('--duration', type=float, default=30.0, help='Длительность теста, сек.')
+    parser.add_argument('--token', help='JWT access-токен (иначе запросы анонимные)')
+    args = parser.parse_args()
+
+    headers = {'Accept': 'application/json'}
+    if args.token:
+        headers['Authorization'] = f'Bearer {args.token}'
+
+    results = {'latencies': [], 'errors': 0}
+    lock = threading.Lock()
+    started = time.monotonic()
+    deadline = started + args.duration
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        for _ in range(args.concurrency):
+            executor.submit(worker, args.url, headers, deadline, results, lock)
+    elapsed = time.monotonic() - started
+
+    latencies = results['latencies']
+    print(f'URL:            {args.url}')
+    print(f'Клиентов:       {args.concurrency}, длительность {elapsed:.1f} с')
+    print(f'Запросов:       {len(latencies)}, ошибок: {results["errors"]}')
+    print(f'Пропускная способность: {len(latencies) / elapsed:.1f} запр./с')
+    if latencies:
+        print(f'Задержка, мс:   среднее {statistics.mean(latencies) * 1000:.1f}, '
+              f'p50 {percentile(latencies, 50) * 1000:.1f}, '
+              f'p95 {percentile(latencies, 95) * 1000:.1f}, '
+              f'p99 {percentile(latencies, 99) * 1000:.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -11,7 +11,7 @@ const CourseList = () => {
 
     useEffect(() => {
         axios.get('/api/courses/')
-            .then(response => setCourses(response.data))
+            .then(response => setCourses(response.data.results))
             .catch(error => console.error('Error fetching courses:', error));
     }, []);
 
@@ -48,10 +48,8 @@ const CourseModulesEditor = () => {
             return;
         }
 
-        const module = modules.find(mod => mod.id === moduleId);
-        const maxOrder = module.lessons.reduce((max, lesson) => Math.max(max, lesson.order), 0);
-
-        axiosInstance.post(`/courses/${courseId}/modules/${moduleId}/lessons/`, { title: lessonTitle, order: maxOrder + 1 })
+        // Порядок нового урока назначает сервер — урок добавляется в конец модуля
+        axiosInstance.post(`/courses/${courseId}/modules/${moduleId}/lessons/`, { title: lessonTitle })
             .then(response => {
                 setModules(modules.map(mod =>
                     mod.id === moduleId
@@ -66,6 +64,47 @@ const CourseModulesEditor = () => {
             });
     };
 
+    // Перестановка на одну позицию: сервер меняет ключ порядка только у перемещаемого элемента
+    const moveInList = (items, index, direction) => {
+        const target = index + direction;
+        if (target < 0 || target >= items.length) {
+            return null;
+        }
+        const reordered = [...items];
+        const [item] = reordered.splice(index, 1);
+        reordered.splice(target, 0, item);
+        return { reordered, item, after: target === 0 ? null : reordered[target - 1].id };
+    };
+
+    const handleMoveModule = (index, direction) => {
+        const move = moveInList(modules, index, direction);
+        if (!move) {
+            return;
+        }
+        axiosInstance.post(`/courses/${courseId}/modules/${move.item.id}/move/`, { after: move.after })
+            .then(() => setModules(move.reordered))
+            .catch(error => {
+                console.error('Error moving module:', error);
+                alert('Ошибка перемещения модуля: ' + error.message);
+            });
+    };
+
+    const handleMoveLesson = (moduleId, index, direction) => {
+        const module = modules.find(mod => mod.id === moduleId);
+        const move = moveInList(module.lessons, index, direction);
+        if (!move) {
+            return;
+        }
+        axiosInstance.post(`/courses/${courseId}/modules/${moduleId}/lessons/${move.item.id}/move/`, { after: move.after })
+            .then(() => setModules(modules.map(mod =>
+                mod.id === moduleId ? { ...mod, lessons: move.reordered } : mod
+            )))
+            .catch(error => {
+                console.error('Error moving lesson:', error);
+                alert('Ошибка перемещения урока: ' + error.message);
+            });
+    };
+
     const handleLessonTitleChange = (moduleId, value) => {
         setLessonTitles(prev => ({ ...prev, [moduleId]: value }));
     };
@@ -91,11 +130,17 @@ const CourseModulesEditor = () => {
             <Typography variant="h4" gutterBottom>Редактирование модулей курса</Typography>
             <Button size="small" onClick={() => navigate(`/user-courses`)}>Назад</Button>
             <Box sx={{ my: 2 }}>
-                {modules.map(module => (
+                {modules.map((module, moduleIndex) => (
                     <Paper key={module.id} elevation={3} sx={{ p: 2, mb: 3 }}>
-                        <Typography variant="h5" component="div" gutterBottom>
-                            {module.title}
-                        </Typography>
+                        <Box display={'flex'} alignItems={'center'} gap={1}>
+                            <Typography variant="h5" component="div" gutterBottom sx={{ flexGrow: 1 }}>
+                                {module.title}
+                            </Typography>
+                            <Button size="small" disabled={moduleIndex === 0}
+                                    onClick={() => handleMoveModule(moduleIndex, -1)}>↑</Button>
+                            <Button size="small" disabled={moduleIndex === modules.length - 1}
+                                    onClick={() => handleMoveModule(moduleIndex, 1)}>↓</Button>
+                        </Box>
                         <Divider sx={{ mb: 2 }} />
                         <Box sx={{ mb: 2 }}>
                             <TextField
@@ -120,7 +165,7 @@ const CourseModulesEditor = () => {
                             flexDirection: 'column',
                             gap: '1rem',
                         }}>
-                            {module.lessons.map(lesson => (
+                            {module.lessons.map((lesson, lessonIndex) => (
                                 <Card
                                     key={lesson.id}
                                     variant="outlined"
@@ -152,6 +197,20 @@ const CourseModulesEditor = () => {
                                         >
                                             Удалить урок
                                         </Button>
+                                        <Button
+                                            size="small"
+                                            disabled={lessonIndex === 0}
+                                            onClick={() => handleMoveLesson(module.id, lessonIndex, -1)}
+                                        >
+                                            ↑
+                                        </Button>
+                                        <Button
+                                            size="small"
+                                            disabled={lessonIndex === module.lessons.length - 1}
+                                            onClick={() => handleMoveLesson(module.id, lessonIndex, 1)}
+                                        >
+                                            ↓
+                                        </Button>
                                     </Box>
                                 </Card>
                             ))}
@@ -37,64 +37,44 @@ const LessonStepEditor = () => {
 
     const handleSaveAllSteps = async () => {
         try {
-            // Delete steps marked for deletion
-            await Promise.all(
-                deletedStepIds.map((id) =>
-                    axiosInstance.delete(
-                        `/courses/${courseId}/modules/${moduleId}/lessons/${lessonId}/steps/${id}/`
-                    )
-                )
-            );
+            // Whole lesson in one request: steps without id are created,
+            // steps missing from the list are deleted, order follows the list
+            const payload = steps.map((step) => {
+                let content;
+                switch (step.step_type) {
+                    case "text":
+                        content = { html: step.content.html || "" };
+                        break;
+                    case "video":
+                        content = { video_url: step.content.video_url || "" };
+                        break;
+                    case "question":
+                        content = {
+                            question: step.content.question || "",
+                            answers: step.content.answers || [],
+                            correct_answer: step.content.correct_answer || 0,
+                        };
+                        break;
+                    default:
+                        throw new Error("Invalid step type");
+                }
 
-            // Save updated and new steps
-            await Promise.all(
-                steps.map((step) => {
-                    let content;
-                    switch (step.step_type) {
-                        case "text":
-                            content = { html: step.content.html || "" };
-                            break;
-                        case "video":
-                            content = { video_url: step.content.video_url || "" };
-                            break;
-                        case "question":
-                            content = {
-                                question: step.content.question || "",
-                                answers: step.content.answers || [],
-                                correct_answer: step.content.correct_answer || 0,
-                            };
-                            break;
-                        default:
-                            throw new Error("Invalid step type");
-                    }
+                const item = { step_type: step.step_type, content };
+                if (!step.id.toString().startsWith("new")) {
+                    item.id = step.id;
+                }
+                return item;
+            });
 
-                    if (step.id.toString().startsWith("new")) {
-                        // New step, use POST
-                        return axiosInstance.post(
-                            `/courses/${courseId}/modules/${moduleId}/lessons/${lessonId}/steps/`,
-                            {
-                                step_type: step.step_type,
-                                order: step.order,
-                                content,
-                                lesson: lessonId, // Ensure the lesson ID is included
-                            }
-                        );
-                    } else {
-                        // Existing step, use PATCH
-                        return axiosInstance.patch(
-                            `/courses/${courseId}/modules/${moduleId}/lessons/${lessonId}/steps/${step.id}/`,
-                            {
-                                step_type: step.step_type,
-                                content,
-                            }
-                        );
-                    }
-                })
+            const response = await axiosInstance.put(
+                `/courses/${courseId}/modules/${moduleId}/lessons/${lessonId}/steps/bulk/`,
+                { steps: payload }
             );
 
             alert("Все шаги успешно сохранены!");
             setDeletedStepIds([]); // Clear deleted step IDs after save
-            fetchSteps(); // Refresh steps from server
+            setSteps(response.data);
+            setOriginalSteps(JSON.parse(JSON.stringify(response.data)));
         } catch (error) {
             console.error("Error saving steps:", error);
         }
@@ -28,15 +28,30 @@ const UserCourses = () => {
     const axiosInstance = useAxios();
 
     useEffect(() => {
-        const endpoint = showOwned ? '/courses/?owned=true' : '/courses/';
+        let cancelled = false;
 
-        axiosInstance
-            .get(endpoint)
-            .then((response) => {
-                setCourses(response.data);
-                console.log(response.data);
-            })
-            .catch((error) => console.error('Error fetching user courses:', error));
+        // Курсы отдаются постранично (курсорная пагинация): проходим по ссылкам next до конца
+        const fetchAllCourses = async () => {
+            let url = showOwned ? '/courses/?owned=true&page_size=100' : '/courses/?page_size=100';
+            const loaded = [];
+            try {
+                while (url && !cancelled) {
+                    const response = await axiosInstance.get(url);
+                    loaded.push(...response.data.results);
+                    url = response.data.next;
+                }
+                if (!cancelled) {
+                    setCourses(loaded);
+                }
+            } catch (error) {
+                console.error('Error fetching user courses:', error);
+            }
+        };
+
+        fetchAllCourses();
+        return () => {
+            cancelled = true;
+        };
     }, [showOwned]); // Зависимость для изменения при переключении состояния отображения курсов
 
     const handleAddCourse = () => {
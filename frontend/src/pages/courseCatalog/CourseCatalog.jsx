@@ -9,6 +9,7 @@ import axios from "@utils/axios.js";
 
 const CourseCatalog = () => {
     const [courses, setCourses] = useState([]);
+    const [nextPageUrl, setNextPageUrl] = useState(null);
     const axiosInstance = useAxios();
     const navigate = useNavigate();
 
@@ -16,10 +17,12 @@ const CourseCatalog = () => {
         fetchCourses();
     }, []);
 
-    const fetchCourses = async () => {
+    const fetchCourses = async (url = '/courses/') => {
         try {
-            const response = await axios.get('/courses/');
-            setCourses(response.data);
+            // Каталог отдаётся постранично (курсорная пагинация), next — ссылка на следующую страницу
+            const response = await axios.get(url);
+            setCourses((prevCourses) => (url === '/courses/' ? response.data.results : [...prevCourses, ...response.data.results]));
+            setNextPageUrl(response.data.next);
         } catch (error) {
             console.error('Error fetching courses:', error);
         }
@@ -62,6 +65,13 @@ const CourseCatalog = () => {
                     </Grid>
                 ))}
             </Grid>
+            {nextPageUrl && (
+                <Box sx={{ display: 'flex', justifyContent: 'center', mt: 4 }}>
+                    <Button variant="outlined" onClick={() => fetchCourses(nextPageUrl)}>
+                        Показать ещё
+                    </Button>
+                </Box>
+            )}
         </Container>
     );
 };
@@ -30,6 +30,25 @@ const CourseCompletionPage = () => {
         fetchCourse();
     }, [courseId]);
 
+    // Сертификат генерируется в фоне: ставим задачу и опрашиваем её статус
+    const generateCertificate = async () => {
+        const response = await axiosInstance.post(`/generate-certificate/${courseId}/`);
+        let job = response.data;
+
+        while (job.status === 'pending' || job.status === 'running') {
+            await new Promise((resolve) => setTimeout(resolve, 1000));
+            const jobResponse = await axiosInstance.get(`/certificate-jobs/${job.id}/`);
+            job = jobResponse.data;
+        }
+
+        if (job.status !== 'done') {
+            throw new Error(job.error || 'Не удалось создать сертификат');
+        }
+
+        const certificateResponse = await axiosInstance.get(`/certificates/${courseId}/`);
+        return certificateResponse.data;
+    };
+
     // Запрос на сервер для проверки существования сертификата
     useEffect(() => {
         const fetchCertificate = async () => {
@@ -42,18 +61,8 @@ const CourseCompletionPage = () => {
                 setCertificate(null);
 
                 try {
-                    const response = await axiosInstance.post(`/generate-certificate/${courseId}/`);
-                    setCertificate(response.data);
+                    setCertificate(await generateCertificate());
                     console.log('Сертификат успешно создан');
-
-                    try {
-                        const response = await axiosInstance.get(`/certificates/${courseId}/`);
-                        setCertificate(response.data);
-                        console.log(response.data);
-                    } catch (err) {
-                        console.error('Ошибка при загрузке сертификата:', err);
-                        setCertificate(null);
-                    }
                 } catch (err) {
                     console.error('Ошибка при создании сертификата:', err);
                 }
@@ -86,8 +95,7 @@ const CourseCompletionPage = () => {
         } else {
             // Если сертификата нет, создаем его
             try {
-                const response = await axiosInstance.post(`/generate-certificate/${courseId}/`);
-                setCertificate(response.data); // Обновляем состояние с новыми данными сертификата
+                setCertificate(await generateCertificate()); // Обновляем состояние с новыми данными сертификата
                 console.log('Сертификат успешно создан');
             } catch (err) {
                 console.error('Ошибка при создании сертификата:', err);
@@ -28,7 +28,7 @@ const LearnCoursePage = () => {
     const axiosInstance = useAxios();
 
     useEffect(() => {
-        fetchCourseModules();
+        fetchCourseOutline();
     }, [courseId]);
 
     useEffect(() => {
@@ -43,17 +43,32 @@ const LearnCoursePage = () => {
         }
     }, [modules, currentModuleIndex, currentLessonIndex]);
 
-    useEffect(() => {
-        fetchProgress();
-    }, [modules]);
-
-    const fetchCourseModules = async () => {
+    const fetchCourseOutline = async () => {
         try {
-            const response = await axiosInstance.get(`/courses/${courseId}/modules/`);
-            setModules(response.data);
-            // await fetchProgress();
+            // Модули, уроки, заголовки шагов и прогресс приходят одним запросом,
+            // содержимое шагов подгружается отдельно только для открытого урока
+            const response = await axiosInstance.get(`/courses/${courseId}/outline/`);
+            const outline = response.data;
+
+            const completedStepIds = new Set(outline.completed_steps);
+            setCompletedSteps(completedStepIds);
+            setModules(outline.modules);
+
+            // Находим первый незавершённый шаг и открываем его урок и модуль
+            for (let moduleIndex = 0; moduleIndex < outline.modules.length; moduleIndex++) {
+                const module = outline.modules[moduleIndex];
+                for (let lessonIndex = 0; lessonIndex < module.lessons.length; lessonIndex++) {
+                    const stepIndex = module.lessons[lessonIndex].steps.findIndex((step) => !completedStepIds.has(step.id));
+                    if (stepIndex !== -1) {
+                        setCurrentModuleIndex(moduleIndex);
+                        setCurrentLessonIndex(lessonIndex);
+                        setCurrentStepIndex(stepIndex);
+                        return;
+                    }
+                }
+            }
         } catch (error) {
-            console.error('Error fetching course modules:', error);
+            console.error('Error fetching course outline:', error);
         }
     };
 
@@ -67,42 +82,6 @@ const LearnCoursePage = () => {
         }
     };
 
-    const fetchProgress = async () => {
-        try {
-            const response = await axiosInstance.get(`/courses/${courseId}/progress/`);
-            const progressData = response.data;
-
-            const completedStepIds = new Set(progressData.completed_steps.map(step => step));
-            setCompletedSteps(completedStepIds);
-            // Find the last completed step and determine the next step, lesson, and module
-            let foundCurrentStep = false;
-            for (let moduleIndex = 0; moduleIndex < modules.length; moduleIndex++) {
-                const module = modules[moduleIndex];
-                for (let lessonIndex = 0; lessonIndex < module.lessons.length; lessonIndex++) {
-                    const lesson = module.lessons[lessonIndex];
-                    const response = await axiosInstance.get(`/courses/${courseId}/modules/${module.id}/lessons/${lesson.id}/steps/`);
-                    const stepsData = response.data;
-
-                    for (let stepIndex = 0; stepIndex < stepsData.length; stepIndex++) {
-                        const step = stepsData[stepIndex];
-                        if (!completedStepIds.has(step.id)) {
-                            setCurrentModuleIndex(moduleIndex);
-                            setCurrentLessonIndex(lessonIndex);
-                            setCurrentStepIndex(stepIndex);
-                            foundCurrentStep = true;
-                            break;
-                        }
-                    }
-
-                    if (foundCurrentStep) break;
-                }
-                if (foundCurrentStep) break;
-            }
-        } catch (error) {
-            console.error('Error fetching progress:', error);
-        }
-    };
-
     const updateProgress = async (stepId) => {
         try {
             await axiosInstance.post(`/courses/${courseId}/progress/`, { step_id: stepId });
@@ -33,6 +33,8 @@ const MyLearningPage = () => {
     const navigate = useNavigate();
     const [completedCourses, setCompletedCourses] = useState([]);
     const [ongoingCourses, setOngoingCourses] = useState([]);
+    const [completedNextUrl, setCompletedNextUrl] = useState(null);
+    const [ongoingNextUrl, setOngoingNextUrl] = useState(null);
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState(null);
 
@@ -43,13 +45,13 @@ const MyLearningPage = () => {
     const fetchCourses = async () => {
         try {
             setLoading(true);
+            // Первые страницы обоих списков приходят одним запросом, дальше — по ссылкам *_next
             const response = await axiosInstance.get('/user/courses/');
-            const { completed, ongoing } = response.data;
+            const { completed, ongoing, completed_next, ongoing_next } = response.data;
             setCompletedCourses(completed);
             setOngoingCourses(ongoing);
-
-            console.log(completed);
-            console.log(ongoing);
+            setCompletedNextUrl(completed_next);
+            setOngoingNextUrl(ongoing_next);
         } catch (err) {
             console.error('Error fetching courses:', err);
             setError('Ошибка при загрузке курсов.');
@@ -58,6 +60,17 @@ const MyLearningPage = () => {
         }
     };
 
+    const fetchMore = async (url, setCourses, setNextUrl) => {
+        try {
+            const response = await axiosInstance.get(url);
+            setCourses((prevCourses) => [...prevCourses, ...response.data.results]);
+            setNextUrl(response.data.next);
+        } catch (err) {
+            console.error('Error fetching courses:', err);
+            setError('Ошибка при загрузке курсов.');
+        }
+    };
+
     const handleCourseClick = (courseId) => {
         navigate(`/courses/${courseId}/learn`);
     };
@@ -115,6 +128,13 @@ const MyLearningPage = () => {
                                 </Grid>
                             ))}
                         </Grid>
+                        {ongoingNextUrl && (
+                            <Box sx={{ display: 'flex', justifyContent: 'center', mt: 2 }}>
+                                <Button variant="outlined" onClick={() => fetchMore(ongoingNextUrl, setOngoingCourses, setOngoingNextUrl)}>
+                                    Показать ещё
+                                </Button>
+                            </Box>
+                        )}
                     </Box>
 
                     {/* Completed Courses */}
@@ -147,6 +167,13 @@ const MyLearningPage = () => {
                                 </Grid>
                             ))}
                         </Grid>
+                        {completedNextUrl && (
+                            <Box sx={{ display: 'flex', justifyContent: 'center', mt: 2 }}>
+                                <Button variant="outlined" onClick={() => fetchMore(completedNextUrl, setCompletedCourses, setCompletedNextUrl)}>
+                                    Показать ещё
+                                </Button>
+                            </Box>
+                        )}
                     </Box>
                 </>
             )}